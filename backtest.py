@@ -0,0 +1,131 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch_forecast import AVAILABILITY_PATH, OCCUPANCY_PATH, SERIES_KEYS, collect_series, period_label
+from column_store import CACHE_DIR, open_table, table_exists, write_table
+from forecasting import MIN_OBSERVATIONS, ar1_forecast, fit_ar1
+
+# Rolling-origin backtest of the quarterly forecasts. At every historical
+# cutoff the models are refitted on the data up to that quarter and forecast
+# forward; each cutoff's forecasts are one column-store table versioned by a
+# hash of the data it saw, so a new quarter of data only adds one new cutoff
+# while earlier cutoffs are read back. Actuals are joined on read, so errors
+# always use the latest observations.
+METRICS = ['occupancy', 'availability']
+METHODS = ['ar1', 'naive']
+BACKTEST_HORIZON = 8
+MIN_TRAIN = MIN_OBSERVATIONS + 2
+
+
+def cutoff_forecasts(panel, horizon=BACKTEST_HORIZON):
+    """{method: (horizon x S) forecasts} from the rows of panel, plus each series' origin row"""
+    fit = fit_ar1(panel, covariance=False)
+    ar1, _ = ar1_forecast(fit, horizon)
+    forecasts = {
+        'ar1': np.where(fit['valid'], ar1, np.nan),
+        'naive': np.broadcast_to(fit['last'], ar1.shape),
+    }
+    return forecasts, fit['last_row']
+
+
+def _cutoff_digest(panel, keys, horizon):
+    digest = hashlib.sha1(np.ascontiguousarray(panel).tobytes())
+    digest.update(repr((keys, horizon, METHODS, MIN_OBSERVATIONS)).encode())
+    return digest.hexdigest()[:16]
+
+
+def _cutoff_table(metric, keys, period_ids, cutoff_row, panel, horizon):
+    """Long forecast rows for one metric and cutoff"""
+    forecasts, origin_row = cutoff_forecasts(panel[:cutoff_row + 1], horizon)
+    steps = np.arange(1, horizon + 1)
+    origin = period_ids[np.maximum(origin_row, 0)]
+    frames = []
+    for method in METHODS:
+        frames.append(pd.concat([keys] * horizon, ignore_index=True).assign(
+            method=method,
+            step=np.repeat(steps, len(keys)),
+            target_period_id=(origin[None, :] + steps[:, None]).ravel(),
+            forecast=forecasts[method].ravel()
+        ))
+    table = pd.concat(frames, ignore_index=True)
+    return table.assign(metric=metric, cutoff=period_label([period_ids[cutoff_row]])[0]).dropna(subset=['forecast'])
+
+
+def _series_labels(keys):
+    return keys.astype(str).agg('|'.join, axis=1).to_numpy()
+
+
+def _run_cutoff(args):
+    return _cutoff_table(*args)
+
+
+def run_backtest(series, metrics=METRICS, horizon=BACKTEST_HORIZON, min_train=MIN_TRAIN, workers=None,
+                 cache_dir=CACHE_DIR):
+    """Forecasts from every cutoff joined with actuals; missing cutoffs are fitted in a process pool"""
+    results = []
+    for metric in metrics:
+        rows = series[(series['metric'] == metric) & (series['level'] == 'market')]
+        if rows.empty:
+            continue
+        wide = rows.pivot_table(index='period_id', columns=SERIES_KEYS[1:], values='value', aggfunc='mean')
+        wide = wide.reindex(np.arange(wide.index.min(), wide.index.max() + 1))
+        panel = wide.to_numpy(dtype=np.float64)
+        period_ids = wide.index.to_numpy()
+        keys = wide.columns.to_frame(index=False)
+
+        # One table per cutoff; its version changes only if the data up to the cutoff changes
+        cutoffs = {}
+        for cutoff_row in range(min_train - 1, len(period_ids) - 1):
+            name = f"backtest_{metric}_{period_label([period_ids[cutoff_row]])[0].replace('-', '')}"
+            cutoffs[cutoff_row] = (name, _cutoff_digest(panel[:cutoff_row + 1], list(wide.columns), horizon))
+        missing = [row for row, (name, version) in cutoffs.items() if not table_exists(name, version, cache_dir)]
+
+        jobs = [(metric, keys, period_ids, row, panel, horizon) for row in missing]
+        workers_used = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+        if workers_used == 1:
+            tables = map(_run_cutoff, jobs)
+            for row, table in zip(missing, tables):
+                write_table(table, *cutoffs[row], cache_dir)
+        else:
+            with ProcessPoolExecutor(max_workers=workers_used) as pool:
+                for row, table in zip(missing, pool.map(_run_cutoff, jobs)):
+                    write_table(table, *cutoffs[row], cache_dir)
+
+        forecasts = pd.concat([open_table(name, version, cache_dir) for name, version in cutoffs.values()],
+                              ignore_index=True)
+
+        # Actuals by (series, target quarter) from the panel, NaN beyond the data
+        column = pd.Index(_series_labels(keys)).get_indexer(_series_labels(forecasts[SERIES_KEYS[1:]]))
+        offset = forecasts['target_period_id'].to_numpy() - period_ids[0]
+        inside = (column >= 0) & (offset >= 0) & (offset < len(period_ids))
+        actual = np.where(inside, panel[np.where(inside, offset, 0), np.where(inside, column, 0)], np.nan)
+        results.append(forecasts.assign(actual=actual, error=forecasts['forecast'].to_numpy() - actual))
+    return pd.concat(results, ignore_index=True).dropna(subset=['actual'])
+
+
+def error_metrics(results, by=('metric', 'method', 'step')):
+    """MAE, RMSE, MAPE (%), bias and forecast count grouped by `by`"""
+    scored = results.assign(
+        abs_error=results['error'].abs(),
+        squared_error=results['error'] ** 2,
+        pct_error=(results['error'] / results['actual'].where(results['actual'] != 0)).abs() * 100
+    )
+    metrics = scored.groupby(list(by), sort=True).agg(
+        mae=('abs_error', 'mean'),
+        rmse=('squared_error', 'mean'),
+        mape=('pct_error', 'mean'),
+        bias=('error', 'mean'),
+        forecasts=('error', 'size')
+    )
+    metrics['rmse'] = np.sqrt(metrics['rmse'])
+    return metrics.reset_index()
+
+
+def load_backtest(occupancy_path=OCCUPANCY_PATH, availability_path=AVAILABILITY_PATH, cache_dir=CACHE_DIR):
+    """Backtest results for the occupancy and availability files"""
+    series = collect_series(pd.read_csv(occupancy_path), pd.read_csv(availability_path))
+    return run_backtest(series, cache_dir=cache_dir)
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, data_version, open_table, table_exists, write_table
+from forecasting import HORIZON, ar1_forecast, fit_ar1
+from macro_data import quarter_period
+
+# Batch forecasts for every market series. Each metric is laid
+# out as one (quarter x series) panel, its columns are split into chunks that
+# are fitted with AR(1) in a process pool, and the forecasts and intervals
+# come from closed-form AR(1) recursions. Fitted parameters and forecasts are
+# stored as two column-store tables per data version, so after a quarterly
+# drop the whole batch refits once and every dashboard reads the tables.
+# Submarket series are left out: the leases file only carries rent and
+# availability as market values, so a submarket series would be a
+# re-weighted market constant.
+OCCUPANCY_PATH = 'Major Market Occupancy Data-revised.csv'
+AVAILABILITY_PATH = 'Price and Availability Data.csv'
+INTERVAL_Z = 1.645  # 90% prediction interval
+SERIES_KEYS = ['metric', 'level', 'market', 'segment']
+PARAMS_NAME = 'batch_forecast_params'
+FORECASTS_NAME = 'batch_forecast_values'
+
+
+def period_label(period_ids):
+    """'YYYY-Qn' label for integer quarter ids"""
+    period_ids = np.asarray(period_ids, dtype=np.int64)
+    return np.array([f"{i // 4}-Q{i % 4 + 1}" for i in period_ids], dtype=object)
+
+
+def _series_frame(df, metric, level, value, segment=None):
+    """Long (metric, level, market, segment, period_id, value) rows for one source"""
+    return pd.DataFrame({
+        'metric': metric,
+        'level': level,
+        'market': df['market'].to_numpy(),
+        'segment': df[segment].astype(str).to_numpy() if segment else 'All',
+        'period_id': quarter_period(df['year'], df['quarter']),
+        'value': df[value].to_numpy(dtype=np.float64),
+    })
+
+
+def collect_series(occupancy_df, availability_df):
+    """Every forecastable series in long form: occupancy, class availability and rent"""
+    frames = [
+        _series_frame(occupancy_df, 'occupancy', 'market', 'avg_occupancy_proportion'),
+        _series_frame(availability_df, 'availability', 'market', 'availability_proportion', 'internal_class'),
+        _series_frame(availability_df, 'rent', 'market', 'internal_class_rent', 'internal_class'),
+    ]
+    series = pd.concat(frames, ignore_index=True)
+    return series[series['period_id'] >= 0]
+
+
+def _fit_chunk(panel):
+    return fit_ar1(panel, covariance=False)
+
+
+def fit_panel(panel, workers=None, min_columns=64):
+    """AR(1) parameters for every column, with column chunks fitted in a process pool"""
+    workers = max(1, min(workers or os.cpu_count() or 1, panel.shape[1] // min_columns or 1))
+    if workers == 1:
+        return _fit_chunk(panel)
+    chunks = np.array_split(np.arange(panel.shape[1]), workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        fits = list(pool.map(_fit_chunk, [panel[:, columns] for columns in chunks]))
+    return {key: np.concatenate([fit[key] for fit in fits]) for key in fits[0]}
+
+
+def forecast_series(series, horizon=HORIZON, workers=None):
+    """(params, forecasts) tables for every series of a long frame"""
+    params, forecasts = [], []
+    steps = np.arange(1, horizon + 1)
+    for metric, rows in series.groupby('metric', sort=True):
+        wide = rows.pivot_table(index='period_id', columns=SERIES_KEYS[1:], values='value', aggfunc='mean')
+        wide = wide.reindex(np.arange(wide.index.min(), wide.index.max() + 1))
+        fit = fit_panel(wide.to_numpy(dtype=np.float64), workers)
+        keys = wide.columns.to_frame(index=False).assign(metric=metric)[SERIES_KEYS]
+        intercept = fit['mean_y'] - fit['phi'] * fit['mean_x']
+        last_period = wide.index.to_numpy()[np.maximum(fit['last_row'], 0)]
+        params.append(keys.assign(
+            phi=fit['phi'], intercept=intercept, sigma=fit['sigma'], observations=fit['observations'],
+            last_value=fit['last'], last_period=period_label(last_period)
+        )[fit['valid']])
+
+        # Closed-form AR(1) mean path and forecast spread, all series and steps at once
+        forecast, deviation = ar1_forecast(fit, horizon)
+        forecast, spread = forecast[:, fit['valid']], INTERVAL_Z * deviation[:, fit['valid']]
+        valid_keys = keys[fit['valid']].reset_index(drop=True)
+        periods = last_period[fit['valid']][None, :] + steps[:, None]
+        forecasts.append(pd.concat([valid_keys] * horizon, ignore_index=True).assign(
+            step=np.repeat(steps, len(valid_keys)),
+            period=period_label(periods.ravel()),
+            forecast=forecast.ravel(),
+            lower=(forecast - spread).ravel(),
+            upper=(forecast + spread).ravel()
+        ))
+    return pd.concat(params, ignore_index=True), pd.concat(forecasts, ignore_index=True)
+
+
+def load_batch_forecasts(occupancy_path=OCCUPANCY_PATH, availability_path=AVAILABILITY_PATH, cache_dir=CACHE_DIR):
+    """Cached (params, forecasts) tables for the occupancy and availability files"""
+    version = data_version(occupancy_path, availability_path)
+    if not table_exists(FORECASTS_NAME, version, cache_dir):
+        series = collect_series(pd.read_csv(occupancy_path), pd.read_csv(availability_path))
+        params, forecasts = forecast_series(series)
+        write_table(params, PARAMS_NAME, version, cache_dir)
+        write_table(forecasts, FORECASTS_NAME, version, cache_dir)
+    return open_table(PARAMS_NAME, version, cache_dir), open_table(FORECASTS_NAME, version, cache_dir)
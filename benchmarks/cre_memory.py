@@ -0,0 +1,126 @@
+import argparse
+import importlib.util
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Memory benchmark for the quarterly data paths behind the cre_presentation slides.
+# Builds an N-times scaled copy of the occupancy table, then measures peak and
+# retained allocations for preparing the data and building the slide 1/2 figures.
+#
+#   python benchmarks/cre_memory.py --scale 100 --against <git-rev>
+#
+# --against loads cre_presentation.py from another revision for a side-by-side run.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OCCUPANCY_FILE = 'Major Market Occupancy Data-revised.csv'
+MARKETS = ['Manhattan', 'San Francisco', 'Los Angeles', 'Chicago', 'Washington D.C.',
+           'Dallas/Ft Worth', 'Houston', 'Philadelphia', 'South Bay/San Jose', 'Austin']
+
+
+def synthetic_occupancy():
+    """Stand-in occupancy table when the real CSV is not checked out"""
+    rng = np.random.default_rng(0)
+    rows = []
+    for market in MARKETS:
+        level = rng.uniform(0.9, 0.98)
+        for year in range(2020, 2025):
+            for q in range(1, 5):
+                if year == 2024 and q == 4:
+                    break
+                start = level
+                level = float(np.clip(level * rng.uniform(0.85, 1.05), 0.2, 0.99))
+                rows.append({'market': market, 'year': year, 'quarter': f'Q{q}',
+                             'starting_occupancy_proportion': start,
+                             'avg_occupancy_proportion': (start + level) / 2,
+                             'ending_occupancy_proportion': level})
+    return pd.DataFrame(rows)
+
+
+def scaled_occupancy(scale):
+    """Repeat the occupancy table scale times, giving each copy its own market names"""
+    source = os.path.join(REPO_DIR, OCCUPANCY_FILE)
+    try:
+        base = pd.read_csv(source)
+        if 'market' not in base.columns:
+            raise ValueError('not a data file (git-lfs pointer?)')
+    except (OSError, ValueError):
+        base = synthetic_occupancy()
+    copies = [base]
+    for k in range(1, scale):
+        copies.append(base.assign(market=base['market'] + f' #{k}'))
+    return pd.concat(copies, ignore_index=True)
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_slides(module):
+    """Run the quarterly data paths of slides 1 and 2, old or new signatures"""
+    prepare = module.prepare_quarterly_data.__wrapped__
+    if prepare.__code__.co_argcount == 2:
+        quarterly = prepare(module.actual_df, None)
+    else:
+        quarterly = prepare(module.actual_df)
+    quarterly = module.add_coordinates(quarterly)
+    module.create_enhanced_map_visualization(quarterly)
+    module.get_latest_data(quarterly)
+    module.create_small_multiples(quarterly)
+    module.create_bar_chart_race(quarterly)
+
+
+def measure(module):
+    tracemalloc.start()
+    start = time.perf_counter()
+    build_slides(module)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory benchmark for cre_presentation data paths')
+    parser.add_argument('--scale', type=int, default=100)
+    parser.add_argument('--against', help='git revision to compare with')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    sys.path.insert(0, REPO_DIR)
+
+    workdir = tempfile.mkdtemp(prefix='cre-memory-')
+    df = scaled_occupancy(args.scale)
+    df.to_csv(os.path.join(workdir, OCCUPANCY_FILE), index=False)
+    os.chdir(workdir)
+    print(f"{len(df):,} occupancy rows ({args.scale}x)")
+
+    variants = [('current', os.path.join(REPO_DIR, 'cre_presentation.py'))]
+    if args.against:
+        legacy_path = os.path.join(workdir, 'cre_presentation_legacy.py')
+        source = subprocess.run(['git', '-C', REPO_DIR, 'show', f'{args.against}:cre_presentation.py'],
+                                check=True, capture_output=True, text=True).stdout
+        with open(legacy_path, 'w') as f:
+            f.write(source)
+        variants.insert(0, (args.against, legacy_path))
+
+    print(f"{'version':<12} {'peak MB':>10} {'seconds':>10}")
+    for label, path in variants:
+        module = load_module(f"cre_{label}".replace('-', '_'), path)
+        peak, elapsed = measure(module)
+        print(f"{label:<12} {peak / 1e6:>10.1f} {elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
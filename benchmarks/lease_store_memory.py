@@ -0,0 +1,113 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Memory benchmark for building the partitioned lease store. Streams N copies
+# of the leases table (each copy with its own building ids) through
+# build_lease_store in fixed-size chunks and reports peak traced memory, which
+# should stay flat as N grows once the spill budget is reached.
+#
+#   python benchmarks/lease_store_memory.py --scales 1 4 16 --spill-rows 50000 --against <git-rev>
+#
+# --against loads lease_store.py from another revision for a side-by-side run.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cre_memory import load_module  # noqa: E402
+
+LEASES_FILE = 'Leases.csv'
+CHUNK_ROWS = 20_000
+
+
+def synthetic_leases(rows=20_000):
+    """Stand-in leases table when the real CSV is not checked out"""
+    rng = np.random.default_rng(0)
+    buildings = rng.integers(0, 3000, rows)
+    return pd.DataFrame({
+        'year': rng.integers(2020, 2025, rows),
+        'quarter': rng.choice(['Q1', 'Q2', 'Q3', 'Q4'], rows),
+        'market': rng.choice(['Manhattan', 'Houston', 'Austin', 'Chicago'], rows),
+        'building_name': [f"Tower {b}" for b in buildings],
+        'building_id': buildings.astype(np.float64),
+        'company_name': [f"Company {c}" for c in rng.integers(0, 5000, rows)],
+        'leasedSF': rng.uniform(1000, 50000, rows),
+        'costarID': (buildings * 7919 + 1).astype(np.float64),
+    })
+
+
+def base_leases():
+    try:
+        base = pd.read_csv(os.path.join(REPO_DIR, LEASES_FILE))
+        if 'building_id' not in base.columns:
+            raise ValueError('not a data file (git-lfs pointer?)')
+        return base
+    except (OSError, ValueError):
+        return synthetic_leases()
+
+
+def scaled_chunks(base, scale, chunk_rows=CHUNK_ROWS):
+    """Yield scale copies of base in chunks, generated on the fly so the input is never held whole"""
+    offset = float(base['building_id'].max() + 1)
+    for k in range(scale):
+        copy = base.assign(building_id=base['building_id'] + k * offset,
+                           costarID=base['costarID'] + k * offset)
+        for start in range(0, len(copy), chunk_rows):
+            yield copy.iloc[start:start + chunk_rows]
+
+
+def measure(module, base, scale, spill_rows):
+    cache_dir = tempfile.mkdtemp(prefix='lease-store-')
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+        kwargs = {'spill_rows': spill_rows} if 'spill_rows' in module.build_lease_store.__code__.co_varnames else {}
+        module.build_lease_store(scaled_chunks(base, scale), f"bench{scale}", cache_dir=cache_dir, **kwargs)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory benchmark for build_lease_store')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--spill-rows', type=int, default=50_000)
+    parser.add_argument('--against', help='git revision to compare with')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    base = base_leases()
+    workdir = tempfile.mkdtemp(prefix='lease-memory-')
+    print(f"{len(base):,} lease rows per copy, spill budget {args.spill_rows:,} rows")
+
+    variants = [('current', os.path.join(REPO_DIR, 'lease_store.py'))]
+    if args.against:
+        legacy_path = os.path.join(workdir, 'lease_store_legacy.py')
+        source = subprocess.run(['git', '-C', REPO_DIR, 'show', f'{args.against}:lease_store.py'],
+                                check=True, capture_output=True, text=True).stdout
+        with open(legacy_path, 'w') as f:
+            f.write(source)
+        variants.insert(0, (args.against, legacy_path))
+
+    print(f"{'version':<12} {'rows':>10} {'peak MB':>10} {'seconds':>10}")
+    for label, path in variants:
+        module = load_module(f"lease_store_{label}".replace('-', '_'), path)
+        for scale in args.scales:
+            peak, elapsed = measure(module, base, scale, args.spill_rows)
+            print(f"{label:<12} {len(base) * scale:>10,} {peak / 1e6:>10.1f} {elapsed:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import plotly.io as pio
+
+# Payload benchmark for the largest cre_presentation figures: JSON text as
+# produced by plotly.py versus the binary (base64 typed array) transport.
+#
+#   python benchmarks/transport_size.py --scale 100
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cre_memory import OCCUPANCY_FILE, load_module, scaled_occupancy  # noqa: E402
+
+
+def timed(func, repeat=3):
+    """Best of repeat runs: (result, seconds)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON vs binary payload size for the cre_presentation figures')
+    parser.add_argument('--scale', type=int, default=100)
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    workdir = tempfile.mkdtemp(prefix='cre-transport-')
+    df = scaled_occupancy(args.scale)
+    df.to_csv(os.path.join(workdir, OCCUPANCY_FILE), index=False)
+    os.chdir(workdir)
+    print(f"{len(df):,} occupancy rows ({args.scale}x)")
+
+    module = load_module('cre_current', os.path.join(REPO_DIR, 'cre_presentation.py'))
+    from binary_transport import count_points, figure_payload
+
+    quarterly = module.add_coordinates(module.quarterly_df)
+    figures = {
+        'enhanced map': module.create_enhanced_map_visualization(quarterly),
+        'bar race': module.create_bar_chart_race(quarterly),
+        'small multiples': module.create_small_multiples(quarterly),
+    }
+
+    print(f"{'figure':<18} {'points':>10} {'json MB':>9} {'json s':>8} {'binary MB':>10} {'binary s':>9} {'size x':>7}")
+    for name, fig in figures.items():
+        json_text, json_s = timed(lambda: pio.to_json(fig, validate=False))
+        binary_text, binary_s = timed(lambda: figure_payload(fig))
+        print(f"{name:<18} {count_points(fig):>10,} {len(json_text) / 1e6:>9.2f} {json_s:>8.2f} "
+              f"{len(binary_text) / 1e6:>10.2f} {binary_s:>9.2f} {len(json_text) / len(binary_text):>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
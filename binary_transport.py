@@ -0,0 +1,251 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit.components.v1 as components
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+from plotly.utils import PlotlyJSONEncoder
+
+from column_store import CACHE_DIR
+
+# Binary transport for Plotly figures. Numeric arrays are shipped as base64
+# packed typed arrays ({dtype, bdata, shape}) instead of JSON number text, and
+# string arrays (market names, labels, colours) are dictionary-encoded against
+# one string table shared by the whole figure, so animation frames that repeat
+# the same labels only pay for a few bytes of codes each. A small decoder turns
+# both back into typed and plain arrays before plotting. The chart is a static
+# Streamlit component that loads the plotly.js bundled with the installed
+# plotly package from the Streamlit server, so no CDN is needed.
+MIN_PACKED_LENGTH = 64
+COMPONENT_NAME = 'binary_plotly_chart'
+
+# Typed array codes understood by plotly.js (it has no 64-bit integer type)
+TYPED_ARRAY_CODES = {
+    'float64': 'f8', 'float32': 'f4',
+    'int32': 'i4', 'int16': 'i2', 'int8': 'i1',
+    'uint32': 'u4', 'uint16': 'u2', 'uint8': 'u1',
+}
+
+DECODER_JS = """
+const TYPED_ARRAYS = {
+    f8: Float64Array, f4: Float32Array, i4: Int32Array, i2: Int16Array, i1: Int8Array,
+    u4: Uint32Array, u2: Uint16Array, u1: Uint8Array
+};
+function decodePacked(node, strings) {
+    if (Array.isArray(node)) {
+        return node.map(function (value) { return decodePacked(value, strings); });
+    }
+    if (node === null || typeof node !== 'object') {
+        return node;
+    }
+    if (node.bdata !== undefined && TYPED_ARRAYS[node.dtype] !== undefined) {
+        const bytes = Uint8Array.from(atob(node.bdata), function (c) { return c.charCodeAt(0); });
+        const values = new TYPED_ARRAYS[node.dtype](bytes.buffer);
+        if (node.strings === true) {
+            return Array.from(values, function (code) { return strings[code]; });
+        }
+        if (node.shape !== undefined) {
+            const columns = Number(node.shape.split(',')[1]);
+            return Array.from({length: values.length / columns}, function (_, row) {
+                return values.subarray(row * columns, (row + 1) * columns);
+            });
+        }
+        return values;
+    }
+    const decoded = {};
+    for (const key in node) {
+        decoded[key] = decodePacked(node[key], strings);
+    }
+    return decoded;
+}
+"""
+
+# Minimal component frontend: the Streamlit handshake, then decode and plot
+COMPONENT_HTML = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><script src="{plotly_js}"></script></head>
+<body style="margin:0">
+<div id="chart"></div>
+<script>
+{decoder}
+function send(type, data) {{
+    window.parent.postMessage(Object.assign({{isStreamlitMessage: true, type: type}}, data), '*');
+}}
+window.addEventListener('message', function (event) {{
+    if (event.data.type !== 'streamlit:render') {{
+        return;
+    }}
+    const args = event.data.args;
+    const packed = JSON.parse(args.payload);
+    const figure = decodePacked({{data: packed.data, layout: packed.layout, frames: packed.frames}}, packed.strings);
+    const chart = document.getElementById('chart');
+    chart.style.height = args.height + 'px';
+    Plotly.react(chart, figure.data, figure.layout, {{responsive: true}}).then(function (gd) {{
+        if (figure.frames.length) {{
+            Plotly.addFrames(gd, figure.frames);
+        }}
+        send('streamlit:setFrameHeight', {{height: args.height + 20}});
+    }});
+}});
+send('streamlit:componentReady', {{apiVersion: 1}});
+</script>
+</body>
+</html>
+"""
+
+_component = None
+
+
+def _typed_values(values):
+    """Numeric array in a dtype plotly.js has a typed array for, or None"""
+    if values.dtype.kind == 'b':
+        return values.astype(np.uint8)
+    if values.dtype.kind in 'iu' and values.dtype.name not in TYPED_ARRAY_CODES:
+        # 64-bit integers: narrow when the range allows, otherwise send floats
+        if values.size and values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max:
+            return values.astype(np.int32)
+        return values.astype(np.float64)
+    if values.dtype.name in TYPED_ARRAY_CODES:
+        return values
+    return None
+
+
+def _encode(typed):
+    """Base64 of the little-endian bytes of a typed array"""
+    little_endian = np.ascontiguousarray(typed, dtype=typed.dtype.newbyteorder('<'))
+    return base64.b64encode(little_endian.tobytes()).decode('ascii')
+
+
+def pack_array(values, min_length=MIN_PACKED_LENGTH):
+    """Typed array spec for a numeric array, or the array unchanged"""
+    if not isinstance(values, np.ndarray) or values.size < min_length or values.ndim > 2:
+        return values
+    typed = _typed_values(values)
+    if typed is None:
+        return values
+    spec = {'dtype': TYPED_ARRAY_CODES[typed.dtype.name], 'bdata': _encode(typed)}
+    if typed.ndim == 2:
+        spec['shape'] = f'{typed.shape[0]},{typed.shape[1]}'
+    return spec
+
+
+def pack_strings(values, strings):
+    """Codes into the shared string table for an array of strings (None for blanks)"""
+    codes = np.fromiter((strings.setdefault(value, len(strings)) for value in values),
+                        dtype=np.uint32, count=len(values))
+    dtype = np.uint8 if len(strings) <= 256 else np.uint16 if len(strings) <= 65536 else np.uint32
+    typed = codes.astype(dtype)
+    return {'dtype': TYPED_ARRAY_CODES[typed.dtype.name], 'bdata': _encode(typed), 'strings': True}
+
+
+def _is_label(value):
+    """Strings, plus the blanks (None/NaN) that pandas puts in label columns"""
+    return isinstance(value, str) or value is None or (isinstance(value, float) and value != value)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def _pack(node, min_length, strings):
+    """Walk a figure dict, replacing long numeric and string arrays with packed specs"""
+    if isinstance(node, dict):
+        return {key: _pack(value, min_length, strings) for key, value in node.items()}
+    if isinstance(node, np.ndarray) and node.ndim == 1 and node.dtype.kind in 'OU':
+        node = node.tolist()
+    if isinstance(node, (list, tuple)):
+        if len(node) >= min_length and all(_is_label(value) for value in node):
+            return pack_strings([value if isinstance(value, str) else None for value in node], strings)
+        # Plain lists of numbers are packed like arrays
+        if len(node) >= min_length and all(_is_number(value) for value in node):
+            return pack_array(np.asarray(node, dtype=np.float64), min_length)
+        return [_pack(value, min_length, strings) for value in node]
+    if isinstance(node, np.ndarray):
+        return pack_array(node, min_length)
+    return node
+
+
+def pack_figure(fig, min_length=MIN_PACKED_LENGTH):
+    """Figure as a dict with data, layout, frames and the shared string table"""
+    if isinstance(fig, go.Figure):
+        fig = fig.to_dict()
+    strings = {}
+    packed = {
+        'data': _pack(fig.get('data', []), min_length, strings),
+        'layout': _pack(fig.get('layout', {}), min_length, strings),
+        'frames': _pack(fig.get('frames', []), min_length, strings),
+    }
+    packed['strings'] = list(strings)
+    return packed
+
+
+def figure_payload(fig, min_length=MIN_PACKED_LENGTH):
+    """JSON text of the packed figure"""
+    return json.dumps(pack_figure(fig, min_length), cls=PlotlyJSONEncoder, separators=(',', ':'))
+
+
+def component_dir(cache_dir=CACHE_DIR):
+    """Directory with the component page and the installed plotly.js, written once per plotly.js version"""
+    version = get_plotlyjs_version()
+    target = os.path.abspath(os.path.join(cache_dir, f"{COMPONENT_NAME}-{version}"))
+    if os.path.exists(os.path.join(target, 'index.html')):
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write into a scratch directory and rename, like the column store tables
+    scratch = tempfile.mkdtemp(prefix=f".{COMPONENT_NAME}-", dir=cache_dir)
+    plotly_js = f"plotly-{version}.min.js"
+    with open(os.path.join(scratch, plotly_js), 'w', encoding='utf-8') as f:
+        f.write(get_plotlyjs())
+    with open(os.path.join(scratch, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(COMPONENT_HTML.format(plotly_js=plotly_js, decoder=DECODER_JS))
+    try:
+        os.rename(scratch, target)
+    except OSError:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return target
+
+
+def binary_plotly_chart(fig, height=None, min_length=MIN_PACKED_LENGTH, key=None):
+    """Render a Plotly figure in Streamlit through the binary transport"""
+    global _component
+    if _component is None:
+        _component = components.declare_component(COMPONENT_NAME, path=component_dir())
+    if height is None:
+        height = fig.layout.height or 500
+    _component(payload=figure_payload(fig, min_length), height=height, key=key, default=None)
+
+
+# Coordinate arrays that define a trace's points; other per-point arrays
+# (text, marker sizes and colours) scale with these
+# Every per-point array a trace may carry: coordinates plus the payload arrays
+# (animated map frames ship sizes and customdata but no coordinates)
+POINT_PROPERTIES = ('x', 'y', 'z', 'lat', 'lon', 'values', 'locations', 'ids',
+                    'text', 'hovertext', 'customdata')
+MARKER_PROPERTIES = ('size', 'color')
+
+
+def _array_size(value):
+    if isinstance(value, np.ndarray):
+        return value.size
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], (list, tuple, np.ndarray)):
+            return sum(_array_size(row) for row in value)
+        return len(value)
+    return 0
+
+
+def count_points(fig):
+    """Per-point array entries across traces and frames, read from the trace arrays without serialising the figure"""
+    traces = list(fig.data) + [trace for frame in fig.frames for trace in frame.data]
+    total = 0
+    for trace in traces:
+        total += sum(_array_size(getattr(trace, name, None)) for name in POINT_PROPERTIES)
+        marker = getattr(trace, 'marker', None)
+        if marker is not None:
+            total += sum(_array_size(getattr(marker, name, None)) for name in MARKER_PROPERTIES)
+    return total
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# On-disk column store for the panel-shaped tables (market x quarter x metric).
+# Each column is saved as its own .npy file and opened memory-mapped read-only,
+# so every session and process maps the same pages instead of holding a copy.
+# Text columns are dictionary-encoded: integer codes on disk plus a category list.
+CACHE_DIR = 'cache'
+
+
+def data_version(*paths):
+    """Fingerprint source files by name, size and modification time"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _table_dir(name, version, cache_dir):
+    return os.path.join(cache_dir, f"{name}-{version}")
+
+
+def write_table(df, name, version, cache_dir=CACHE_DIR):
+    """Persist a frame as one .npy file per column"""
+    target = _table_dir(name, version, cache_dir)
+    if os.path.exists(target):
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Write into a scratch directory and rename, so readers never see half a table
+    scratch = tempfile.mkdtemp(prefix=f".{name}-", dir=cache_dir)
+    meta = {'columns': [], 'index_name': df.index.name}
+    for i, column in enumerate(df.columns):
+        values = df[column].to_numpy()
+        entry = {'name': column, 'file': f"col{i}.npy"}
+        if values.dtype.kind in 'biufcmM':
+            np.save(os.path.join(scratch, entry['file']), values)
+        else:
+            codes, categories = pd.factorize(df[column])
+            np.save(os.path.join(scratch, entry['file']), codes.astype(np.int32))
+            entry['categories'] = [str(c) for c in categories]
+        meta['columns'].append(entry)
+    with open(os.path.join(scratch, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    try:
+        os.rename(scratch, target)
+    except OSError:
+        # Another process finished the same version first
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    # Drop stale versions of this table
+    for entry in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, entry)
+        if entry.rsplit('-', 1)[0] == name and path != target:
+            shutil.rmtree(path, ignore_errors=True)
+    return target
+
+
+def table_exists(name, version, cache_dir=CACHE_DIR):
+    """Whether a complete table for this version is on disk"""
+    return os.path.exists(os.path.join(_table_dir(name, version, cache_dir), 'meta.json'))
+
+
+def drop_table(name, version, cache_dir=CACHE_DIR):
+    """Delete one stored table version, e.g. a scratch table that has been merged"""
+    shutil.rmtree(_table_dir(name, version, cache_dir), ignore_errors=True)
+
+
+def open_table(name, version, cache_dir=CACHE_DIR, rows=None):
+    """Open a stored table as a read-only DataFrame backed by memory-mapped columns.
+
+    rows is an optional slice; only those rows are read and decoded. Every
+    column, decoded text included, is a read-only array, and loaders that
+    cache the frame share it across sessions: writing into an existing column
+    (.loc/.iloc assignment, inplace=True) raises "assignment destination is
+    read-only". Add columns with extend_table, or .copy() before mutating.
+    """
+    target = _table_dir(name, version, cache_dir)
+    with open(os.path.join(target, 'meta.json')) as f:
+        meta = json.load(f)
+
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(target, entry['file']), mmap_mode='r')
+        if rows is not None:
+            values = values[rows]
+        if 'categories' in entry:
+            # Decode text once; code -1 (missing) picks up the trailing NaN
+            lookup = np.array(entry['categories'] + [np.nan], dtype=object)
+            values = lookup[values]
+            values.flags.writeable = False
+        data[entry['name']] = values
+    df = pd.DataFrame(data, copy=False)
+    df.index.name = meta['index_name']
+    return df
+
+
+def load_table(path, name=None, cache_dir=CACHE_DIR):
+    """Open a CSV through the column store, converting it on first use (read-only, see open_table)"""
+    name = name or os.path.splitext(os.path.basename(path))[0].replace(' ', '_')
+    version = data_version(path)
+    if not table_exists(name, version, cache_dir):
+        write_table(pd.read_csv(path), name, version, cache_dir)
+    return open_table(name, version, cache_dir)
+
+
+def extend_table(df, **columns):
+    """Return a frame with extra columns that shares the existing column buffers"""
+    data = {column: df[column].to_numpy() for column in df.columns}
+    data.update({column: np.asarray(values) for column, values in columns.items()})
+    return pd.DataFrame(data, index=df.index, copy=False)
+
+
+def group_views(df, column):
+    """Split a frame whose rows are grouped by column into per-value row-slice views"""
+    values = df[column].to_numpy()
+    if len(values) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    views = {}
+    for start, end in zip(starts, ends):
+        if values[start] in views:
+            raise ValueError(f"Rows for {values[start]!r} are not contiguous in column {column!r}")
+        views[values[start]] = df.iloc[start:end]
+    return views
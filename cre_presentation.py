@@ -7,7 +7,14 @@ from plotly.subplots import make_subplots
 import matplotlib.pyplot as plt
 import time
 import os
+import threading
 import plotly.io as pio
+from column_store import data_version, load_table, extend_table, group_views
+from market_metadata import market_columns, with_market_metadata
+from binary_transport import binary_plotly_chart, count_points
+from forecasting import PATHS, forecast_fans, load_forecast_fans
+from geo_figures import region_frame_traces, small_multiples_figure
+from event_annotations import add_event_panel, add_events, events_for
 
 # Page configuration
 st.set_page_config(
@@ -305,51 +312,44 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Data preparation functions
-@st.cache_data
-def load_actual_data():
-    """Load actual data from CSV file"""
-    # Check if the file exists
-    file_path = "Major Market Occupancy Data-revised.csv"
-    if not os.path.exists(file_path):
-        st.error(f"Data file not found: {file_path}")
-        return pd.DataFrame()
-    
+OCCUPANCY_FILE = "Major Market Occupancy Data-revised.csv"
+
+@st.cache_resource
+def load_actual_data(version):
+    """Load actual data through the shared memory-mapped column store.
+
+    The frame is shared by every session and its columns are read-only;
+    .copy() before any in-place edit.
+    """
     # Load the data
-    df = pd.read_csv(file_path)
+    df = load_table(OCCUPANCY_FILE)
     
     # Add market_quarter column for easier filtering
     df['market_quarter'] = df['market'] + '_' + df['year'].astype(str) + '_' + df['quarter']
     
     # Add recovery metrics - calculate recovery percentage based on pre-pandemic levels
     # We'll consider the average occupancy from 2019 Q4 as baseline (not in this dataset, so using 2020 Q1)
-    baseline_df = df[(df['year'] == 2020) & (df['quarter'] == 'Q1')].copy()
-    baseline_df = baseline_df.set_index('market')['starting_occupancy_proportion'].to_dict()
-    
-    # Calculate recovery percentage
-    df['recovery_percentage'] = df.apply(
-        lambda row: (row['ending_occupancy_proportion'] / baseline_df.get(row['market'], 1)) * 100, 
-        axis=1
-    )
-    
-    # Create region mapping
-    region_map = {
-        'Austin': 'Texas', 
-        'Dallas/Ft Worth': 'Texas', 
-        'Houston': 'Texas',
-        'Manhattan': 'East', 
-        'Washington D.C.': 'East', 
-        'Philadelphia': 'East',
-        'San Francisco': 'West', 
-        'Los Angeles': 'West', 
-        'South Bay/San Jose': 'West',
-        'Chicago': 'Midwest'
-    }
-    df['region'] = df['market'].map(region_map)
+    baseline_mask = (df['year'] == 2020) & (df['quarter'] == 'Q1')
+    baseline = df.loc[baseline_mask, 'starting_occupancy_proportion']
+    baseline.index = df.loc[baseline_mask, 'market']
+    baseline = baseline[~baseline.index.duplicated(keep='last')]
+    
+    # Calculate recovery percentage (markets without a baseline fall back to 1)
+    df['recovery_percentage'] = df['ending_occupancy_proportion'] / df['market'].map(baseline).fillna(1) * 100
+    
+    # Add the slide region split from the market metadata table
+    df = with_market_metadata(df, ['presentation_region'], rename={'presentation_region': 'region'})
     
     return df
 
 # Load the actual data
-actual_df = load_actual_data()
+if os.path.exists(OCCUPANCY_FILE):
+    occupancy_version = data_version(OCCUPANCY_FILE)
+    actual_df = load_actual_data(occupancy_version)
+else:
+    st.error(f"Data file not found: {OCCUPANCY_FILE}")
+    occupancy_version = None
+    actual_df = pd.DataFrame()
 
 # Create a function to get the latest data
 def get_latest_data(df):
@@ -363,103 +363,56 @@ def get_latest_data(df):
 
 # Create geographical coordinates for markets
 def add_coordinates(df):
-    # Add coordinates for each market
-    coordinates = {
-        'Austin': [30.2672, -97.7431],
-        'Dallas/Ft Worth': [32.7767, -96.7970],
-        'Houston': [29.7604, -95.3698],
-        'Manhattan': [40.7831, -73.9712],
-        'San Francisco': [37.7749, -122.4194],
-        'South Bay/San Jose': [37.3382, -121.8863],
-        'Chicago': [41.8781, -87.6298],
-        'Los Angeles': [34.0522, -118.2437],
-        'Washington D.C.': [38.9072, -77.0369],
-        'Philadelphia': [39.9526, -75.1652]
-    }
-    
-    # Add lat and lon columns
-    df['lat'] = df['market'].map(lambda x: coordinates.get(x, [0, 0])[0])
-    df['lon'] = df['market'].map(lambda x: coordinates.get(x, [0, 0])[1])
-    
-    return df
+    # Add lat and lon columns without touching the (shared) input frame
+    return with_market_metadata(df, ['lat', 'lon'], defaults={'lat': 0, 'lon': 0})
 
 # Create a function to get quarterly data in the right format
-@st.cache_data
-def prepare_quarterly_data(df):
-    # Format quarters for easier sorting
-    
-    # Clone the dataframe to avoid modifying the original
-    formatted_df = df.copy()
-    
+# Shared across sessions like the raw table: every derived column is built once
+# from whole-column arrays, so no intermediate frame copies are made. Callers
+# must treat the result as read-only and slice it with group_views().
+@st.cache_resource
+def prepare_quarterly_data(_df, version):
     # Key insight: For 2020 Q1 (pre-pandemic baseline), use starting_occupancy_proportion
     # which has the high pre-COVID values (95-99%), not ending_occupancy_proportion
     # This fixes the issue with baseline bubble sizes
     
     # Create mask for 2020 Q1 data
-    mask_2020q1 = (formatted_df['year'] == 2020) & (formatted_df['quarter'] == 'Q1')
+    mask_2020q1 = ((_df['year'] == 2020) & (_df['quarter'] == 'Q1')).to_numpy()
+    starting = _df['starting_occupancy_proportion'].to_numpy()
     
     # For 2020 Q1 records, use starting_occupancy_proportion (pre-COVID values)
-    # Use proper .loc assignment to avoid SettingWithCopyWarning
-    formatted_df.loc[mask_2020q1, 'ending_occupancy_proportion'] = formatted_df.loc[mask_2020q1, 'starting_occupancy_proportion']
-    
-    # Create a year_quarter column for easier reference
-    formatted_df['year_quarter'] = formatted_df['year'].astype(str) + '-' + formatted_df['quarter']
-    
-    # Prepare market significance - this is a proxy for the importance of the market
-    market_significance = {
-        'Manhattan': 100,
-        'San Francisco': 90,
-        'Chicago': 85,
-        'Boston': 80,
-        'Washington D.C.': 85,
-        'Los Angeles': 90,
-        'Dallas/Ft Worth': 85,
-        'Houston': 80,
-        'Atlanta': 75,
-        'Denver': 70,
-        'Austin': 75,
-        'Philadelphia': 70,
-        'South Bay/San Jose': 80,
-    }
-    
-    # Add market significance
-    formatted_df['significance'] = formatted_df['market'].map(lambda x: market_significance.get(x, 50))
-    
-    # Add market regions for regional analysis
-    market_regions = {
-        'Manhattan': 'East',
-        'Boston': 'East',
-        'Washington D.C.': 'East',
-        'Philadelphia': 'East',
-        'Chicago': 'Midwest',
-        'Dallas/Ft Worth': 'Texas',
-        'Houston': 'Texas',
-        'Austin': 'Texas',
-        'San Francisco': 'West',
-        'Los Angeles': 'West',
-        'South Bay/San Jose': 'West',
-        'Denver': 'West',
-        'Atlanta': 'South',
-    }
-    
-    # Add region
-    formatted_df['region'] = formatted_df['market'].map(lambda x: market_regions.get(x, 'Other'))
-    
-    # Calculate recovery percentage based on 2020 Q1 baseline
-    baseline = formatted_df[mask_2020q1].copy()
-    baseline = baseline[['market', 'starting_occupancy_proportion']]
-    baseline = baseline.rename(columns={'starting_occupancy_proportion': 'baseline_occupancy'})
-    
-    # Merge with main dataframe
-    formatted_df = formatted_df.merge(baseline, on='market', how='left')
-    
-    # Calculate recovery percentage (current occupancy as a percentage of baseline)
-    formatted_df['recovery_percentage'] = (formatted_df['ending_occupancy_proportion'] / formatted_df['baseline_occupancy']) * 100
+    ending = np.where(mask_2020q1, starting, _df['ending_occupancy_proportion'].to_numpy())
+    
+    # Baseline occupancy per market from 2020 Q1
+    baseline = pd.Series(starting[mask_2020q1], index=_df['market'].to_numpy()[mask_2020q1])
+    baseline = baseline[~baseline.index.duplicated()]
+    baseline_occupancy = _df['market'].map(baseline).to_numpy()
+    
+    # Market significance (a proxy for the importance of the market) and
+    # region come from the market metadata table
+    metadata = market_columns(_df['market'], ['significance', 'presentation_region'])
+    
+    formatted_df = extend_table(
+        _df,
+        ending_occupancy_proportion=ending,
+        # Create a year_quarter column for easier reference
+        year_quarter=_df['year'].astype(str) + '-' + _df['quarter'],
+        significance=metadata['significance'],
+        region=metadata['presentation_region'],
+        baseline_occupancy=baseline_occupancy,
+        # Calculate recovery percentage (current occupancy as a percentage of baseline)
+        recovery_percentage=ending / baseline_occupancy * 100
+    )
+    
+    # Order rows by quarter once so every quarter is a contiguous slice
+    quarter_key = _df['year'].to_numpy() * 10 + _df['quarter'].str[-1].astype(int).to_numpy()
+    if np.any(np.diff(quarter_key) < 0):
+        formatted_df = formatted_df.iloc[np.argsort(quarter_key, kind='stable')].reset_index(drop=True)
     
     return formatted_df
 
 # Replace the previous sample data functions with actual data
-quarterly_df = prepare_quarterly_data(actual_df)
+quarterly_df = prepare_quarterly_data(actual_df, occupancy_version)
 latest_df = get_latest_data(actual_df)
 
 # Create visualizations
@@ -701,146 +654,33 @@ def create_strategic_recommendations():
 
 # Updated version of enhanced map visualization 
 def create_enhanced_map_visualization(quarterly_df):
-    # Make a deep copy of the dataframe to avoid modification warnings
-    quarterly_df = quarterly_df.copy(deep=True)
-    
-    # Create frames for animation
-    unique_quarters = quarterly_df['year_quarter'].unique()
+    # Unique quarters in display order
+    unique_quarters = list(pd.unique(quarterly_df['year_quarter']))
     
-    # Store traces for markets (especially Texas ones) by quarter
-    texas_traces = {}
-    for quarter in unique_quarters:
-        quarter_df = quarterly_df[quarterly_df['year_quarter'] == quarter].copy()
-        texas_quarter_df = quarter_df[quarter_df['region'] == 'Texas'].copy()
-        
-        # Store Texas traces for this quarter
-        texas_traces[quarter] = []
-        for _, row in texas_quarter_df.iterrows():
-            trace = go.Scattergeo(
-                lon=[row['lon']],
-                lat=[row['lat']],
-                mode='markers',
-                marker=dict(
-                    size=row['ending_occupancy_proportion'] * 30,  # Size based on occupancy
-                    color='#10B981',
-                    opacity=0.8,
-                    line=dict(width=2, color='white')
-                ),
-                name=row['market'],
-                hovertext=row['market'],
-                customdata=[[
-                    row['market'],
-                    row['ending_occupancy_proportion'],
-                    row['recovery_percentage'],
-                    row['region']
-                ]],
-                hovertemplate=(
-                    "<b>%{hovertext}</b><br>" +
-                    "Quarter: " + quarter + "<br>" +
-                    "Occupancy: %{customdata[0][1]:.1%}<br>" +
-                    "Recovery: %{customdata[0][2]:.1f}%<br>" +
-                    "Region: %{customdata[0][3]}<br>" +
-                    "<extra></extra>"
-                ),
-                showlegend=False
-            )
-            texas_traces[quarter].append(trace)
+    # One trace per region; Texas markets are outlined to stand out
+    region_styles = {
+        'East': dict(color='#3730A3', opacity=0.7),  # Indigo/blue
+        'West': dict(color='#DB2777', opacity=0.7),  # Pink
+        'Midwest': dict(color='#F59E0B', opacity=0.7),  # Amber
+        'Texas': dict(color='#10B981', opacity=0.8, line=dict(width=2, color='white'))  # Emerald/green
+    }
     
-    # Create a first frame to establish the base visualization
-    base_quarter = unique_quarters[0]
-    base_df = quarterly_df[quarterly_df['year_quarter'] == base_quarter].copy()
+    # Frames only patch marker sizes and hover data; locations are sent once
+    traces, frames = region_frame_traces(
+        quarterly_df,
+        region_styles,
+        hovertemplate=(
+            "<b>%{hovertext}</b><br>" +
+            "Quarter: %{customdata[0]}<br>" +
+            "Occupancy: %{customdata[1]:.1%}<br>" +
+            "Recovery: %{customdata[2]:.1f}%<br>" +
+            "Region: %{customdata[3]}<br>" +
+            "<extra></extra>"
+        )
+    )
     
     # Create map
-    fig = go.Figure()
-    
-    # Add a base layer with all markets
-    for region in ['East', 'West', 'Midwest', 'Texas']:
-        region_df = base_df[base_df['region'] == region].copy()
-        
-        # Define color by region
-        color = {
-            'East': '#3730A3',  # Indigo/blue
-            'West': '#DB2777',  # Pink
-            'Midwest': '#F59E0B',  # Amber
-            'Texas': '#10B981'  # Emerald/green
-        }[region]
-        
-        # Add regular markets (non-Texas)
-        if region != 'Texas':
-            fig.add_trace(go.Scattergeo(
-                lon=region_df['lon'],
-                lat=region_df['lat'],
-                mode='markers',
-                marker=dict(
-                    size=region_df['ending_occupancy_proportion'] * 30,
-                    color=color,
-                    opacity=0.7,
-                ),
-                name=region,
-                hovertext=region_df['market'],
-                customdata=region_df[['market', 'ending_occupancy_proportion', 'recovery_percentage', 'region']],
-                hovertemplate=(
-                    "<b>%{hovertext}</b><br>" +
-                    "Quarter: " + base_quarter + "<br>" +
-                    "Occupancy: %{customdata[1]:.1%}<br>" +
-                    "Recovery: %{customdata[2]:.1f}%<br>" +
-                    "Region: %{customdata[3]}<br>" +
-                    "<extra></extra>"
-                )
-            ))
-    
-    # Add Texas traces for first quarter
-    for trace in texas_traces[base_quarter]:
-        fig.add_trace(trace)
-    
-    # Create frames for animation
-    frames = []
-    for quarter in unique_quarters:
-        quarter_df = quarterly_df[quarterly_df['year_quarter'] == quarter].copy()
-        
-        # Frame for non-Texas markets
-        frame_data = []
-        for region in ['East', 'West', 'Midwest']:
-            region_df = quarter_df[quarter_df['region'] == region].copy()
-            
-            # Define color by region
-            color = {
-                'East': '#3730A3',  # Indigo
-                'West': '#DB2777',  # Pink
-                'Midwest': '#F59E0B',  # Amber
-            }[region]
-            
-            trace = go.Scattergeo(
-                lon=region_df['lon'],
-                lat=region_df['lat'],
-                mode='markers',
-                marker=dict(
-                    size=region_df['ending_occupancy_proportion'] * 30,
-                    color=color,
-                    opacity=0.7,
-                ),
-                name=region,
-                hovertext=region_df['market'],
-                customdata=region_df[['market', 'ending_occupancy_proportion', 'recovery_percentage', 'region']],
-                hovertemplate=(
-                    "<b>%{hovertext}</b><br>" +
-                    "Quarter: " + quarter + "<br>" +
-                    "Occupancy: %{customdata[1]:.1%}<br>" +
-                    "Recovery: %{customdata[2]:.1f}%<br>" +
-                    "Region: %{customdata[3]}<br>" +
-                    "<extra></extra>"
-                )
-            )
-            frame_data.append(trace)
-        
-        # Add Texas traces for this quarter
-        frame_data.extend(texas_traces[quarter])
-        
-        # Create frame
-        frames.append(go.Frame(data=frame_data, name=quarter))
-    
-    # Add frames to figure
-    fig.frames = frames
+    fig = go.Figure(data=traces, frames=frames)
     
     # Add slider and buttons for animation control
     sliders = [dict(
@@ -940,44 +780,8 @@ def create_enhanced_map_visualization(quarterly_df):
         height=550
     )
     
-    # Add enhanced hover template
-    fig.update_traces(
-        hovertemplate=(
-            "<b>%{hovertext}</b><br>" +
-            "Quarter: %{customdata[0]}<br>" +
-            "Occupancy: %{customdata[1]:.1%}<br>" +
-            "Recovery: %{customdata[2]:.1f}%<br>" +
-            "Region: %{customdata[3]}<br>" +
-            "<extra></extra>"
-        )
-    )
-    
-    # Add event annotations
-    events = {
-        '2020-Q1': 'COVID-19 Declared Pandemic (Mar 2020)',
-        '2020-Q2': 'Nationwide Lockdowns (Apr-Jun 2020)',
-        '2020-Q4': 'Vaccine Development Announced (Dec 2020)',
-        '2021-Q1': 'Vaccine Rollout Begins (Jan-Mar 2021)',
-        '2021-Q3': 'Delta Variant Surge (Jul-Sep 2021)',
-        '2022-Q1': 'Return to Office Policies Implemented (Q1 2022)',
-    }
-    
     # Create a cleaner event annotation panel
-    for i, (quarter, event) in enumerate(events.items()):
-        fig.add_annotation(
-            x=0.01,
-            y=0.99 - (i * 0.05),
-            xref="paper",
-            yref="paper",
-            text=f"<b>{quarter}</b>: {event}",
-            showarrow=False,
-            align="left",
-            bgcolor="rgba(255, 255, 255, 0.8)",
-            bordercolor="#1E3A8A",
-            borderwidth=1,
-            borderpad=4,
-            font=dict(size=10, color="#1E3A8A")
-        )
+    add_event_panel(fig, events_for('timeline'))
     
     # Add data source citation
     fig.add_annotation(
@@ -1012,180 +816,192 @@ def create_enhanced_map_visualization(quarterly_df):
     
     return fig
 
-# Create small multiples visualization using visualization_app.py styling
-def create_small_multiples(quarterly_df):
-    # Get unique quarters and select key ones
-    all_quarters = sorted(quarterly_df['year_quarter'].unique())
-    
-    # Select meaningful quarters that tell the story
-    key_quarters = [
-        all_quarters[0],                  # Starting point (2020-Q1)
-        all_quarters[1],                  # Initial impact (2020-Q2)
-        all_quarters[len(all_quarters)//2],  # Mid-recovery
-        all_quarters[-1]                  # Current state
-    ]
-    
-    # Better labels for context
-    quarter_titles = {
-        key_quarters[0]: 'Pre-Pandemic',
-        key_quarters[1]: 'Initial Impact',
-        key_quarters[2]: 'Mid-Recovery',
-        key_quarters[3]: 'Current State'
+# One entry: a new data version replaces the previous version's traces
+@st.cache_resource(max_entries=1)
+def small_multiple_trace_cache(version):
+    """Small-multiple traces of one data version keyed by quarter, shared by all sessions, and the lock guarding inserts"""
+    return {}, threading.Lock()
+
+def default_key_quarters(all_quarters):
+    """Quarters that tell the story, with their panel titles"""
+    return {
+        all_quarters[0]: 'Pre-Pandemic',                    # Starting point (2020-Q1)
+        all_quarters[1]: 'Initial Impact',                  # Initial impact (2020-Q2)
+        all_quarters[len(all_quarters)//2]: 'Mid-Recovery',  # Mid-recovery
+        all_quarters[-1]: 'Current State'                   # Current state
     }
-    
-    figs = []
-    
-    # Create small multiple maps with better styling
-    for quarter in key_quarters:
-        # Create proper copies to avoid SettingWithCopyWarning
-        quarter_df = quarterly_df[quarterly_df['year_quarter'] == quarter].copy()
-        
-        # Scale bubble sizes consistently with main visualization - using proper .loc assignment
-        quarter_df.loc[:, 'bubble_size'] = quarter_df['ending_occupancy_proportion'] * 100
+
+# Create small multiples visualization using visualization_app.py styling
+def create_small_multiples(quarterly_df, key_quarters=None, cols=2, version=None):
+    """One subplot figure with a map panel per key quarter ({quarter: title})"""
+    quarter_views = group_views(quarterly_df, 'year_quarter')
+    key_quarters = key_quarters or default_key_quarters(sorted(quarter_views))
+    
+    # Bubble sizes and colors share one scale across all panels
+    occupancy = quarterly_df['ending_occupancy_proportion'].to_numpy()
+    sizeref = 2.0 * np.nanmax(occupancy * 100) / (40 ** 2)  # size_max=40, as px scales it
+    
+    def panel_traces(quarter_df):
+        # Scale bubble sizes consistently with main visualization (derived, not stored on the view)
+        bubble_size = quarter_df['ending_occupancy_proportion'].to_numpy() * 100
+        traces = [go.Scattergeo(
+            lat=quarter_df['lat'],
+            lon=quarter_df['lon'],
+            mode='markers',
+            marker=dict(
+                size=bubble_size,
+                sizemode='area',
+                sizeref=sizeref,
+                color=quarter_df['ending_occupancy_proportion'],
+                coloraxis='coloraxis'
+            ),
+            hovertext=quarter_df['market'],
+            hovertemplate=(
+                "<b>%{hovertext}</b><br>" +
+                "Occupancy: %{marker.color:.1%}<br>" +
+                "<extra></extra>"
+            ),
+            showlegend=False
+        )]
         
-        # Create small map with USA-specific projection like main map
-        try:
-            fig = px.scatter_geo(
-                quarter_df,
-                lat='lat',
-                lon='lon',
-                color='ending_occupancy_proportion',
-                size='bubble_size',  # Use scaled bubble size
-                hover_name='market',
-                projection='albers usa',
-                color_continuous_scale='Viridis',
-                size_max=40,  # Smaller than main viz but still proportional
-                labels={'ending_occupancy_proportion': 'Occupancy Rate'},
-            )
-            
-            # Highlight Texas markets with different marker
-            texas_markets = quarter_df[quarter_df['region'] == 'Texas'].copy()
-            if not texas_markets.empty:
-                fig.add_trace(
-                    go.Scattergeo(
-                        lat=texas_markets['lat'],
-                        lon=texas_markets['lon'],
-                        mode='markers',
-                        marker=dict(
-                            size=texas_markets.loc[:, 'bubble_size'] * 1.2,  # Use .loc for safety
-                            color=texas_markets['ending_occupancy_proportion'],
-                            colorscale='Viridis',
-                            opacity=0.9,
-                            line=dict(width=1, color='white')
-                        ),
-                        name='Texas Markets',
-                        showlegend=False,
-                        hoverinfo='skip'
-                    )
-                )
-            
-            # Better layout with improved styling
-            fig.update_layout(
-                geo=dict(
-                    showland=True,
-                    landcolor='rgb(230, 230, 230)',
-                    showlakes=True,
-                    lakecolor='rgb(200, 230, 255)',
-                    subunitcolor='rgb(180, 180, 180)',
-                    countrycolor='rgb(180, 180, 180)',
-                    showcoastlines=True,
-                    coastlinecolor='rgb(180, 180, 180)',
-                    showsubunits=True
+        # Highlight Texas markets with different marker
+        is_texas = (quarter_df['region'] == 'Texas').to_numpy()
+        if is_texas.any():
+            texas_markets = quarter_df[is_texas]
+            traces.append(go.Scattergeo(
+                lat=texas_markets['lat'],
+                lon=texas_markets['lon'],
+                mode='markers',
+                marker=dict(
+                    size=bubble_size[is_texas] * 1.2,
+                    sizemode='area',
+                    sizeref=sizeref,
+                    color=texas_markets['ending_occupancy_proportion'],
+                    coloraxis='coloraxis',
+                    opacity=0.9,
+                    line=dict(width=1, color='white')
                 ),
-                height=225,
-                width=225,
-                margin=dict(l=0, r=0, t=30, b=0),
-                coloraxis_showscale=False,
-                title=dict(
-                    text=quarter_titles.get(quarter, quarter),
-                    font=dict(size=12),
-                    x=0.5
-                )
-            )
-            
-            # Enhanced hover information
-            fig.update_traces(
-                hovertemplate=(
-                    "<b>%{hovertext}</b><br>" +
-                    "Occupancy: %{marker.color:.1%}<br>" +
-                    "<extra></extra>"
-                )
-            )
-            
-            figs.append(fig)
-        except Exception as e:
-            # Create a simple placeholder if visualization fails
-            st.warning(f"Could not create visualization for {quarter}: {e}")
-            
-    # Add citation to each subplot
-    for fig in figs:
-        fig.add_annotation(
-            x=1.0,
-            y=-0.2,
-            xref="paper",
-            yref="paper",
-            text=(
-                "Source: <a href='https://www.bls.gov/cre/major-market-occupancy-data-2020-2024.html' target='_blank'>"
-                "BLS CRE Dataset</a>"
-            ),
-            showarrow=False,
-            font=dict(size=8),
-            align="right",
-            xanchor="right"
-        )
+                name='Texas Markets',
+                showlegend=False,
+                hoverinfo='skip'
+            ))
+        return traces
+    
+    panels = [(quarter, title, quarter_views[quarter]) for quarter, title in key_quarters.items()]
+    trace_cache, trace_lock = small_multiple_trace_cache(version) if version is not None else (None, None)
+    
+    fig = small_multiples_figure(
+        panels,
+        panel_traces,
+        cols=cols,
+        trace_cache=trace_cache,
+        trace_lock=trace_lock,
+        # Better layout with improved styling, applied to every panel at once
+        geo=dict(
+            projection_type='albers usa',
+            showland=True,
+            landcolor='rgb(230, 230, 230)',
+            showlakes=True,
+            lakecolor='rgb(200, 230, 255)',
+            subunitcolor='rgb(180, 180, 180)',
+            countrycolor='rgb(180, 180, 180)',
+            showcoastlines=True,
+            coastlinecolor='rgb(180, 180, 180)',
+            showsubunits=True
+        ),
+        coloraxis=dict(
+            colorscale='Viridis',
+            cmin=np.nanmin(occupancy),
+            cmax=np.nanmax(occupancy),
+            showscale=False
+        ),
+        margin=dict(l=0, r=0, t=30, b=30)
+    )
     
-    return figs
+    # Add citation below the panels
+    fig.add_annotation(
+        x=1.0,
+        y=-0.05,
+        xref="paper",
+        yref="paper",
+        text=(
+            "Source: <a href='https://www.bls.gov/cre/major-market-occupancy-data-2020-2024.html' target='_blank'>"
+            "BLS CRE Dataset</a>"
+        ),
+        showarrow=False,
+        font=dict(size=8),
+        align="right",
+        xanchor="right"
+    )
+    
+    return fig
 
 # Import fix for Plotly JSON serialization error
 # Add at the top of the file, after other imports
 import plotly.io as pio
 pio.renderers.default = "browser"
 
+# Figures with more per-point array entries than this go through the binary transport
+BINARY_TRANSPORT_POINTS = 50_000
+
 # When displaying Plotly charts in Streamlit, try to use a simpler approach
 def safe_plotly_chart(fig, use_container_width=True):
     """A safer version of st.plotly_chart that handles serialization errors"""
+    # Large figures ship their arrays as packed binary instead of JSON text
+    if count_points(fig) > BINARY_TRANSPORT_POINTS:
+        try:
+            binary_plotly_chart(fig)
+            return
+        except Exception as e:
+            st.warning(f"Binary chart transport failed, sending the chart as JSON: {e}")
     try:
-        # Try the normal approach first
         st.plotly_chart(fig, use_container_width=use_container_width)
     except Exception as e:
         st.error(f"Error displaying chart: {e}")
         # Fall back to a simplified approach
         st.warning("Displaying simplified version of chart")
-        # Convert to a simple HTML representation
-        st.components.v1.html(fig.to_html(), height=500, scrolling=True)
+        # Convert to a simple HTML representation with the bundled plotly.js
+        st.components.v1.html(fig.to_html(include_plotlyjs=True), height=500, scrolling=True)
 
 # Create animated bar chart race for slide 2
 def create_bar_chart_race(quarterly_df):
     # Prepare data for bar chart race
-    # We'll create a new dataframe with each market's occupancy for each quarter
+    # Each quarter is read straight from a row-slice view of the shared data
+    quarter_views = group_views(quarterly_df, 'year_quarter')
     
     # Get unique quarters and markets
-    quarters = quarterly_df['year_quarter'].unique()
-    
-    # Create figure
-    fig = go.Figure()
-    
-    # Add a trace for initial display
-    first_quarter = quarters[0]
-    
-    # Filter data for the first quarter and sort by occupancy
-    filtered_df = quarterly_df[quarterly_df['year_quarter'] == first_quarter].copy()
-    filtered_df = filtered_df.sort_values('recovery_percentage', ascending=True)
+    quarters = list(quarter_views)
     
     # Define colors based on region
-    colors = filtered_df['region'].map({
+    region_colors = {
         'Texas': '#10B981',  # Green
         'East': '#3730A3',   # Blue
         'West': '#DB2777',   # Pink
         'Midwest': '#F59E0B' # Amber
-    })
+    }
+    
+    def ranked_quarter(quarter):
+        """Markets, recovery and colors for one quarter, sorted by recovery"""
+        view = quarter_views[quarter]
+        recovery = view['recovery_percentage'].to_numpy()
+        order = np.argsort(recovery, kind='stable')
+        markets = view['market'].to_numpy()[order]
+        colors = view['region'].map(region_colors).to_numpy()[order]
+        return markets, recovery[order], colors
+    
+    # Create figure
+    fig = go.Figure()
+    
+    # Add a trace for initial display
+    first_quarter = quarters[0]
+    markets, recovery, colors = ranked_quarter(first_quarter)
     
     # Add the bar trace for the first quarter
     fig.add_trace(go.Bar(
-        y=filtered_df['market'],
-        x=filtered_df['recovery_percentage'],
+        y=markets,
+        x=recovery,
         orientation='h',
-        text=filtered_df['recovery_percentage'].apply(lambda x: f"{x:.1f}%"),
+        text=[f"{x:.1f}%" for x in recovery],
         textposition='outside',
         marker_color=colors,
         name=first_quarter,
@@ -1201,25 +1017,16 @@ def create_bar_chart_race(quarterly_df):
     frames = []
     
     for quarter in quarters:
-        # Filter data for this quarter and sort by occupancy
-        filtered_df = quarterly_df[quarterly_df['year_quarter'] == quarter].copy()
-        filtered_df = filtered_df.sort_values('recovery_percentage', ascending=True)
-        
-        # Define colors based on region
-        colors = filtered_df['region'].map({
-            'Texas': '#10B981',  # Green
-            'East': '#3730A3',   # Blue
-            'West': '#DB2777',   # Pink
-            'Midwest': '#F59E0B' # Amber
-        })
+        # Sorted markets for this quarter
+        markets, recovery, colors = ranked_quarter(quarter)
         
         # Create frame
         frame = go.Frame(
             data=[go.Bar(
-                y=filtered_df['market'],
-                x=filtered_df['recovery_percentage'],
+                y=markets,
+                x=recovery,
                 orientation='h',
-                text=filtered_df['recovery_percentage'].apply(lambda x: f"{x:.1f}%"),
+                text=[f"{x:.1f}%" for x in recovery],
                 textposition='outside',
                 marker_color=colors,
                 hovertemplate=(
@@ -1242,7 +1049,7 @@ def create_bar_chart_race(quarterly_df):
         x0=100,
         y0=-1,
         x1=100,
-        y1=len(filtered_df) + 0.5,
+        y1=len(markets) + 0.5,
         line=dict(
             color="rgba(0, 0, 0, 0.3)",
             width=2,
@@ -1255,7 +1062,7 @@ def create_bar_chart_race(quarterly_df):
     # Add annotation for 100% reference line
     fig.add_annotation(
         x=100,
-        y=len(filtered_df) + 0.7,
+        y=len(markets) + 0.7,
         text="100% Recovery<br>(Pre-Pandemic Level)",
         showarrow=False,
         font=dict(size=10, color="rgba(0, 0, 0, 0.5)"),
@@ -1329,14 +1136,14 @@ def create_bar_chart_race(quarterly_df):
     fig.update_layout(
         title="Office Market Recovery Race (% of Pre-Pandemic Levels)",
         xaxis=dict(
-            range=[0, max(120, filtered_df['recovery_percentage'].max() * 1.1)],
+            range=[0, max(120, np.nanmax(recovery) * 1.1)],
             title="Recovery Percentage (%)",
             gridcolor="rgba(0, 0, 0, 0.1)"
         ),
         yaxis=dict(
             title="Market",
             categoryorder="array",
-            categoryarray=filtered_df['market'].tolist(),
+            categoryarray=markets.tolist(),
             gridcolor="rgba(0, 0, 0, 0.1)"
         ),
         updatemenus=[play_buttons],
@@ -1532,24 +1339,11 @@ def create_texas_trend_lines(quarterly_df):
     )
     
     # Add events as vertical lines
-    # Find quarters for key events
-    quarters = sorted(texas_df['year_quarter'].unique())
-    events = {
-        quarters[1]: 'Lockdowns',  # 2020-Q2
-        quarters[4]: 'Vaccines',   # 2021-Q1
-        quarters[8]: 'Return to Office'  # 2022-Q1
-    }
-    
-    for i, (quarter, event) in enumerate(events.items()):
-        quarter_index = quarters.index(quarter)
-        fig.add_vline(
-            x=quarter_index, 
-            line_dash="dash", 
-            line_color="#1E3A8A",
-            annotation_text=event,
-            annotation_font_color="#1E3A8A",
-            annotation_font_size=10
-        )
+    add_events(
+        fig,
+        events_for('texas', texas_df['year_quarter'].unique()),
+        xanchor='left', opacity=1.0, font_size=10
+    )
     
     # Add a reference line for 100% recovery
     fig.add_hline(
@@ -1568,9 +1362,8 @@ def create_texas_trend_lines(quarterly_df):
         legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
         margin=dict(l=30, r=30, t=80, b=30),
         xaxis=dict(
-            tickmode='array',
-            tickvals=list(range(len(quarters))),
-            ticktext=quarters,
+            type='category',
+            categoryorder='category ascending',
             tickangle=45
         ),
         yaxis=dict(range=[0, 120])
@@ -2084,14 +1877,8 @@ def create_industry_concentration_radial(sector_df):
 def slide_1():
     """Market Recovery Evolution slide with citations"""
     
-    # Load the data and create visualizations for the first slide
-    quarterly_data = load_actual_data()
-    
-    # Prepare quarterly data
-    formatted_quarterly_data = prepare_quarterly_data(quarterly_data)
-    
-    # Add coordinates for map visualization
-    formatted_quarterly_data = add_coordinates(formatted_quarterly_data)
+    # Add coordinates for map visualization to the shared quarterly data
+    formatted_quarterly_data = add_coordinates(quarterly_df)
     
     # Display title and subtitle
     st.markdown("<h1 style='text-align: center; color: #1E3A8A;'>Market Recovery Evolution</h1>", unsafe_allow_html=True)
@@ -2164,18 +1951,10 @@ def slide_1():
         
         # Small multiples with citation
         st.markdown("<h3>Evolution Snapshot</h3>", unsafe_allow_html=True)
-        small_multiples = create_small_multiples(formatted_quarterly_data)
-        
-        # Display small multiples in a grid
-        sm_col1, sm_col2 = st.columns(2)
+        small_multiples = create_small_multiples(formatted_quarterly_data, version=occupancy_version)
         
-        with sm_col1:
-            safe_plotly_chart(small_multiples[0], use_container_width=True)
-            safe_plotly_chart(small_multiples[2], use_container_width=True)
-        
-        with sm_col2:
-            safe_plotly_chart(small_multiples[1], use_container_width=True)
-            safe_plotly_chart(small_multiples[3], use_container_width=True)
+        # All panels are one subplot figure laid out in a grid
+        safe_plotly_chart(small_multiples, use_container_width=True)
         
         st.markdown("<div class='citation-source'>Source: <a href='https://www.cushmanwakefield.com/en/united-states/insights/us-marketbeat' target='_blank'>Cushman & Wakefield MarketBeat (2020-2023)</a></div>", unsafe_allow_html=True)
     
@@ -2190,12 +1969,10 @@ def slide_2():
     st.markdown('<h1 class="slide-title">Remote Work Impact & Regional Analysis</h1>', unsafe_allow_html=True)
     
     # Load the data
-    quarterly_data = load_actual_data()
     bls_data = load_bls_remote_work_data()
     
     # Prepare data for visualization
-    formatted_quarterly_data = prepare_quarterly_data(quarterly_data)
-    formatted_quarterly_data = add_coordinates(formatted_quarterly_data)
+    formatted_quarterly_data = add_coordinates(quarterly_df)
     
     # Load relocation data
     relocation_df = create_relocation_data()
@@ -2231,6 +2008,11 @@ def slide_2():
         metrics_grid = create_comparative_metrics()
         safe_plotly_chart(metrics_grid, use_container_width=True)
     
+    # Row 4: Monte Carlo recovery outlook, cached per occupancy data version
+    st.markdown('<h3 class="slide-subtitle">Texas vs. Coastal Recovery Outlook</h3>', unsafe_allow_html=True)
+    scenario_chart = create_scenario_forecast(quarterly_df, version=occupancy_version)
+    safe_plotly_chart(scenario_chart, use_container_width=True)
+    
     # Key findings
     col1, col2 = st.columns(2)
     
@@ -3012,40 +2794,15 @@ def create_remote_work_recovery_correlation(bls_df, quarterly_df):
     # Get latest recovery data
     latest_data = get_latest_data(quarterly_df)
     
-    # Map markets to industry concentrations
+    # Map markets to industry concentrations from the market metadata table
     # This is a simplified approximation - in reality would need more detailed data
-    market_industry_map = {
-        'San Francisco': 'Information',
-        'South Bay/San Jose': 'Information',
-        'Manhattan': 'Financial activities',
-        'Boston': 'Education and health services',
-        'Washington D.C.': 'Public administration',
-        'Chicago': 'Financial activities',
-        'Los Angeles': 'Information',
-        'Dallas/Ft Worth': 'Professional and business services',
-        'Houston': 'Transportation and utilities',
-        'Austin': 'Information',
-        'Philadelphia': 'Education and health services',
-    }
-    
-    # Create a new dataframe for the visualization
-    viz_data = []
-    
-    for market in latest_data['market']:
-        if market in market_industry_map:
-            industry = market_industry_map[market]
-            bls_row = bls_df[bls_df['industry'] == industry]
-            if not bls_row.empty:
-                market_row = latest_data[latest_data['market'] == market]
-                viz_data.append({
-                    'market': market,
-                    'recovery_percentage': market_row['recovery_percentage'].values[0],
-                    'remote_work_pct': bls_row['remote_work_pct_2021'].values[0],
-                    'industry': industry,
-                    'region': market_row['region'].values[0]
-                })
-    
-    viz_df = pd.DataFrame(viz_data)
+    latest_data = with_market_metadata(latest_data, ['industry'])
+    latest_data = latest_data[latest_data['industry'].notna()]
+    
+    # Join each market's industry with its BLS remote work prevalence
+    bls_industries = bls_df.drop_duplicates('industry')[['industry', 'remote_work_pct_2021']]
+    viz_df = latest_data[['market', 'recovery_percentage', 'industry', 'region']].merge(bls_industries, on='industry')
+    viz_df = viz_df.rename(columns={'remote_work_pct_2021': 'remote_work_pct'})
     
     # Create scatter plot
     fig = px.scatter(
@@ -3383,89 +3140,95 @@ def create_opportunity_matrix():
     return fig
 
 # Create scenario forecast visualization
-def create_scenario_forecast():
-    # Define time periods
-    quarters = ['2023-Q1', '2023-Q2', '2023-Q3', '2023-Q4', 
-               '2024-Q1', '2024-Q2', '2024-Q3', '2024-Q4',
-               '2025-Q1', '2025-Q2', '2025-Q3', '2025-Q4']
-    
-    # Define scenarios
-    scenario_optimistic_tx = [74, 75, 76, 77, 78, 79, 80, 82, 84, 86, 88, 90]
-    scenario_optimistic_coastal = [58, 59, 60, 61, 63, 65, 67, 69, 72, 75, 78, 81]
-    scenario_baseline_tx = [74, 74.5, 75, 75.5, 76, 77, 77.5, 78, 79, 80, 81, 82]
-    scenario_baseline_coastal = [58, 58.5, 59, 59.5, 60, 61, 62, 63, 64, 65, 66, 67]
-    scenario_pessimistic_tx = [74, 73, 72, 71, 70, 69, 68, 67, 66, 65, 64, 63]
-    scenario_pessimistic_coastal = [58, 57, 56, 55, 54, 53, 52, 51, 50, 49, 48, 47]
-    
-    # Create line chart
+# Fans come from Monte Carlo simulations of AR(1) models fitted to each market's
+# recovery series; Texas and Coastal fans average their markets path by path
+def create_scenario_forecast(quarterly_df, version=None, horizon=12):
+    groups = {
+        'Texas': sorted(quarterly_df.loc[quarterly_df['region'] == 'Texas', 'market'].unique()),
+        'Coastal': sorted(quarterly_df.loc[quarterly_df['region'].isin(['East', 'West']), 'market'].unique()),
+    }
+    if version is None:
+        fans = forecast_fans(quarterly_df, 'recovery_percentage', groups, horizon=horizon)
+    else:
+        fans = load_forecast_fans(quarterly_df, 'recovery_percentage', version, groups, horizon=horizon)
+
+    # Recent history of each group: the mean recovery of its markets
+    historical_quarters = sorted(quarterly_df['year_quarter'].unique())[-8:]
+    current_quarter = historical_quarters[-1]
+
     fig = go.Figure()
-    
-    # Add historical data point
-    historical_quarter = '2022-Q4'
-    historical_tx = 73.6
-    historical_coastal = 57.7
-    
-    # Add traces for each scenario
-    fig.add_trace(go.Scatter(
-        x=[historical_quarter] + quarters,
-        y=[historical_tx] + scenario_optimistic_tx,
-        mode='lines',
-        name='Texas - Optimistic',
-        line=dict(color='#10B981', width=3, dash='solid')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[historical_quarter] + quarters,
-        y=[historical_tx] + scenario_baseline_tx,
-        mode='lines',
-        name='Texas - Baseline',
-        line=dict(color='#10B981', width=3, dash='dot')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[historical_quarter] + quarters,
-        y=[historical_tx] + scenario_pessimistic_tx,
-        mode='lines',
-        name='Texas - Pessimistic',
-        line=dict(color='#10B981', width=3, dash='dash')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[historical_quarter] + quarters,
-        y=[historical_coastal] + scenario_optimistic_coastal,
-        mode='lines',
-        name='Coastal - Optimistic',
-        line=dict(color='#3730A3', width=3, dash='solid')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[historical_quarter] + quarters,
-        y=[historical_coastal] + scenario_baseline_coastal,
-        mode='lines',
-        name='Coastal - Baseline',
-        line=dict(color='#3730A3', width=3, dash='dot')
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[historical_quarter] + quarters,
-        y=[historical_coastal] + scenario_pessimistic_coastal,
-        mode='lines',
-        name='Coastal - Pessimistic',
-        line=dict(color='#3730A3', width=3, dash='dash')
-    ))
-    
+    fans = fans[fans['series'].isin(groups)]
+    if fans.empty:
+        fig.add_annotation(text="Not enough history to fit the forecast models", showarrow=False,
+                           xref="paper", yref="paper", x=0.5, y=0.5)
+        fig.update_layout(height=350, template='plotly_white',
+                          xaxis=dict(visible=False), yaxis=dict(visible=False))
+        return fig
+
+    group_colors = {'Texas': '#10B981', 'Coastal': '#3730A3'}
+    for group, color in group_colors.items():
+        fan = fans[fans['series'] == group]
+        if fan.empty:
+            continue
+        members = quarterly_df['market'].isin(groups[group])
+        actual = quarterly_df[members].groupby('year_quarter')['recovery_percentage'].mean()
+        actual = actual.reindex(historical_quarters)
+
+        # Bands start from the group's last observed quarter, not a missing one
+        observed = actual.dropna()
+        anchor_x = [observed.index[-1]] if not observed.empty else []
+        anchor_y = [observed.iloc[-1]] if not observed.empty else []
+        x = anchor_x + list(fan['year_quarter'])
+
+        # Outer (5-95%) and inner (25-75%) bands, each anchored at the last actual value
+        for low, high, opacity in (('q05', 'q95', 0.15), ('q25', 'q75', 0.3)):
+            upper = anchor_y + list(fan[high])
+            lower = anchor_y + list(fan[low])
+            fig.add_trace(go.Scatter(
+                x=x + x[::-1],
+                y=upper + lower[::-1],
+                fill='toself',
+                fillcolor=color,
+                opacity=opacity,
+                line=dict(width=0),
+                hoverinfo='skip',
+                showlegend=False,
+                legendgroup=group
+            ))
+
+        fig.add_trace(go.Scatter(
+            x=historical_quarters,
+            y=actual.to_numpy(),
+            mode='lines+markers',
+            name=f'{group} - Actual',
+            line=dict(color=color, width=3),
+            legendgroup=group
+        ))
+        fig.add_trace(go.Scatter(
+            x=x,
+            y=anchor_y + list(fan['q50']),
+            mode='lines',
+            name=f'{group} - Median Forecast',
+            line=dict(color=color, width=3, dash='dot'),
+            legendgroup=group
+        ))
+
+    all_quarters = historical_quarters + list(fans['year_quarter'].drop_duplicates())
+    y_values = fans[['q05', 'q95']].to_numpy().ravel()
+    y_range = [min(45, np.nanmin(y_values) - 5), max(105, np.nanmax(y_values) + 5)]
+
     # Add a reference line for pre-pandemic levels
     fig.add_shape(
         type="line",
-        x0=historical_quarter,
-        x1='2025-Q4',
+        x0=all_quarters[0],
+        x1=all_quarters[-1],
         y0=100,
         y1=100,
         line=dict(color="red", width=2, dash="dash")
     )
     
     fig.add_annotation(
-        x='2024-Q4',
+        x=all_quarters[-4],
         y=102,
         text="Pre-Pandemic Level (100%)",
         showarrow=False,
@@ -3474,9 +3237,9 @@ def create_scenario_forecast():
     
     # Improve layout
     fig.update_layout(
-        title="Office Occupancy Forecast Scenarios (2023-2025)",
+        title=f"Office Occupancy Forecast ({all_quarters[len(historical_quarters)]} to {all_quarters[-1]}, 50% and 90% bands)",
         xaxis_title="Quarter",
-        yaxis_title="Occupancy (%)",
+        yaxis_title="Occupancy (% of 2020-Q1)",
         legend=dict(
             orientation="h",
             yanchor="bottom",
@@ -3489,42 +3252,37 @@ def create_scenario_forecast():
         margin=dict(l=40, r=40, t=60, b=40),
         xaxis=dict(
             tickangle=45,
-            tickvals=[historical_quarter] + [q for i, q in enumerate(quarters) if i % 4 == 0]
+            tickvals=all_quarters[::4]
         ),
-        yaxis=dict(range=[45, 105])
+        yaxis=dict(range=y_range)
     )
     
     # Add vertical line for current quarter
     fig.add_shape(
         type="line",
-        x0='2023-Q1',
-        x1='2023-Q1',
-        y0=45,
-        y1=105,
+        x0=current_quarter,
+        x1=current_quarter,
+        y0=y_range[0],
+        y1=y_range[1],
         line=dict(color="black", width=1)
     )
     
     fig.add_annotation(
-        x='2023-Q1',
-        y=45,
+        x=current_quarter,
+        y=y_range[0],
         text="Current",
         showarrow=False,
         yshift=-15,
         font=dict(color="black", size=10)
     )
     
-    # Add source citation with specific links
+    # Add source note for the model
     fig.add_annotation(
         x=1,
         y=-0.15,
         xref="paper",
         yref="paper",
-        text=(
-            "Sources: <a href='https://www.mckinsey.com/industries/real-estate/our-insights/commercial-real-estate-must-do-more-than-merely-adapt-to-survive' target='_blank'>"
-            "McKinsey & Company (2023)</a>; "
-            "<a href='https://www.pwc.com/us/en/industries/financial-services/asset-wealth-management/real-estate/emerging-trends-in-real-estate.html' target='_blank'>"
-            "PwC Emerging Trends in Real Estate</a>"
-        ),
+        text=f"AR(1) Monte Carlo on quarterly occupancy data ({PATHS:,} paths per market)",
         showarrow=False,
         font=dict(size=8),
         align="right",
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+from entity_resolution import canonical_names, load_entity_lookup
+from lease_ingest import LEASES_PATH, iter_lease_chunks
+
+# HyperLogLog sketches for distinct tenant/building counts. Each sketch is a
+# row of 2**precision uint8 registers, so a whole market x quarter grid fits
+# in a few MB and any subset of rows can be merged with an element-wise max.
+DEFAULT_PRECISION = 11
+BREADTH_KEYS = ['region', 'market', 'year', 'quarter']
+
+
+def new_sketches(n, precision=DEFAULT_PRECISION):
+    """Create n empty sketches"""
+    return np.zeros((n, 1 << precision), dtype=np.uint8)
+
+
+def hash_values(values):
+    """Hash a series of identifiers to uint64, normalising text identifiers first"""
+    values = pd.Series(values).dropna()
+    if values.dtype == object:
+        # Case and spacing differences should not count as separate tenants
+        values = values.astype(str).str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+    else:
+        # Chunks with and without missing ids load as int vs float, so pin one dtype
+        values = values.astype(np.float64)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def _bit_length(x):
+    """Vectorised bit length of a uint64 array"""
+    x = x.copy()
+    length = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(shift))
+        length[big] += shift
+        x[big] >>= np.uint64(shift)
+    return length + (x > 0)
+
+
+def update_sketches(registers, rows, hashes):
+    """Fold hashed values into the sketch rows they belong to (in place)"""
+    if len(hashes) == 0:
+        return registers
+    precision = int(np.log2(registers.shape[1]))
+    tail_bits = 64 - precision
+
+    # Top bits pick the register, leading zeros of the rest give the rank
+    buckets = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+    tail = hashes & np.uint64((1 << tail_bits) - 1)
+    ranks = (tail_bits - _bit_length(tail) + 1).astype(np.uint8)
+
+    # Keep only the max rank per (sketch, register) before touching the array
+    cells = np.asarray(rows, dtype=np.int64) * registers.shape[1] + buckets
+    best = pd.Series(ranks).groupby(cells).max()
+    flat = registers.reshape(-1)
+    idx = best.index.to_numpy()
+    flat[idx] = np.maximum(flat[idx], best.to_numpy())
+    return registers
+
+
+def merge_sketches(registers, groups):
+    """Merge sketch rows that share a group code, returning one sketch per group"""
+    groups = np.asarray(groups)
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    return np.maximum.reduceat(registers[order], starts, axis=0)
+
+
+def estimate_cardinality(registers):
+    """Estimate the number of distinct values behind each sketch row"""
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.power(2.0, -registers.astype(np.float64)).sum(axis=1)
+
+    # Linear counting is far more accurate while many registers are still empty
+    zeros = (registers == 0).sum(axis=1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def build_breadth_sketches(chunks, precision=DEFAULT_PRECISION, tenant_lookup=None):
+    """Stream lease chunks into tenant and building sketches per region, market and quarter.
+
+    With a tenant_lookup (see entity_resolution) alternate spellings of a
+    company count as one tenant.
+    """
+    key_index = {}
+    keys = []
+    tenants = new_sketches(0, precision)
+    buildings = new_sketches(0, precision)
+
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=['market', 'year', 'quarter'])
+        if chunk.empty:
+            continue
+        chunk = chunk.assign(region=chunk['region'].fillna('Unknown'))
+
+        # Map this chunk's keys onto global sketch rows, growing the arrays for new ones
+        codes, uniques = pd.MultiIndex.from_frame(chunk[BREADTH_KEYS]).factorize()
+        local_rows = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques):
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            local_rows[i] = key_index[key]
+        if len(keys) > len(tenants):
+            extra = len(keys) - len(tenants)
+            tenants = np.vstack([tenants, new_sketches(extra, precision)])
+            buildings = np.vstack([buildings, new_sketches(extra, precision)])
+        rows = local_rows[codes]
+
+        tenant_names = chunk['company_name']
+        if tenant_lookup is not None:
+            tenant_names = pd.Series(canonical_names(tenant_names, tenant_lookup), index=chunk.index)
+        has_tenant = tenant_names.notna().to_numpy()
+        update_sketches(tenants, rows[has_tenant], hash_values(tenant_names))
+        has_building = chunk['building_id'].notna().to_numpy()
+        update_sketches(buildings, rows[has_building], hash_values(chunk['building_id']))
+
+    key_df = pd.DataFrame(keys, columns=BREADTH_KEYS)
+    return key_df, tenants, buildings
+
+
+def load_breadth_sketches(path=LEASES_PATH, precision=DEFAULT_PRECISION):
+    """Build breadth sketches straight from the leases file, counting resolved tenants"""
+    columns = BREADTH_KEYS + ['company_name', 'building_id']
+    tenant_lookup = load_entity_lookup('company_name', path=path)
+    return build_breadth_sketches(iter_lease_chunks(columns=columns, path=path), precision, tenant_lookup)
+
+
+def market_breadth(key_df, tenants, buildings, by=('market',), mask=None):
+    """Roll sketches up to any combination of key columns and estimate distinct counts"""
+    by = list(by)
+    if mask is not None:
+        mask = np.asarray(mask)
+        key_df, tenants, buildings = key_df[mask], tenants[mask], buildings[mask]
+    if key_df.empty:
+        return pd.DataFrame(columns=by + ['distinct_tenants', 'distinct_buildings'])
+
+    # Group codes come back as 0..n-1, matching the order of the merged sketches
+    groups, labels = pd.MultiIndex.from_frame(key_df[by]).factorize()
+    result = pd.DataFrame(list(labels), columns=by)
+    result['distinct_tenants'] = np.rint(estimate_cardinality(merge_sketches(tenants, groups))).astype(int)
+    result['distinct_buildings'] = np.rint(estimate_cardinality(merge_sketches(buildings, groups))).astype(int)
+    return result
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Server-side downsampling for line charts. Both methods return the indices
+# of the points to keep, always including the first and last point, so the
+# selected rows can be taken straight from the source frame.
+
+
+def _numeric_x(x):
+    """Numeric positions for x values (dates, period labels or numbers)"""
+    x = np.asarray(x)
+    if x.dtype.kind in 'iuf':
+        return x.astype(np.float64)
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    # Period labels such as '2021-Q3' sort chronologically as strings
+    return np.unique(x, return_inverse=True)[1].astype(np.float64)
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points that preserve the visual shape"""
+    x = _numeric_x(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Interior points are split into n_out - 2 buckets; endpoints are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third triangle vertex
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax(x, y, n_out):
+    """Keep the min and max of each bucket (fully vectorised); roughly n_out points"""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    n_buckets = max(1, (n_out - 2) // 2)
+    starts = np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)[:-1]
+    starts = np.unique(starts)
+    interior = y[1:n - 1]
+    offsets = starts - 1
+
+    # Per-bucket argmin/argmax via reduceat on (value, position) ordering
+    bucket = np.repeat(np.arange(len(offsets)), np.diff(np.r_[offsets, len(interior)]))
+    order_min = np.lexsort((interior, bucket))
+    order_max = np.lexsort((-interior, bucket))
+    first = np.r_[0, np.flatnonzero(np.diff(bucket[order_min])) + 1]
+    keep = np.r_[0, order_min[first] + 1, order_max[first] + 1, n - 1]
+    return np.unique(keep)
+
+
+def downsample_frame(df, x, y, by=None, n_out=500, method='lttb'):
+    """Downsample each series in df (grouped by `by`) to at most n_out points"""
+    pick = lttb if method == 'lttb' else minmax
+    df = df[df[y].notna()]
+    if by is None:
+        ordered = df.sort_values(x)
+        return ordered.iloc[pick(ordered[x].to_numpy(), ordered[y].to_numpy(), n_out)]
+
+    ordered = df.sort_values([by, x], kind='stable')
+    keys = ordered[by].to_numpy()
+    xs = ordered[x].to_numpy()
+    ys = ordered[y].to_numpy()
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+
+    # Collect row positions from every series, then take them in one go
+    positions = [start + pick(xs[start:end], ys[start:end], n_out) for start, end in zip(starts, ends)]
+    if not positions:
+        return ordered
+    return ordered.iloc[np.concatenate(positions)]
+
+
+def series_budget(total_points, n_series, minimum=50):
+    """Split a total point budget across series"""
+    return max(minimum, total_points // max(1, n_series))
@@ -1,7 +1,10 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from batch_forecast import AVAILABILITY_PATH, OCCUPANCY_PATH
+from regimes import follows_phases, load_regimes, regime_patterns
 
 # Page configuration
 st.set_page_config(
@@ -223,8 +226,32 @@ st.markdown("""
 # Add a download button for the full report
 st.markdown("## Download the Complete Analysis")
 
+def regime_findings():
+    """Finding text and a markdown table of the detected occupancy regimes per market"""
+    if not (os.path.exists(OCCUPANCY_PATH) and os.path.exists(AVAILABILITY_PATH)):
+        return "Markets were not segmented into regimes (data files not available)", ""
+    segments = load_regimes()
+    patterns = regime_patterns(segments, 'occupancy')
+    if patterns.empty:
+        return "No occupancy regimes were detected (not enough quarterly history)", ""
+    # Moves count the level jumps between regimes too, so the COVID drop at a boundary is a decline
+    three_phase = patterns['moves'].map(follows_phases)
+    finding = (f"{three_phase.sum()} of {len(patterns)} markets show a decline, recovery and stabilization "
+               f"pattern in detected occupancy regimes and the jumps between them; the most common "
+               f"sequence is '{patterns['moves'].mode().iloc[0]}'")
+
+    rows = segments[segments['metric'] == 'occupancy'].sort_values(['market', 'regime'])
+    lines = ["| Market | Regime | Quarters | Direction | Occupancy (start to end) |",
+             "|---|---|---|---|---|"]
+    for row in rows.itertuples():
+        lines.append(f"| {row.market} | {row.regime} | {row.start_period} to {row.end_period} | {row.direction} | "
+                     f"{row.start_value:.1%} to {row.end_value:.1%} |")
+    return finding, "\n".join(lines)
+
+
 def generate_report():
-    report = """# Comprehensive Commercial Real Estate Recovery Analysis
+    regime_finding, regime_table = regime_findings()
+    report = f"""# Comprehensive Commercial Real Estate Recovery Analysis
     
 ## Executive Summary
 This report analyzes post-pandemic recovery patterns in commercial real estate markets across the United States, with special attention to causal factors driving regional variations.
@@ -233,7 +260,12 @@ This report analyzes post-pandemic recovery patterns in commercial real estate m
 1. Texas markets (Austin, Dallas/Ft Worth, Houston) show significantly stronger recovery (67-74% of pre-pandemic levels)
 2. Tech markets exhibit dichotomous recovery patterns (Austin strong, San Francisco/Silicon Valley weak)
 3. Financial centers demonstrate moderate but steady recovery
-4. Markets exhibit a distinct three-phase recovery pattern
+4. {regime_finding}
+
+## Recovery Regimes
+Piecewise-linear regimes detected in each market's quarterly occupancy (changepoints chosen by BIC).
+
+{regime_table}
 
 ## Detailed Analysis...
 [Full content would appear here in the actual report]
@@ -0,0 +1,186 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, data_version, open_table, table_exists, write_table
+from lease_ingest import LEASES_PATH, iter_lease_chunks
+
+# Fuzzy entity resolution for free-text lease fields (company_name,
+# building_name). Spellings are normalised, then only names that share a
+# MinHash LSH bucket are compared, so the work grows with the number of
+# distinct names rather than with every pair of them. Matching pairs are
+# joined with a vectorised union-find into one entity per cluster, and the
+# raw spelling -> entity table is cached in the column store.
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+MATCH_THRESHOLD = 0.5  # estimated Jaccard similarity of character 3-grams
+LEGAL_SUFFIXES = ['inc', 'incorporated', 'llc', 'llp', 'lp', 'ltd', 'limited', 'corp', 'corporation',
+                  'co', 'plc', 'pc', 'pllc', 'the']
+SUFFIX_PATTERN = r'(?:\s(?:' + '|'.join(LEGAL_SUFFIXES) + r'))+$'
+
+
+def normalize_names(values):
+    """Lower-case, drop punctuation, collapse spaces and strip trailing legal suffixes"""
+    names = pd.Series(values, dtype=object).astype(str).str.lower()
+    names = names.str.replace(r'[^\w\s]', ' ', regex=True).str.replace(r'\s+', ' ', regex=True).str.strip()
+    stripped = names.str.replace(SUFFIX_PATTERN, '', regex=True)
+    return stripped.where(stripped != '', names).to_numpy()
+
+
+def minhash_signatures(names, k=SHINGLE_SIZE, num_perm=NUM_PERM, seed=0):
+    """(n x num_perm) MinHash signatures of the character k-grams of each name"""
+    if len(names) == 0:
+        return np.empty((0, num_perm), dtype=np.uint32)
+    padded = [f" {name} " for name in names]
+    shingles = [[text[i:i + k] for i in range(max(1, len(text) - k + 1))] for text in padded]
+    counts = np.fromiter(map(len, shingles), dtype=np.int64, count=len(shingles))
+    flat = np.fromiter(chain.from_iterable(shingles), dtype=object, count=int(counts.sum()))
+    hashes = pd.util.hash_array(flat)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+    # Multiply-shift hashing: one odd multiplier and offset per permutation
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(names), num_perm), dtype=np.uint32)
+    for p in range(num_perm):
+        permuted = (hashes * multipliers[p] + offsets[p]) >> np.uint64(32)
+        signatures[:, p] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """Index pairs (left, right) of names that share an LSH band bucket.
+
+    Within a bucket every name is paired with its neighbour and with the first
+    name, which is enough for the union-find to connect the bucket while
+    keeping the pair count linear in the bucket size.
+    """
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    left, right = [], []
+    for band in range(bands):
+        keys = pd.util.hash_pandas_object(pd.DataFrame(signatures[:, band * rows:(band + 1) * rows]),
+                                          index=False).to_numpy()
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        same = sorted_keys[1:] == sorted_keys[:-1]
+        heads = np.maximum.accumulate(np.where(np.r_[True, ~same], np.arange(n), 0))
+        left.extend([order[:-1][same], order[heads[1:][same]]])
+        right.extend([order[1:][same], order[1:][same]])
+    left = np.concatenate(left)
+    right = np.concatenate(right)
+    keep = left != right
+    pairs = np.unique(np.minimum(left, right)[keep] * n + np.maximum(left, right)[keep])
+    return pairs // n, pairs % n
+
+
+def pair_similarity(signatures, left, right, chunk=200_000):
+    """Estimated Jaccard similarity of each pair, compared in chunks to bound memory"""
+    similarity = np.empty(len(left))
+    for start in range(0, len(left), chunk):
+        stop = start + chunk
+        similarity[start:stop] = (signatures[left[start:stop]] == signatures[right[start:stop]]).mean(axis=1)
+    return similarity
+
+
+def connected_labels(n, left, right):
+    """Union-find over edge arrays: every node labelled with the smallest node in its component"""
+    labels = np.arange(n)
+    while True:
+        before = labels.copy()
+        low = np.minimum(labels[left], labels[right])
+        np.minimum.at(labels, left, low)
+        np.minimum.at(labels, right, low)
+        # Pointer jumping shortens chains so this converges in a few passes
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            return labels
+
+
+def resolve_entities(counts, threshold=MATCH_THRESHOLD):
+    """Cluster spellings; counts is a Series of row counts indexed by raw spelling.
+
+    Returns one row per raw spelling: raw_name, entity_id and canonical_name
+    (the most frequent spelling in the cluster).
+    """
+    raw = counts.index.to_numpy(dtype=object)
+    if len(raw) == 0:
+        return pd.DataFrame({'raw_name': raw, 'entity_id': np.empty(0, dtype=np.int64),
+                             'rows': np.empty(0, dtype=np.int64), 'canonical_name': raw})
+    normalized = normalize_names(raw)
+    names, name_codes = np.unique(normalized, return_inverse=True)
+
+    # Compare only LSH candidates; digits must agree so 'Tower 12' never merges with 'Tower 21'
+    signatures = minhash_signatures(names)
+    left, right = candidate_pairs(signatures)
+    digits = pd.Series(names).str.replace(r'\D', '', regex=True).to_numpy()
+    same_digits = digits[left] == digits[right]
+    left, right = left[same_digits], right[same_digits]
+    match = pair_similarity(signatures, left, right) >= threshold
+    labels = connected_labels(len(names), left[match], right[match])
+
+    entity_ids = np.unique(labels, return_inverse=True)[1][name_codes]
+    lookup = pd.DataFrame({
+        'raw_name': raw,
+        'entity_id': entity_ids,
+        'rows': counts.to_numpy(),
+    })
+
+    # Canonical spelling: most frequent raw spelling of each entity
+    ranked = lookup.sort_values(['entity_id', 'rows'], ascending=[True, False], kind='stable')
+    canonical = ranked.drop_duplicates('entity_id').set_index('entity_id')['raw_name'].str.strip()
+    lookup['canonical_name'] = canonical.reindex(lookup['entity_id']).to_numpy()
+    return lookup
+
+
+def name_counts(chunks, column):
+    """Row count per raw spelling of a column, accumulated over chunks"""
+    totals = None
+    for chunk in chunks:
+        counts = chunk[column].dropna().astype(str).value_counts()
+        totals = counts if totals is None else totals.add(counts, fill_value=0)
+    if totals is None:
+        return pd.Series(dtype=np.int64)
+    return totals.astype(np.int64)
+
+
+def load_entity_lookup(column, path=LEASES_PATH, cache_dir=CACHE_DIR):
+    """Cached spelling -> entity lookup for one lease column, rebuilt when the file changes"""
+    name = f"entities_{column}"
+    version = data_version(path)
+    if not table_exists(name, version, cache_dir):
+        counts = name_counts(iter_lease_chunks(columns=[column], path=path), column)
+        write_table(resolve_entities(counts), name, version, cache_dir)
+    return open_table(name, version, cache_dir)
+
+
+def canonical_names(values, lookup):
+    """Canonical spelling for each raw value; unknown values are returned unchanged"""
+    values = pd.Series(values, dtype=object)
+    if lookup.empty:
+        return values.to_numpy()
+    positions = pd.Index(lookup['raw_name']).get_indexer(values.astype(str))
+    canonical = lookup['canonical_name'].to_numpy()[np.maximum(positions, 0)]
+    return np.where((positions >= 0) & values.notna().to_numpy(), canonical, values.to_numpy())
+
+
+def entity_ids(values, lookup):
+    """Entity id for each raw value; -1 for missing or unknown values"""
+    values = pd.Series(values, dtype=object)
+    if lookup.empty:
+        return np.full(len(values), -1, dtype=np.int64)
+    positions = pd.Index(lookup['raw_name']).get_indexer(values.astype(str))
+    ids = lookup['entity_id'].to_numpy()[np.maximum(positions, 0)]
+    return np.where((positions >= 0) & values.notna().to_numpy(), ids, -1).astype(np.int64)
+
+
+def with_entities(df, lookups):
+    """df plus <column>_entity_id and canonical_<column> for each {column: lookup}"""
+    columns = {}
+    for column, lookup in lookups.items():
+        columns[f"{column}_entity_id"] = entity_ids(df[column], lookup)
+        columns[f"canonical_{column}"] = canonical_names(df[column], lookup)
+    return df.assign(**columns)
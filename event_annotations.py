@@ -0,0 +1,86 @@
+import pandas as pd
+
+# Key pandemic-era events, one row per marker. Figures pick the rows of one
+# group and add all of their shapes and annotations in a single layout update
+# instead of one add_vline/add_annotation call (and one layout validation)
+# per event.
+#   group  - which set of figures the row belongs to
+#              trend    - occupancy trend lines
+#              texas    - Texas recovery trend on the presentation slides
+#              timeline - event panel next to the animated map
+#   period - quarter the event falls in ('2021-Q2')
+#   label  - text shown on the chart
+#   color  - line/text colour
+EVENT_COLUMNS = ['group', 'period', 'label', 'color']
+EVENT_ROWS = [
+    ('trend', '2020-Q1', 'COVID-19 Outbreak', 'red'),
+    ('trend', '2021-Q2', 'Vaccine Rollout', 'green'),
+    ('trend', '2022-Q1', 'Return to Office Policies Begin', 'orange'),
+    ('texas', '2020-Q2', 'Lockdowns', '#1E3A8A'),
+    ('texas', '2021-Q1', 'Vaccines', '#1E3A8A'),
+    ('texas', '2022-Q1', 'Return to Office', '#1E3A8A'),
+    ('timeline', '2020-Q1', 'COVID-19 Declared Pandemic (Mar 2020)', '#1E3A8A'),
+    ('timeline', '2020-Q2', 'Nationwide Lockdowns (Apr-Jun 2020)', '#1E3A8A'),
+    ('timeline', '2020-Q4', 'Vaccine Development Announced (Dec 2020)', '#1E3A8A'),
+    ('timeline', '2021-Q1', 'Vaccine Rollout Begins (Jan-Mar 2021)', '#1E3A8A'),
+    ('timeline', '2021-Q3', 'Delta Variant Surge (Jul-Sep 2021)', '#1E3A8A'),
+    ('timeline', '2022-Q1', 'Return to Office Policies Implemented (Q1 2022)', '#1E3A8A'),
+]
+
+EVENTS = pd.DataFrame(EVENT_ROWS, columns=EVENT_COLUMNS)
+
+
+def events_for(group, periods=None):
+    """Events of one group, optionally limited to the periods shown on a chart"""
+    events = EVENTS[EVENTS['group'] == group]
+    if periods is not None:
+        events = events[events['period'].isin(periods)]
+    return events
+
+
+def event_layout(events, y=1.0, y_step=0.0, yref='paper', yshift=0, xanchor='center',
+                 line_dash='dash', opacity=0.7, font_size=None):
+    """Vertical line shapes and label annotations for events, as plain layout dicts"""
+    shapes = []
+    annotations = []
+    for i, event in enumerate(events.itertuples(index=False)):
+        shapes.append(dict(
+            type='line', xref='x', yref='paper',
+            x0=event.period, x1=event.period, y0=0, y1=1,
+            line=dict(color=event.color, dash=line_dash),
+            opacity=opacity
+        ))
+        annotations.append(dict(
+            x=event.period, xref='x',
+            y=y - i * y_step, yref=yref, yshift=yshift,
+            text=event.label, showarrow=False, xanchor=xanchor,
+            font=dict(color=event.color, size=font_size) if font_size else dict(color=event.color)
+        ))
+    return shapes, annotations
+
+
+def add_events(fig, events, **kwargs):
+    """Add event markers to a time-series figure in one layout update"""
+    shapes, annotations = event_layout(events, **kwargs)
+    fig.update_layout(
+        shapes=list(fig.layout.shapes) + shapes,
+        annotations=list(fig.layout.annotations) + annotations
+    )
+    return fig
+
+
+def add_event_panel(fig, events, x=0.01, y=0.99, y_step=0.05, font_size=10):
+    """Stacked '<period>: <label>' boxes in the corner of a figure, in one layout update"""
+    annotations = [
+        dict(
+            x=x, y=y - i * y_step, xref='paper', yref='paper',
+            text=f"<b>{event.period}</b>: {event.label}",
+            showarrow=False, align='left', xanchor='left',
+            bgcolor='rgba(255, 255, 255, 0.8)',
+            bordercolor=event.color, borderwidth=1, borderpad=4,
+            font=dict(size=font_size, color=event.color)
+        )
+        for i, event in enumerate(events.itertuples(index=False))
+    ]
+    fig.update_layout(annotations=list(fig.layout.annotations) + annotations)
+    return fig
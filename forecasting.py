@@ -0,0 +1,158 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, open_table, table_exists, write_table
+
+# Monte Carlo scenario forecasts. Every market's quarterly series is fitted
+# with an AR(1) model in one masked least-squares pass over the
+# (quarter x market) panel. Paths are simulated for all markets together with
+# shocks drawn from the cross-market residual covariance and with the AR
+# coefficient redrawn per path, so fans include parameter uncertainty.
+# Path chunks run in a process pool; only the quantile fans are cached.
+HORIZON = 12
+PATHS = 20_000
+QUANTILES = [5, 10, 25, 50, 75, 90, 95]
+MAX_PHI = 0.98
+MIN_OBSERVATIONS = 6
+
+
+def fit_ar1(panel, covariance=True):
+    """Per-column AR(1) fit y[t] = c + phi * y[t-1] + e over a (T x M) panel with gaps.
+
+    covariance=False skips the cross-column shock covariance, which only the
+    joint simulation needs.
+    """
+    x, y = panel[:-1], panel[1:]
+    both = ~(np.isnan(x) | np.isnan(y))
+    n = both.sum(axis=0)
+    x0 = np.where(both, x, 0.0)
+    y0 = np.where(both, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = x0.sum(axis=0) / n
+        mean_y = y0.sum(axis=0) / n
+        dx = np.where(both, x - mean_x, 0.0)
+        dy = np.where(both, y - mean_y, 0.0)
+        sxx = (dx ** 2).sum(axis=0)
+        phi = np.clip(np.nan_to_num((dx * dy).sum(axis=0) / sxx), -MAX_PHI, MAX_PHI)
+        residuals = np.where(both, dy - phi * dx, np.nan)
+        sigma = np.sqrt(np.nansum(residuals ** 2, axis=0) / np.maximum(n - 2, 1))
+        phi_se = np.nan_to_num(sigma / np.sqrt(sxx))
+
+    # Last observed value of each market is where its paths start
+    last_row = np.where(~np.isnan(panel), np.arange(len(panel))[:, None], -1).max(axis=0)
+    last = panel[np.maximum(last_row, 0), np.arange(panel.shape[1])]
+
+    model = {
+        'phi': phi,
+        'phi_se': phi_se,
+        'mean_x': mean_x,
+        'mean_y': mean_y,
+        'sigma': sigma,
+        'last': last,
+        'last_row': last_row,
+        'observations': n,
+        'valid': n >= MIN_OBSERVATIONS,
+    }
+    if covariance:
+        # Shock covariance across markets; gaps count as zero shocks
+        filled = np.nan_to_num(residuals)
+        shock_covariance = filled.T @ filled / np.maximum(len(filled) - 1, 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(shock_covariance)
+        model['shock_factor'] = eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+    return model
+
+
+def ar1_forecast(model, horizon=HORIZON):
+    """Closed-form (horizon x M) mean forecast and forecast standard deviation from the last values"""
+    phi, sigma = model['phi'], model['sigma']
+    intercept = model['mean_y'] - phi * model['mean_x']
+    steps = np.arange(1, horizon + 1)[:, None]
+    powers = phi ** steps
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_factor = np.where(np.isclose(phi, 1.0), steps, (1 - powers) / (1 - phi))
+        variance_factor = np.where(np.isclose(phi ** 2, 1.0), steps, (1 - powers ** 2) / (1 - phi ** 2))
+    return intercept * mean_factor + powers * model['last'], sigma * np.sqrt(variance_factor)
+
+
+def simulate_chunk(model, horizon, paths, seed):
+    """(paths x horizon x M) simulated levels for one chunk of paths"""
+    rng = np.random.default_rng(seed)
+    markets = len(model['phi'])
+    phi = np.clip(model['phi'] + model['phi_se'] * rng.standard_normal((paths, markets)), -MAX_PHI, MAX_PHI)
+    # Intercept follows the redrawn slope so each path keeps the fitted line through the means
+    intercept = model['mean_y'] - phi * model['mean_x']
+
+    out = np.empty((paths, horizon, markets), dtype=np.float32)
+    level = np.broadcast_to(model['last'], (paths, markets)).astype(np.float64)
+    for step in range(horizon):
+        shocks = rng.standard_normal((paths, markets)) @ model['shock_factor'].T
+        level = intercept + phi * level + shocks
+        out[:, step] = level
+    return out
+
+
+def simulate_paths(model, horizon=HORIZON, paths=PATHS, workers=None, seed=0):
+    """Simulate all markets jointly, splitting the paths across a process pool"""
+    workers = max(1, min(workers or os.cpu_count() or 1, paths))
+    sizes = np.diff(np.linspace(0, paths, workers + 1).astype(int))
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    if workers == 1:
+        return simulate_chunk(model, horizon, paths, seeds[0])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = pool.map(simulate_chunk, [model] * workers, [horizon] * workers, sizes, seeds)
+        return np.concatenate(list(chunks))
+
+
+def future_periods(last_period, horizon):
+    """'YYYY-Qn' labels for the quarters after last_period"""
+    year, quarter = int(last_period[:4]), int(last_period[-1])
+    index = year * 4 + quarter - 1 + np.arange(1, horizon + 1)
+    return [f"{i // 4}-Q{i % 4 + 1}" for i in index]
+
+
+def forecast_fans(df, value, groups=None, period='year_quarter', horizon=HORIZON, paths=PATHS,
+                  workers=None, seed=0):
+    """Quantile fans per market and per market group; groups maps a name to a list of markets.
+
+    Group paths are the per-path mean of their markets, so a group fan reflects
+    the correlation between its markets rather than averaging their quantiles.
+    """
+    wide = df.pivot_table(index=period, columns='market', values=value, aggfunc='mean').sort_index()
+    panel = wide.to_numpy(dtype=np.float64)
+    markets = pd.Index(wide.columns)
+    model = fit_ar1(panel)
+    simulated = simulate_paths(model, horizon, paths, workers, seed)
+
+    series = {market: simulated[:, :, i] for i, market in enumerate(markets) if model['valid'][i]}
+    for name, members in (groups or {}).items():
+        columns = [markets.get_loc(m) for m in members if m in markets and model['valid'][markets.get_loc(m)]]
+        if columns:
+            series[name] = simulated[:, :, columns].mean(axis=2)
+
+    periods = future_periods(str(wide.index[-1]), horizon)
+    frames = []
+    for name, values in series.items():
+        fan = np.percentile(values, QUANTILES, axis=0)
+        frame = pd.DataFrame({'series': name, 'step': np.arange(1, horizon + 1), period: periods,
+                              'mean': values.mean(axis=0)})
+        for q, row in zip(QUANTILES, fan):
+            frame[f'q{q:02d}'] = row
+        frames.append(frame)
+    if not frames:
+        columns = ['series', 'step', period, 'mean'] + [f'q{q:02d}' for q in QUANTILES]
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_forecast_fans(df, value, version, groups=None, period='year_quarter', horizon=HORIZON,
+                       paths=PATHS, cache_dir=CACHE_DIR):
+    """forecast_fans cached in the column store per data version and forecast settings"""
+    settings = repr((value, sorted((groups or {}).items()), period, horizon, paths, QUANTILES))
+    name = f"forecast_{hashlib.sha1(settings.encode()).hexdigest()[:10]}"
+    if not table_exists(name, version, cache_dir):
+        write_table(forecast_fans(df, value, groups, period, horizon, paths), name, version, cache_dir)
+    return open_table(name, version, cache_dir)
@@ -0,0 +1,116 @@
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Builders for animated map figures. Every region is one trace whose markets
+# keep a fixed position, so the location arrays are sent once in the base
+# trace and each animation frame only patches the arrays that change
+# (marker sizes and hover data). The trace count stays constant however many
+# markets or quarters there are. Small multiples are batched into one subplot
+# figure so the geo base and layout are sent once for all panels.
+
+
+def frame_panels(df, frame, key, columns):
+    """Frame labels, key table and one (frame x key) array per column, filled in one scatter"""
+    frames = pd.Index(pd.unique(df[frame]))
+    keys = pd.Index(df[key].drop_duplicates())
+    rows = frames.get_indexer(df[frame])
+    cols = keys.get_indexer(df[key])
+    panels = {}
+    for column in columns:
+        panel = np.full((len(frames), len(keys)), np.nan)
+        panel[rows, cols] = df[column].to_numpy(dtype=np.float64)
+        panels[column] = panel
+    return frames, keys, panels
+
+
+def region_frame_traces(df, region_styles, frame='year_quarter', region='region', key='market',
+                        lat='lat', lon='lon', size='ending_occupancy_proportion', size_scale=30,
+                        hover_columns=('ending_occupancy_proportion', 'recovery_percentage'),
+                        hovertemplate=None):
+    """Base traces (one per region) and frames that only patch marker sizes and customdata.
+
+    customdata is [frame label, *hover_columns, region] for every point.
+    """
+    columns = list(dict.fromkeys([size, *hover_columns]))
+    frames, keys, panels = frame_panels(df, frame, key, columns)
+
+    # Static per-market fields, in the same order as the panel columns
+    static = df.drop_duplicates(key).set_index(key).loc[keys]
+    market_region = static[region].to_numpy()
+    sizes = np.nan_to_num(panels[size]) * size_scale
+
+    groups = []
+    for name, style in region_styles.items():
+        positions = np.flatnonzero(market_region == name)
+        if len(positions):
+            groups.append((name, style, positions))
+
+    def customdata(i, name, positions):
+        values = [panels[column][i, positions] for column in hover_columns]
+        labels = np.full(len(positions), frames[i], dtype=object)
+        return np.column_stack([labels, *values, np.full(len(positions), name, dtype=object)])
+
+    traces = []
+    for name, style, positions in groups:
+        traces.append(go.Scattergeo(
+            lon=static[lon].to_numpy()[positions],
+            lat=static[lat].to_numpy()[positions],
+            mode='markers',
+            marker=dict(size=sizes[0, positions], **style),
+            name=name,
+            hovertext=keys.to_numpy()[positions],
+            customdata=customdata(0, name, positions),
+            hovertemplate=hovertemplate
+        ))
+
+    trace_ids = list(range(len(groups)))
+    animation_frames = [
+        go.Frame(
+            name=label,
+            data=[go.Scattergeo(marker=dict(size=sizes[i, positions]), customdata=customdata(i, name, positions))
+                  for name, _, positions in groups],
+            traces=trace_ids
+        )
+        for i, label in enumerate(frames)
+    ]
+    return traces, animation_frames
+
+
+def small_multiples_figure(panels, build_traces, cols=2, geo=None, panel_height=225,
+                           trace_cache=None, trace_lock=None, **layout):
+    """One subplot figure with a geo panel per (key, title, view), sharing one geo style.
+
+    build_traces(view) returns the traces of a panel; with a trace_cache dict they
+    are built once per key and reused on later calls. A cache shared between
+    threads needs a trace_lock, which guards every insert.
+    """
+    rows = -(-len(panels) // cols)
+    fig = make_subplots(
+        rows=rows,
+        cols=cols,
+        specs=[[{'type': 'scattergeo'}] * cols for _ in range(rows)],
+        subplot_titles=[title for _, title, _ in panels],
+        horizontal_spacing=0.02,
+        vertical_spacing=0.06
+    )
+    for i, (key, _, view) in enumerate(panels):
+        if trace_cache is None:
+            traces = build_traces(view)
+        elif key in trace_cache:
+            traces = trace_cache[key]
+        else:
+            traces = build_traces(view)
+            with trace_lock or nullcontext():
+                # First writer wins, so concurrent sessions end up sharing one set of traces
+                traces = trace_cache.setdefault(key, traces)
+        # add_traces copies, so cached traces never pick up a subplot reference
+        fig.add_traces(traces, rows=i // cols + 1, cols=i % cols + 1)
+
+    # Every geo subplot gets the same base style in one update
+    fig.update_geos(**(geo or {}))
+    fig.update_layout(height=panel_height * rows, **layout)
+    return fig
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# Grid aggregation for map layers. Points are projected to Web Mercator and
+# binned into square cells at every zoom level of a pyramid (32 x 32 cells per
+# 256px map tile), so a map only ever receives the aggregated cells that fall
+# inside the current viewport instead of every raw point.
+CELL_BITS = 5
+TILE_SIZE = 256
+DEFAULT_ZOOMS = range(2, 13)
+EARTH_CIRCUMFERENCE_M = 40_075_016.7
+
+
+def mercator_xy(lat, lon):
+    """Project lat/lon to unit Web Mercator coordinates (0..1, y grows southwards)"""
+    lat = np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511)
+    lon = np.asarray(lon, dtype=np.float64)
+    x = (lon + 180.0) / 360.0
+    lat_rad = np.radians(lat)
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0
+    return x, y
+
+
+def bin_points(df, zoom, lat='lat', lon='lon', value=None, label=None):
+    """Aggregate points into the grid cells of one zoom level"""
+    points = df.dropna(subset=[lat, lon])
+    cells_per_axis = 2 ** (zoom + CELL_BITS)
+    x, y = mercator_xy(points[lat].to_numpy(), points[lon].to_numpy())
+    binned = pd.DataFrame({
+        'cx': np.minimum((x * cells_per_axis).astype(np.int64), cells_per_axis - 1),
+        'cy': np.minimum((y * cells_per_axis).astype(np.int64), cells_per_axis - 1),
+        'lat': points[lat].to_numpy(),
+        'lon': points[lon].to_numpy(),
+        'x': x,
+        'y': y,
+        'value': points[value].to_numpy(dtype=np.float64) if value else 1.0,
+    })
+    if label:
+        binned['label'] = points[label].astype(str).to_numpy()
+
+    grouped = binned.groupby(['cx', 'cy'], sort=True)
+    cells = grouped.agg(
+        lat=('lat', 'mean'),
+        lon=('lon', 'mean'),
+        x=('x', 'mean'),
+        y=('y', 'mean'),
+        count=('value', 'size'),
+        value_sum=('value', 'sum'),
+        value_mean=('value', 'mean'),
+    ).reset_index()
+
+    # Single-point cells keep their label; merged cells describe their size
+    if label:
+        first_label = grouped['label'].first().to_numpy()
+        cells['label'] = np.where(cells['count'] == 1, first_label, cells['count'].astype(str) + ' locations')
+    return cells
+
+
+def build_tile_pyramid(df, lat='lat', lon='lon', value=None, label=None, zooms=DEFAULT_ZOOMS):
+    """Binned cells for every zoom level"""
+    return {zoom: bin_points(df, zoom, lat, lon, value, label) for zoom in zooms}
+
+
+def pyramid_level(pyramid, zoom):
+    """Closest precomputed level at or below the requested zoom"""
+    levels = sorted(pyramid)
+    eligible = [level for level in levels if level <= zoom]
+    return eligible[-1] if eligible else levels[0]
+
+
+def cells_in_view(pyramid, zoom, center_lat, center_lon, width_px=1200, height_px=600):
+    """Cells of the matching pyramid level that fall inside the viewport"""
+    level = pyramid_level(pyramid, zoom)
+    cells = pyramid[level]
+    cx, cy = mercator_xy(center_lat, center_lon)
+    world_px = TILE_SIZE * 2 ** zoom
+    half_w = width_px / 2 / world_px
+    half_h = height_px / 2 / world_px
+    in_view = (
+        (np.abs(cells['x'].to_numpy() - cx) <= half_w) &
+        (np.abs(cells['y'].to_numpy() - cy) <= half_h)
+    )
+    return cells[in_view], level
+
+
+def cell_radius_m(level, latitude):
+    """Ground radius of a cell, for sizing column/scatter layers"""
+    cell_width = EARTH_CIRCUMFERENCE_M * np.cos(np.radians(latitude)) / 2 ** (level + CELL_BITS)
+    return float(cell_width / 2)
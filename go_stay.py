@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, data_version, open_table, table_exists, write_table
+from lease_ingest import LEASES_PATH, iter_lease_chunks
+
+# Savills' "Go vs Stay" view of leasing: a tenant either moves (New,
+# Relocation) or stays in place (Renewal, Expansion, Restructure, ...).
+# The leases file is streamed once into a market x quarter x industry cube of
+# leased square feet and deal counts per decision, cached in the column store,
+# so dashboards only ever read the small cube.
+GO = 'Go'
+STAY = 'Stay'
+UNKNOWN = 'Unknown'
+
+# transaction_type values from the codebook, compared after normalising case and spacing
+TRANSACTION_DECISIONS = {
+    'new': GO,
+    'relocation': GO,
+    'renewal': STAY,
+    'expansion': STAY,
+    'extension': STAY,
+    'restructure': STAY,
+    'renewal and expansion': STAY,
+    'sale-leaseback': STAY,  # the occupier sells the building but stays in the space
+}
+CUBE_KEYS = ['market', 'year', 'quarter', 'internal_industry', 'decision']
+CUBE_NAME = 'go_stay_cube'
+
+
+def classify_transactions(transaction_types):
+    """Go / Stay / Unknown for each transaction_type value"""
+    normalized = (pd.Series(transaction_types, dtype=object).astype(str).str.strip().str.lower()
+                  .str.replace(r'\s*-\s*', '-', regex=True).str.replace(r'\s+', ' ', regex=True))
+    return normalized.map(TRANSACTION_DECISIONS).fillna(UNKNOWN).to_numpy()
+
+
+def _aggregate(frame):
+    return frame.groupby(CUBE_KEYS, sort=False).agg(
+        leased_sf=('leasedSF', 'sum'),
+        deals=('leasedSF', 'size')
+    ).reset_index()
+
+
+def build_go_stay_cube(chunks):
+    """Stream lease chunks into leased SF and deal counts per market, quarter, industry and decision"""
+    partials = []
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=['market', 'year', 'quarter'])
+        if chunk.empty:
+            continue
+        chunk = chunk.assign(
+            year=chunk['year'].astype(np.int64),
+            internal_industry=chunk['internal_industry'].fillna(UNKNOWN),
+            decision=classify_transactions(chunk['transaction_type']),
+            leasedSF=chunk['leasedSF'].fillna(0.0)
+        )
+        partials.append(_aggregate(chunk))
+
+    if not partials:
+        return pd.DataFrame(columns=CUBE_KEYS + ['leased_sf', 'deals'])
+    # Partial cubes are small, so one final re-aggregation combines them
+    combined = pd.concat(partials, ignore_index=True)
+    cube = combined.groupby(CUBE_KEYS, sort=True).agg(leased_sf=('leased_sf', 'sum'), deals=('deals', 'sum'))
+    return cube.reset_index()
+
+
+def load_go_stay_cube(path=LEASES_PATH, cache_dir=CACHE_DIR):
+    """Go/Stay cube for the leases file, built on first use and cached per file version"""
+    version = data_version(path)
+    if not table_exists(CUBE_NAME, version, cache_dir):
+        columns = ['market', 'year', 'quarter', 'internal_industry', 'transaction_type', 'leasedSF']
+        write_table(build_go_stay_cube(iter_lease_chunks(columns=columns, path=path)), CUBE_NAME, version, cache_dir)
+    return open_table(CUBE_NAME, version, cache_dir)
+
+
+def go_stay_summary(cube, by=('market',), mask=None):
+    """Roll the cube up to `by`, with Go/Stay square feet, deal counts and the Go share"""
+    by = list(by)
+    if mask is not None:
+        cube = cube[np.asarray(mask)]
+    wide = cube.pivot_table(index=by, columns='decision', values=['leased_sf', 'deals'],
+                            aggfunc='sum', fill_value=0)
+    summary = pd.DataFrame(index=wide.index)
+    for decision in (GO, STAY, UNKNOWN):
+        key = decision.lower()
+        summary[f'{key}_sf'] = wide[('leased_sf', decision)] if ('leased_sf', decision) in wide else 0.0
+        summary[f'{key}_deals'] = wide[('deals', decision)] if ('deals', decision) in wide else 0
+    decided_sf = summary['go_sf'] + summary['stay_sf']
+    summary['go_share'] = np.where(decided_sf > 0, summary['go_sf'] / decided_sf.where(decided_sf > 0, 1), np.nan)
+    return summary.reset_index()
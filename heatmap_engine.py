@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+try:
+    from scipy.cluster import hierarchy
+except ImportError:  # scipy is optional; ordering falls back to the leading principal component
+    hierarchy = None
+
+# Market x period heatmaps at any size. The long table is scattered into a
+# dense matrix through integer-coded axes (no pivot), rows can be reordered so
+# similar markets sit together, and matrices larger than the screen are
+# block-averaged down to at most one cell per pixel row/column before they are
+# sent to the browser. Cell labels are only drawn when there are few cells.
+MAX_ROWS = 300
+MAX_COLS = 300
+ANNOTATE_LIMIT = 400
+
+
+def heatmap_matrix(df, row='market', col='period', value='avg_occupancy_proportion'):
+    """(matrix, row labels, column labels); duplicate cells are averaged"""
+    row_codes, row_labels = pd.factorize(df[row], sort=True)
+    col_codes, col_labels = pd.factorize(df[col], sort=True)
+    values = df[value].to_numpy(dtype=np.float64)
+    present = (row_codes >= 0) & (col_codes >= 0) & ~np.isnan(values)
+
+    flat = row_codes[present] * len(col_labels) + col_codes[present]
+    size = len(row_labels) * len(col_labels)
+    sums = np.bincount(flat, weights=values[present], minlength=size)
+    counts = np.bincount(flat, minlength=size)
+    with np.errstate(invalid='ignore'):
+        matrix = (sums / counts).reshape(len(row_labels), len(col_labels))
+    return matrix, np.asarray(row_labels), np.asarray(col_labels)
+
+
+def _filled(matrix):
+    """Matrix with gaps filled by the column mean (then 0), for distance calculations"""
+    with np.errstate(invalid='ignore'):
+        col_means = np.nan_to_num(np.nanmean(matrix, axis=0))
+    return np.where(np.isnan(matrix), col_means, matrix)
+
+
+def cluster_order(matrix):
+    """Row order that places similar rows next to each other"""
+    if len(matrix) < 3:
+        return np.arange(len(matrix))
+    filled = _filled(matrix)
+    if hierarchy is not None:
+        linkage = hierarchy.linkage(filled, method='average', optimal_ordering=len(filled) <= 500)
+        return hierarchy.leaves_list(linkage)
+    centered = filled - filled.mean(axis=0)
+    return np.argsort(np.linalg.svd(centered, full_matrices=False)[0][:, 0], kind='stable')
+
+
+def _block_edges(n, max_blocks):
+    """Start index of each block when n items are grouped into at most max_blocks"""
+    return np.unique(np.linspace(0, n, min(n, max_blocks) + 1).astype(np.int64)[:-1])
+
+
+def _block_labels(labels, starts, ranged=True):
+    """'first – last' for blocks of sorted labels, 'first (+n)' for blocks of clustered ones"""
+    ends = np.r_[starts[1:], len(labels)] - 1
+    if ranged:
+        return np.array([labels[s] if s == e else f"{labels[s]} – {labels[e]}" for s, e in zip(starts, ends)])
+    return np.array([labels[s] if s == e else f"{labels[s]} (+{e - s})" for s, e in zip(starts, ends)])
+
+
+def coarsen(matrix, row_labels, col_labels, max_rows=MAX_ROWS, max_cols=MAX_COLS, sorted_rows=True):
+    """Block-average a matrix down to at most max_rows x max_cols cells"""
+    row_starts = _block_edges(matrix.shape[0], max_rows)
+    col_starts = _block_edges(matrix.shape[1], max_cols)
+    if len(row_starts) == matrix.shape[0] and len(col_starts) == matrix.shape[1]:
+        return matrix, row_labels, col_labels
+
+    present = ~np.isnan(matrix)
+    sums = np.add.reduceat(np.add.reduceat(np.where(present, matrix, 0.0), row_starts, axis=0), col_starts, axis=1)
+    counts = np.add.reduceat(np.add.reduceat(present.astype(np.int64), row_starts, axis=0), col_starts, axis=1)
+    with np.errstate(invalid='ignore'):
+        coarse = sums / counts
+    return coarse, _block_labels(row_labels, row_starts, sorted_rows), _block_labels(col_labels, col_starts)
+
+
+def prepare_heatmap(df, row='market', col='period', value='avg_occupancy_proportion', cluster=False,
+                    max_rows=MAX_ROWS, max_cols=MAX_COLS):
+    """Matrix and labels ready to draw: scattered, optionally clustered, then coarsened"""
+    matrix, row_labels, col_labels = heatmap_matrix(df, row, col, value)
+    if cluster:
+        order = cluster_order(matrix)
+        matrix, row_labels = matrix[order], row_labels[order]
+    return coarsen(matrix, row_labels, col_labels, max_rows, max_cols, sorted_rows=not cluster)
+
+
+def heatmap_figure(df, row='market', col='period', value='avg_occupancy_proportion', cluster=False,
+                   colorscale='Viridis', zmin=None, zmax=None, color_title=None, hovertemplate=None,
+                   max_rows=MAX_ROWS, max_cols=MAX_COLS, **layout):
+    """Plotly heatmap of df that stays light in the browser however many rows it has"""
+    matrix, row_labels, col_labels = prepare_heatmap(df, row, col, value, cluster, max_rows, max_cols)
+    fig = go.Figure(go.Heatmap(
+        z=matrix.astype(np.float32),
+        x=col_labels,
+        y=row_labels,
+        colorscale=colorscale,
+        zmin=zmin,
+        zmax=zmax,
+        colorbar=dict(title=color_title),
+        hovertemplate=hovertemplate,
+        hoverongaps=False
+    ))
+    # First row at the top, like a table
+    fig.update_yaxes(autorange='reversed')
+    fig.update_layout(**layout)
+    return fig
+
+
+def plot_heatmap(ax, matrix, row_labels, col_labels, cmap='YlGnBu', fmt='.2f',
+                 annotate_limit=ANNOTATE_LIMIT, max_ticks=60):
+    """Matplotlib heatmap on ax with imshow; cells are labelled only when there are few of them"""
+    image = ax.imshow(np.ma.masked_invalid(matrix), cmap=cmap, aspect='auto', interpolation='nearest')
+    ax.figure.colorbar(image, ax=ax)
+
+    row_step = max(1, len(row_labels) // max_ticks)
+    col_step = max(1, len(col_labels) // max_ticks)
+    ax.set_yticks(np.arange(0, len(row_labels), row_step))
+    ax.set_yticklabels(row_labels[::row_step])
+    ax.set_xticks(np.arange(0, len(col_labels), col_step))
+    ax.set_xticklabels(col_labels[::col_step], rotation=45, ha='right')
+    ax.grid(False)
+
+    if matrix.size <= annotate_limit:
+        # Dark text on light cells and vice versa
+        midpoint = np.nanmean(matrix)
+        for (i, j), cell in np.ndenumerate(matrix):
+            if not np.isnan(cell):
+                ax.text(j, i, format(cell, fmt), ha='center', va='center', fontsize=8,
+                        color='white' if cell > midpoint else 'black')
+    return image
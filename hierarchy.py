@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Sunburst/treemap hierarchies built from one grouped pass over the leaf level.
+# Upper levels are rolled up from the (small) aggregated leaf table, so the
+# cost is one groupby over the data no matter how deep the path is.
+
+
+def build_hierarchy(df, path, value, color=None):
+    """Return ids, labels, parents, values and colors arrays for a hierarchical chart"""
+    color = color or value
+    leaf = df[path].astype(str).assign(
+        _value=df[value].to_numpy(),
+        _weighted=df[value].to_numpy() * df[color].to_numpy()
+    )
+    leaf = leaf.groupby(path, sort=False, observed=True)[['_value', '_weighted']].sum().reset_index()
+
+    ids, labels, parents, values, weighted = [], [], [], [], []
+    level_df = leaf
+    for depth in range(len(path), 0, -1):
+        keys = path[:depth]
+        if depth < len(path):
+            level_df = level_df.groupby(keys, sort=False)[['_value', '_weighted']].sum().reset_index()
+
+        # ids are the slash-joined path, parents the id one level up
+        node_ids = level_df[keys[0]]
+        for key in keys[1:]:
+            node_ids = node_ids + '/' + level_df[key]
+        if depth > 1:
+            parent_ids = level_df[keys[0]]
+            for key in keys[1:-1]:
+                parent_ids = parent_ids + '/' + level_df[key]
+        else:
+            parent_ids = pd.Series('', index=level_df.index)
+
+        ids.append(node_ids.to_numpy())
+        labels.append(level_df[keys[-1]].to_numpy())
+        parents.append(parent_ids.to_numpy())
+        values.append(level_df['_value'].to_numpy())
+        weighted.append(level_df['_weighted'].to_numpy())
+
+    values = np.concatenate(values)
+    # Parent colour is the value-weighted mean of its children, as in px.sunburst
+    with np.errstate(invalid='ignore', divide='ignore'):
+        colors = np.concatenate(weighted) / values
+    return {
+        'ids': np.concatenate(ids),
+        'labels': np.concatenate(labels),
+        'parents': np.concatenate(parents),
+        'values': values,
+        'colors': colors,
+    }
+
+
+def sunburst_figure(df, path, value, color=None, colorscale='Viridis', color_title=None,
+                    hover_format=':.1f', hover_suffix='', title=None):
+    """Build a go.Sunburst directly from the hierarchy arrays"""
+    nodes = build_hierarchy(df, path, value, color)
+    color_title = color_title or color or value
+    fig = go.Figure(go.Sunburst(
+        ids=nodes['ids'],
+        labels=nodes['labels'],
+        parents=nodes['parents'],
+        values=nodes['values'],
+        branchvalues='total',
+        marker=dict(
+            colors=nodes['colors'],
+            colorscale=colorscale,
+            showscale=True,
+            colorbar=dict(title=color_title)
+        ),
+        hovertemplate=(
+            "<b>%{label}</b><br>" +
+            f"{color_title}: %{{color{hover_format}}}{hover_suffix}<br>" +
+            "<extra></extra>"
+        )
+    ))
+    fig.update_layout(title=title)
+    return fig
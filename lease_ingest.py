@@ -0,0 +1,13 @@
+import pandas as pd
+
+# The leases file is far too large to load in one go, so every lease-level
+# aggregation reads it through this chunked reader instead
+LEASES_PATH = 'Leases.csv'
+DEFAULT_CHUNKSIZE = 250_000
+
+
+def iter_lease_chunks(columns=None, chunksize=DEFAULT_CHUNKSIZE, path=LEASES_PATH):
+    """Stream the leases file chunk by chunk, optionally restricted to a few columns"""
+    reader = pd.read_csv(path, usecols=columns, chunksize=chunksize, low_memory=False)
+    for chunk in reader:
+        yield chunk
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, data_version, open_table, table_exists, write_table
+from lease_ingest import LEASES_PATH, iter_lease_chunks
+
+# Quarterly leasing roll-ups at every level of the geography
+# (building -> submarket -> cluster -> market -> region). The leases file is
+# streamed once into additive building x quarter sums; each coarser level is
+# a groupby of the level below, so all five tables come from one scan and are
+# cached in the column store per level. Ratios (class mix, rent,
+# availability) are derived from the sums on read, so they stay correct
+# however far a table is rolled up. Rent, RBA and availability in the leases
+# file are market (or market/class) values repeated on every lease, so their
+# sums are only kept at market level and above.
+PATH = ['region', 'market', 'internal_market_cluster', 'internal_submarket', 'building_id']
+LEVELS = {
+    'region': 1,
+    'market': 2,
+    'cluster': 3,
+    'submarket': 4,
+    'building': 5,
+}
+PERIOD_KEYS = ['year', 'quarter']
+SUM_COLUMNS = ['leased_sf', 'deals', 'class_a_sf', 'cbd_sf']
+MARKET_SUM_COLUMNS = ['rent_sf', 'rent_x_sf', 'rba', 'available_x_rba']
+MARKET_DEPTH = LEVELS['market']
+UNASSIGNED = 'Unassigned'
+COLUMNS = PATH + PERIOD_KEYS + ['leasedSF', 'internal_class', 'CBD_suburban', 'overall_rent',
+                                'RBA', 'availability_proportion']
+
+
+def level_keys(level):
+    """Group keys of a level: its path prefix plus the quarter"""
+    return PATH[:LEVELS[level]] + PERIOD_KEYS
+
+
+def level_columns(level):
+    """Sum columns stored for a level; market values only at market level and above"""
+    return SUM_COLUMNS + (MARKET_SUM_COLUMNS if LEVELS[level] <= MARKET_DEPTH else [])
+
+
+def _building_sums(chunk):
+    """Additive building x quarter sums for one chunk of leases"""
+    chunk = chunk.dropna(subset=['market', 'year', 'quarter'])
+    leased = chunk['leasedSF'].fillna(0.0).to_numpy()
+    rent = chunk['overall_rent'].to_numpy(dtype=np.float64)
+    has_rent = ~np.isnan(rent)
+    rba = chunk['RBA'].fillna(0.0).to_numpy()
+    available = chunk['availability_proportion'].to_numpy(dtype=np.float64)
+    has_available = ~np.isnan(available)
+
+    # Rent is weighted by leased SF and availability by building RBA
+    sums = chunk[PATH[:-1]].fillna(UNASSIGNED).assign(
+        building_id=chunk['building_id'].to_numpy(dtype=np.float64),
+        year=chunk['year'].astype(np.int64),
+        quarter=chunk['quarter'],
+        leased_sf=leased,
+        deals=1,
+        class_a_sf=np.where(chunk['internal_class'].to_numpy() == 'A', leased, 0.0),
+        cbd_sf=np.where(chunk['CBD_suburban'].to_numpy() == 'CBD', leased, 0.0),
+        rent_sf=np.where(has_rent, leased, 0.0),
+        rent_x_sf=np.where(has_rent, np.nan_to_num(rent) * leased, 0.0),
+        rba=np.where(has_available, rba, 0.0),
+        available_x_rba=np.where(has_available, np.nan_to_num(available) * rba, 0.0)
+    )
+    columns = SUM_COLUMNS + MARKET_SUM_COLUMNS
+    return sums.groupby(level_keys('building'), sort=False, dropna=False)[columns].sum().reset_index()
+
+
+def build_rollups(chunks):
+    """Stream lease chunks into a {level: quarterly sums table} dict for every level"""
+    partials = [_building_sums(chunk) for chunk in chunks]
+    partials = [partial for partial in partials if not partial.empty]
+    if not partials:
+        empty = pd.DataFrame(columns=PATH + PERIOD_KEYS + SUM_COLUMNS + MARKET_SUM_COLUMNS)
+        return {level: empty[level_keys(level) + level_columns(level)] for level in LEVELS}
+
+    # Buildings first, then each level is rolled up from the one below it
+    tables = {}
+    current = pd.concat(partials, ignore_index=True)
+    columns = SUM_COLUMNS + MARKET_SUM_COLUMNS
+    for level, depth in sorted(LEVELS.items(), key=lambda item: -item[1]):
+        current = current.groupby(level_keys(level), sort=True, dropna=False)[columns].sum().reset_index()
+        tables[level] = current[level_keys(level) + level_columns(level)]
+    return tables
+
+
+def load_rollup(level, path=LEASES_PATH, cache_dir=CACHE_DIR):
+    """Quarterly sums for one level, with all levels built together on first use"""
+    version = data_version(path)
+    if not table_exists(f"lease_rollup_{level}", version, cache_dir):
+        tables = build_rollups(iter_lease_chunks(columns=COLUMNS, path=path))
+        for name, table in tables.items():
+            write_table(table, f"lease_rollup_{name}", version, cache_dir)
+    return open_table(f"lease_rollup_{level}", version, cache_dir)
+
+
+def rollup_metrics(table, by=None, mask=None):
+    """Re-aggregate sums to `by` (default: the table's own keys) and derive the ratios.
+
+    market_rent and market_availability are only derived when the result is
+    at market grain or coarser.
+    """
+    if mask is not None:
+        table = table[np.asarray(mask)]
+    keys = list(by) if by is not None else [key for key in PATH if key in table.columns]
+    market_grain = (set(MARKET_SUM_COLUMNS) <= set(table.columns)
+                    and not set(keys) & set(PATH[MARKET_DEPTH:]))
+    columns = SUM_COLUMNS + (MARKET_SUM_COLUMNS if market_grain else [])
+    if by is not None:
+        table = table.groupby(list(by), sort=True, dropna=False)[columns].sum().reset_index()
+    else:
+        table = table[[column for column in table.columns if column not in MARKET_SUM_COLUMNS or market_grain]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table = table.assign(
+            class_a_share=table['class_a_sf'] / table['leased_sf'].where(table['leased_sf'] > 0),
+            cbd_share=table['cbd_sf'] / table['leased_sf'].where(table['leased_sf'] > 0)
+        )
+        if market_grain:
+            table = table.assign(
+                market_rent=table['rent_x_sf'] / table['rent_sf'].where(table['rent_sf'] > 0),
+                market_availability=table['available_x_rba'] / table['rba'].where(table['rba'] > 0)
+            )
+    return table
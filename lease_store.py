@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, data_version, drop_table, open_table, table_exists, write_table
+from entity_resolution import load_entity_lookup, with_entities
+from lease_ingest import LEASES_PATH, iter_lease_chunks
+
+# Partitioned lease store with a building index. Leases are streamed into
+# PARTITIONS column-store tables by a hash of building_id; each partition is
+# sorted by building_id, so all leases of a building are one contiguous row
+# range. The index maps building_id to (partition, start, stop) and costarID
+# to building_id, so a building's full history is one slice of memory-mapped
+# columns however large the leases file is. Every lease carries the resolved
+# tenant and building entity ids and canonical names from entity_resolution.
+# Partition rows are buffered in memory and written once. The buffers share
+# one budget of SPILL_ROWS rows: when it is passed, the largest buffers spill
+# to scratch tables until half the budget is free, so memory stays bounded
+# however large the leases file is.
+PARTITIONS = 32
+SPILL_ROWS = 1_000_000
+ENTITY_COLUMNS = ['company_name', 'building_name']
+INDEX_NAME = 'lease_building_index'
+COSTAR_NAME = 'lease_costar_index'
+
+
+def partition_of(building_ids, partitions=PARTITIONS):
+    """Partition number for each building id"""
+    ids = pd.Series(building_ids).astype(np.float64)
+    return (pd.util.hash_pandas_object(ids, index=False).to_numpy() % np.uint64(partitions)).astype(np.int64)
+
+
+def _partition_name(p):
+    return f"leases_p{p:02d}"
+
+
+def build_lease_store(chunks, version, partitions=PARTITIONS, cache_dir=CACHE_DIR, lookups=None,
+                      spill_rows=SPILL_ROWS):
+    """Stream lease chunks into sorted partitions and write the building and costar indexes.
+
+    lookups maps a name column to its entity lookup (see entity_resolution).
+    """
+    # Pass 1: buffer each chunk's rows per partition, spilling the largest buffers past the budget
+    buffers = {p: [] for p in range(partitions)}
+    buffered = np.zeros(partitions, dtype=np.int64)
+    spills = {p: [] for p in range(partitions)}
+    costar_pairs = []
+    for chunk in chunks:
+        chunk = chunk.reset_index(drop=True)
+        if lookups:
+            chunk = with_entities(chunk, lookups)
+        parts = partition_of(chunk['building_id'], partitions)
+        order = np.argsort(parts, kind='stable')
+        starts = np.searchsorted(parts[order], np.arange(partitions + 1))
+        for p in range(partitions):
+            rows = order[starts[p]:starts[p + 1]]
+            if not len(rows):
+                continue
+            buffers[p].append(chunk.iloc[rows])
+            buffered[p] += len(rows)
+        if buffered.sum() >= spill_rows:
+            while buffered.sum() > spill_rows // 2:
+                p = int(buffered.argmax())
+                name = f"{_partition_name(p)}_s{len(spills[p]):03d}"
+                write_table(pd.concat(buffers[p], ignore_index=True), name, version, cache_dir)
+                spills[p].append(name)
+                buffers[p], buffered[p] = [], 0
+        if 'costarID' in chunk:
+            costar_pairs.append(chunk[['costarID', 'building_id']].dropna().drop_duplicates())
+
+    # Pass 2: each partition fits in memory on its own; sort it once and record building ranges
+    index_parts = []
+    for p in range(partitions):
+        frames = [open_table(name, version, cache_dir) for name in spills[p]] + buffers[p]
+        if not frames:
+            continue
+        partition = pd.concat(frames, ignore_index=True)
+        partition = partition.sort_values('building_id', kind='stable').reset_index(drop=True)
+        write_table(partition, _partition_name(p), version, cache_dir)
+        buffers[p] = []
+        for name in spills[p]:
+            drop_table(name, version, cache_dir)
+
+        ids = partition['building_id'].to_numpy(dtype=np.float64)
+        present = ~np.isnan(ids)
+        starts = np.flatnonzero(present & np.r_[True, ids[1:] != ids[:-1]])
+        stops = np.r_[starts[1:], present.sum()]
+        index_parts.append(pd.DataFrame({
+            'building_id': ids[starts],
+            'partition': p,
+            'start': starts,
+            'stop': stops,
+        }))
+
+    index = pd.concat(index_parts, ignore_index=True).sort_values('building_id').reset_index(drop=True)
+    write_table(index, INDEX_NAME, version, cache_dir)
+    costar = (pd.concat(costar_pairs, ignore_index=True).drop_duplicates().sort_values('costarID')
+              if costar_pairs else pd.DataFrame(columns=['costarID', 'building_id']))
+    write_table(costar.reset_index(drop=True).astype(np.float64), COSTAR_NAME, version, cache_dir)
+    return index
+
+
+def load_lease_store(path=LEASES_PATH, partitions=PARTITIONS, cache_dir=CACHE_DIR):
+    """(version, building index, costar index), building the store on first use"""
+    version = data_version(path)
+    if not table_exists(INDEX_NAME, version, cache_dir):
+        lookups = {column: load_entity_lookup(column, path, cache_dir) for column in ENTITY_COLUMNS}
+        build_lease_store(iter_lease_chunks(path=path), version, partitions, cache_dir, lookups)
+    return version, open_table(INDEX_NAME, version, cache_dir), open_table(COSTAR_NAME, version, cache_dir)
+
+
+def building_history(store, building_id, cache_dir=CACHE_DIR):
+    """All leases of one building: a single row-range slice of its partition"""
+    version, index, _ = store
+    ids = index['building_id'].to_numpy()
+    i = np.searchsorted(ids, float(building_id))
+    if i >= len(ids) or ids[i] != float(building_id):
+        return None
+    entry = index.iloc[i]
+    rows = slice(int(entry['start']), int(entry['stop']))
+    return open_table(_partition_name(int(entry['partition'])), version, cache_dir, rows=rows)
+
+
+def buildings_for_costar(store, costar_id):
+    """building_id values recorded against a CoStar property id"""
+    _, _, costar = store
+    ids = costar['costarID'].to_numpy()
+    lo = np.searchsorted(ids, float(costar_id), side='left')
+    hi = np.searchsorted(ids, float(costar_id), side='right')
+    return costar['building_id'].to_numpy()[lo:hi]
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, data_version, open_table, table_exists, write_table
+from macro_data import UNEMPLOYMENT_PATH, join_unemployment, load_macro_table, quarter_period
+
+# Lead/lag evidence for occupancy vs macro indicators. Each series is laid out
+# as a (quarter x market) panel and every statistic is a masked column-wise
+# correlation over a stacked array: all lags at once, all rolling windows at
+# once, and all moving-block bootstrap resamples at once. Results are stored
+# in long form in the column store, keyed on the source files.
+OCCUPANCY_PATH = 'Major Market Occupancy Data-revised.csv'
+MAX_LAG = 8
+ROLLING_WINDOW = 8
+BOOTSTRAP_SAMPLES = 500
+BLOCK_LENGTH = 4
+CONFIDENCE = 0.90
+MACRO_SERIES = ['unemployment_rate']
+
+
+def columnwise_corr(a, b, min_periods=4):
+    """Pearson correlation along axis -2 (time) of matching columns, skipping NaNs pairwise"""
+    both = ~(np.isnan(a) | np.isnan(b))
+    n = both.sum(axis=-2)
+    a0 = np.where(both, a, 0.0)
+    b0 = np.where(both, b, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_a = a0.sum(axis=-2) / n
+        mean_b = b0.sum(axis=-2) / n
+        da = np.where(both, a0 - np.expand_dims(mean_a, -2), 0.0)
+        db = np.where(both, b0 - np.expand_dims(mean_b, -2), 0.0)
+        corr = (da * db).sum(axis=-2) / np.sqrt((da ** 2).sum(axis=-2) * (db ** 2).sum(axis=-2))
+    return np.where(n >= min_periods, corr, np.nan)
+
+
+def lag_stack(panel, lags):
+    """(lags x T x M) stack where layer k holds panel shifted down by lags[k], NaN-padded"""
+    T = panel.shape[0]
+    padded = np.concatenate([np.full((max(lags.max(), 0),) + panel.shape[1:], np.nan), panel,
+                             np.full((max(-lags.min(), 0),) + panel.shape[1:], np.nan)])
+    start = max(lags.max(), 0) - lags
+    return np.stack([padded[s:s + T] for s in start])
+
+
+def block_bootstrap_rows(T, samples, block_length=BLOCK_LENGTH, seed=0):
+    """(samples x T) row indices from a moving-block bootstrap, preserving short-run autocorrelation"""
+    rng = np.random.default_rng(seed)
+    blocks = -(-T // block_length)
+    starts = rng.integers(0, max(T - block_length + 1, 1), size=(samples, blocks))
+    rows = starts[:, :, None] + np.arange(block_length)
+    return np.minimum(rows.reshape(samples, -1)[:, :T], T - 1)
+
+
+def lagged_correlations(target, driver, max_lag=MAX_LAG, samples=BOOTSTRAP_SAMPLES,
+                        confidence=CONFIDENCE, chunk=100):
+    """Correlation of target(t) with driver(t - lag) for every lag and market, with bootstrap intervals.
+
+    A positive lag means the driver leads the target.
+    """
+    lags = np.arange(-max_lag, max_lag + 1)
+    shifted = lag_stack(driver, lags)
+    corr = columnwise_corr(target[None], shifted)
+
+    # Resample the same quarters for every lag and market; chunks bound memory
+    rows = block_bootstrap_rows(target.shape[0], samples)
+    resampled = []
+    for start in range(0, samples, chunk):
+        idx = rows[start:start + chunk]
+        resampled.append(columnwise_corr(target[idx][:, None], shifted[:, idx].swapaxes(0, 1)))
+    resampled = np.concatenate(resampled)
+    tail = (1 - confidence) / 2 * 100
+    with np.errstate(invalid='ignore'):
+        low, high = np.nanpercentile(resampled, [tail, 100 - tail], axis=0)
+    return lags, corr, low, high
+
+
+def rolling_correlations(target, driver, window=ROLLING_WINDOW):
+    """(windows x M) same-quarter correlation over each trailing window"""
+    if target.shape[0] < window:
+        return np.empty((0, target.shape[1]))
+    a = np.lib.stride_tricks.sliding_window_view(target, window, axis=0)
+    b = np.lib.stride_tricks.sliding_window_view(driver, window, axis=0)
+    # sliding_window_view puts the window last; move it to the time axis
+    return columnwise_corr(np.swapaxes(a, -1, -2), np.swapaxes(b, -1, -2))
+
+
+def build_macro_correlations(occupancy_df, macro, series=MACRO_SERIES, value='avg_occupancy_proportion'):
+    """Lagged (with intervals) and rolling correlations of occupancy vs each macro series, in long form"""
+    joined = occupancy_df
+    for column in series:
+        joined = join_unemployment(joined, macro, column=column)
+    joined = joined.assign(period_id=quarter_period(joined['year'], joined['quarter']),
+                           period=joined['year'].astype(str) + "-" + joined['quarter'].astype(str))
+
+    target = joined.pivot_table(index='period_id', columns='market', values=value, aggfunc='mean')
+    markets = target.columns.to_numpy()
+    period_ids = target.index
+    periods = joined.drop_duplicates('period_id').set_index('period_id')['period'].reindex(target.index).to_numpy()
+    target = target.to_numpy(dtype=np.float64)
+
+    lag_frames, rolling_frames = [], []
+    for column in series:
+        driver = joined.pivot_table(index='period_id', columns='market', values=column, aggfunc='mean')
+        driver = driver.reindex(index=period_ids, columns=markets).to_numpy(dtype=np.float64)
+        lags, corr, low, high = lagged_correlations(target, driver)
+        lag_frames.append(pd.DataFrame({
+            'series': column,
+            'market': np.tile(markets, len(lags)),
+            'lag': np.repeat(lags, len(markets)),
+            'corr': corr.ravel(),
+            'ci_low': low.ravel(),
+            'ci_high': high.ravel(),
+        }))
+        rolling = rolling_correlations(target, driver)
+        rolling_frames.append(pd.DataFrame({
+            'series': column,
+            'market': np.tile(markets, len(rolling)),
+            'period': np.repeat(periods[ROLLING_WINDOW - 1:][:len(rolling)], len(markets)),
+            'corr': rolling.ravel(),
+        }))
+    return {'lags': pd.concat(lag_frames, ignore_index=True),
+            'rolling': pd.concat(rolling_frames, ignore_index=True)}
+
+
+def load_macro_correlations(occupancy_path=OCCUPANCY_PATH, unemployment_path=UNEMPLOYMENT_PATH,
+                            cache_dir=CACHE_DIR):
+    """Cached {'lags', 'rolling'} correlation tables, rebuilt when either source file changes"""
+    version = data_version(occupancy_path, unemployment_path)
+    if not table_exists('macro_corr_rolling', version, cache_dir):
+        tables = build_macro_correlations(pd.read_csv(occupancy_path),
+                                          load_macro_table('quarterly', unemployment_path, cache_dir))
+        for name, table in tables.items():
+            write_table(table, f"macro_corr_{name}", version, cache_dir)
+    return {name: open_table(f"macro_corr_{name}", version, cache_dir) for name in ('lags', 'rolling')}
+
+
+def lead_lag_summary(lags_df, series='unemployment_rate'):
+    """Per market: same-quarter correlation with its interval, and the lag of strongest correlation"""
+    rows = lags_df[lags_df['series'] == series]
+    same = rows[rows['lag'] == 0].set_index('market')[['corr', 'ci_low', 'ci_high']]
+    strongest = rows.dropna(subset=['corr'])
+    strongest = strongest.loc[strongest['corr'].abs().groupby(strongest['market']).idxmax()]
+    strongest = strongest.set_index('market')[['lag', 'corr']].rename(columns={'lag': 'best_lag', 'corr': 'best_corr'})
+    return same.join(strongest).reset_index().sort_values('corr')
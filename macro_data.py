@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from column_store import CACHE_DIR, data_version, extend_table, open_table, table_exists, write_table
+from market_metadata import MARKET_METADATA, canonical_markets, market_lookup
+
+# Market x period unemployment, built once from the state-level monthly file.
+# Metros that span several states take a labour-force weighted average of
+# their states (weights are renormalised over the states reported that month).
+# Both grains are cached in the column store with integer market and period
+# ids, so joins are array lookups instead of string merges.
+UNEMPLOYMENT_PATH = 'Unemployment.csv'
+
+# Approximate labour-force shares of each state in the metro
+MARKET_STATE_WEIGHTS = {
+    'Washington D.C.': {'DC': 0.12, 'VA': 0.45, 'MD': 0.43},
+    'Philadelphia': {'PA': 0.72, 'NJ': 0.22, 'DE': 0.06},
+    'Chicago': {'IL': 0.90, 'IN': 0.07, 'WI': 0.03},
+    'Chicago Suburbs': {'IL': 0.90, 'IN': 0.07, 'WI': 0.03},
+    'Boston': {'MA': 0.92, 'NH': 0.08},
+    'Manhattan': {'NY': 1.0},
+    'Northern Virginia': {'VA': 1.0},
+    'Baltimore': {'MD': 1.0},
+    'Orange County': {'CA': 1.0},
+    'San Diego': {'CA': 1.0},
+}
+QUARTERS = ['Q1', 'Q2', 'Q3', 'Q4']
+
+
+def macro_markets():
+    """Every market with a state mapping: the metadata table plus the weighted metros"""
+    return pd.Index(pd.unique(np.r_[MARKET_METADATA['market'].to_numpy(dtype=object),
+                                    np.array(list(MARKET_STATE_WEIGHTS), dtype=object)]))
+
+
+def state_weights(markets, states):
+    """(markets x states) weight matrix; single-state markets fall back to the metadata state"""
+    home_state = market_lookup('state')
+    state_index = pd.Index(states)
+    weights = np.zeros((len(markets), len(states)))
+    for i, market in enumerate(markets):
+        for state, weight in MARKET_STATE_WEIGHTS.get(market, {home_state.get(market): 1.0}).items():
+            j = state_index.get_indexer([state])[0]
+            if j >= 0:
+                weights[i, j] = weight
+    return weights
+
+
+def month_period(year, month):
+    """Integer month ids"""
+    return np.asarray(year, dtype=np.int64) * 12 + np.asarray(month, dtype=np.int64) - 1
+
+
+def quarter_period(year, quarter):
+    """Integer quarter ids; -1 where the quarter label is not Q1-Q4"""
+    quarter_number = pd.Series(quarter, dtype=object).map({q: i for i, q in enumerate(QUARTERS)})
+    valid = quarter_number.notna().to_numpy()
+    return np.where(valid, np.asarray(year, dtype=np.int64) * 4 + quarter_number.fillna(0).to_numpy(dtype=np.int64), -1)
+
+
+def build_macro_tables(unemployment_df):
+    """Monthly and quarterly market unemployment tables from state-level monthly rates"""
+    rates = unemployment_df.pivot_table(index='state', columns=['year', 'month'],
+                                        values='unemployment_rate', aggfunc='mean')
+    markets = macro_markets()
+    weights = state_weights(markets, rates.index)
+
+    # Weighted mean over the states that report each month
+    reported = rates.notna().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        monthly_rates = (weights @ np.nan_to_num(rates.to_numpy())) / (weights @ reported)
+    years = rates.columns.get_level_values('year').to_numpy(dtype=np.int64)
+    months = rates.columns.get_level_values('month').to_numpy(dtype=np.int64)
+
+    monthly = pd.DataFrame({
+        'market_id': np.repeat(np.arange(len(markets)), len(years)),
+        'market': np.repeat(markets.to_numpy(), len(years)),
+        'year': np.tile(years, len(markets)),
+        'month': np.tile(months, len(markets)),
+        'period_id': np.tile(month_period(years, months), len(markets)),
+        'unemployment_rate': monthly_rates.ravel(),
+    })
+
+    quarterly = monthly.assign(quarter=np.array(QUARTERS, dtype=object)[(monthly['month'].to_numpy() - 1) // 3])
+    quarterly = quarterly.groupby(['market_id', 'market', 'year', 'quarter'], sort=True)['unemployment_rate'].mean()
+    quarterly = quarterly.reset_index()
+    quarterly['period_id'] = quarter_period(quarterly['year'], quarterly['quarter'])
+    return {'monthly': monthly, 'quarterly': quarterly}
+
+
+def load_macro_table(grain='quarterly', path=UNEMPLOYMENT_PATH, cache_dir=CACHE_DIR):
+    """Cached market x period unemployment table ('monthly' or 'quarterly')"""
+    version = data_version(path)
+    if not table_exists(f"macro_{grain}", version, cache_dir):
+        for name, table in build_macro_tables(pd.read_csv(path)).items():
+            write_table(table, f"macro_{name}", version, cache_dir)
+    return open_table(f"macro_{grain}", version, cache_dir)
+
+
+def join_unemployment(df, macro, on='market', column='unemployment_rate'):
+    """Add the macro table's unemployment rate to df by (market id, period id) array lookup"""
+    # Market ids come from the table itself, so a cached table stays consistent
+    ids, first_rows = np.unique(macro['market_id'].to_numpy(), return_index=True)
+    markets = pd.Index(macro['market'].to_numpy()[first_rows])
+    market_ids = markets.get_indexer(canonical_markets(df[on], markets))
+    if 'month' in macro:
+        period_ids = month_period(df['year'], df['month'])
+    else:
+        period_ids = quarter_period(df['year'], df['quarter'])
+
+    # Dense market x period grid, so the join is one fancy-index
+    first_period = int(macro['period_id'].min())
+    grid = np.full((int(ids.max()) + 1, int(macro['period_id'].max()) - first_period + 1), np.nan)
+    grid[macro['market_id'].to_numpy(), macro['period_id'].to_numpy() - first_period] = macro[column].to_numpy()
+    offsets = period_ids - first_period
+    market_ids = np.where(market_ids >= 0, ids[np.maximum(market_ids, 0)], -1)
+    found = (market_ids >= 0) & (period_ids >= 0) & (offsets >= 0) & (offsets < grid.shape[1])
+    values = np.where(found, grid[np.where(found, market_ids, 0), np.where(found, offsets, 0)], np.nan)
+    return extend_table(df, **{column: values})
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from column_store import extend_table
+
+# One row per market name used anywhere in the project. Charts and analyses
+# join against this table instead of carrying their own inline dicts.
+#   region              - West / South / East / Midwest, as used by the sunburst charts
+#   category            - market type; Austin is a Tech Hub first, Southern Market second
+#   presentation_region - East / West / Midwest / Texas / South split used by the slides
+#   lat, lon            - map coordinates
+#   significance        - relative market importance used for bubble weighting
+#   state               - state for joining state-level macro data
+#   industry            - dominant BLS industry, used for the remote work comparison
+MARKET_COLUMNS = ['market', 'region', 'category', 'presentation_region', 'lat', 'lon',
+                  'significance', 'state', 'industry']
+MARKET_ROWS = [
+    ('Manhattan', 'East', 'Financial Center', 'East', 40.7831, -73.9712, 100, 'NY', 'Financial activities'),
+    ('San Francisco', 'West', 'Tech Hub', 'West', 37.7749, -122.4194, 90, 'CA', 'Information'),
+    ('Los Angeles', 'West', 'Regional Center', 'West', 34.0522, -118.2437, 90, 'CA', 'Information'),
+    ('Chicago', 'Midwest', 'Financial Center', 'Midwest', 41.8781, -87.6298, 85, 'IL', 'Financial activities'),
+    ('Boston', 'East', 'Financial Center', 'East', 42.3601, -71.0589, 80, 'MA', 'Education and health services'),
+    ('Dallas/Ft Worth', 'South', 'Southern Market', 'Texas', 32.7767, -96.7970, 85, 'TX', 'Professional and business services'),
+    ('Houston', 'South', 'Southern Market', 'Texas', 29.7604, -95.3698, 80, 'TX', 'Transportation and utilities'),
+    ('Washington D.C.', 'East', 'Regional Center', 'East', 38.9072, -77.0369, 85, 'DC', 'Public administration'),
+    ('Philadelphia', 'East', 'Regional Center', 'East', 39.9526, -75.1652, 70, 'PA', 'Education and health services'),
+    ('South Bay/San Jose', 'West', 'Tech Hub', 'West', 37.3382, -121.8863, 80, 'CA', 'Information'),
+    ('Austin', 'South', 'Tech Hub', 'Texas', 30.2672, -97.7431, 75, 'TX', 'Information'),
+    ('Seattle', 'West', 'Tech Hub', None, 47.6062, -122.3321, None, 'WA', None),
+    ('Atlanta', None, None, 'South', 33.7490, -84.3880, 75, 'GA', None),
+    ('Denver', None, None, 'West', 39.7392, -104.9903, 70, 'CO', None),
+    ('Miami', None, None, None, 25.7617, -80.1918, None, 'FL', None),
+    ('Phoenix', None, None, None, 33.4484, -112.0740, None, 'AZ', None),
+]
+
+# Values for markets missing from the table (or with a blank field)
+MARKET_DEFAULTS = {
+    'region': 'Other',
+    'category': 'Other',
+    'presentation_region': 'Other',
+    'lat': np.nan,
+    'lon': np.nan,
+    'significance': 50,
+    'state': None,
+    'industry': None,
+}
+
+# Other spellings of market names, keyed by market_key(); spellings that only
+# differ in case or punctuation ('Dallas-Ft. Worth', 'Washington DC') need no entry
+MARKET_ALIASES = {
+    'southbay': 'South Bay/San Jose',
+    'sanjose': 'South Bay/San Jose',
+    'dallas': 'Dallas/Ft Worth',
+    'dallasfortworth': 'Dallas/Ft Worth',
+    'dc': 'Washington D.C.',
+    'washington': 'Washington D.C.',
+    'newyork': 'Manhattan',
+    'nyc': 'Manhattan',
+}
+
+MARKET_METADATA = pd.DataFrame(MARKET_ROWS, columns=MARKET_COLUMNS)
+MARKET_INDEX = pd.Index(MARKET_METADATA['market'])
+
+
+def market_key(markets):
+    """Lower-case alphanumeric form of market names, for matching alternate spellings"""
+    return pd.Series(markets, dtype=object).astype(str).str.lower().str.replace(r'[^a-z0-9]', '', regex=True).to_numpy()
+
+
+def canonical_markets(markets, known=None):
+    """Map alternate spellings onto the names in `known` (default: the metadata table); others pass through"""
+    known = pd.Series(MARKET_METADATA['market'] if known is None else known, dtype=object).drop_duplicates()
+    lookup = dict(zip(market_key(known), known))
+    lookup.update({alias: name for alias, name in MARKET_ALIASES.items() if alias not in lookup})
+    markets = pd.Series(markets, dtype=object).reset_index(drop=True)
+    resolved = pd.Series(market_key(markets)).map(lookup)
+    return resolved.where(resolved.notna(), markets).to_numpy()
+
+
+def market_columns(markets, columns, defaults=None):
+    """Look up metadata columns for an array of market names in one hashed pass"""
+    defaults = {**MARKET_DEFAULTS, **(defaults or {})}
+    positions = MARKET_INDEX.get_indexer(pd.Series(markets).to_numpy())
+    known = positions >= 0
+    result = {}
+    for column in columns:
+        values = MARKET_METADATA[column].to_numpy()[np.where(known, positions, 0)]
+        values = pd.Series(values).where(known & pd.notna(values), defaults[column])
+        result[column] = values.to_numpy()
+    return result
+
+
+def with_market_metadata(df, columns=None, on='market', defaults=None, rename=None):
+    """Return df with metadata columns joined on by market (existing columns are shared, not copied)"""
+    columns = columns or [c for c in MARKET_COLUMNS if c != 'market']
+    looked_up = market_columns(df[on], columns, defaults)
+    rename = rename or {}
+    return extend_table(df, **{rename.get(c, c): values for c, values in looked_up.items()})
+
+
+def market_lookup(column):
+    """Plain market -> value dict for scalar lookups"""
+    values = market_columns(MARKET_METADATA['market'], [column])[column]
+    return dict(zip(MARKET_METADATA['market'], values))
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# All-pairs market comparison store. Every market's series is laid out as one
+# column of a (period x market) panel, and pairwise statistics are computed for
+# all pairs at once with masked matrix products, so looking up any pair later is
+# plain indexing.
+MAX_LAG = 4
+DIVERGENCE_THRESHOLD = 5.0  # percentage points of the baseline
+
+
+def _pairwise_corr(a, b):
+    """Pearson correlation of every column of a with every column of b, over rows where both exist"""
+    wa = (~np.isnan(a)).astype(np.float64)
+    wb = (~np.isnan(b)).astype(np.float64)
+    a0 = np.nan_to_num(a)
+    b0 = np.nan_to_num(b)
+
+    n = wa.T @ wb
+    sum_a = a0.T @ wb
+    sum_b = wa.T @ b0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = a0.T @ b0 - sum_a * sum_b / n
+        var_a = (a0 ** 2).T @ wb - sum_a ** 2 / n
+        var_b = wa.T @ (b0 ** 2) - sum_b ** 2 / n
+        corr = cov / np.sqrt(var_a * var_b)
+    corr[n < 3] = np.nan
+    return corr
+
+
+def _shift(panel, lag):
+    """Shift panel rows down by lag (up for negative lag), padding with NaN"""
+    shifted = np.full_like(panel, np.nan)
+    if lag > 0:
+        shifted[lag:] = panel[:-lag]
+    elif lag < 0:
+        shifted[:lag] = panel[-lag:]
+    else:
+        shifted[:] = panel
+    return shifted
+
+
+def build_market_pairs(df, value='avg_occupancy_proportion', period='period',
+                       baseline_period=None, max_lag=MAX_LAG, threshold=DIVERGENCE_THRESHOLD):
+    """Precompute correlation, lagged correlation, recovery gap and divergence quarter for every market pair"""
+    wide = df.pivot_table(index=period, columns='market', values=value, aggfunc='mean').sort_index()
+    panel = wide.to_numpy(dtype=np.float64)
+    periods = wide.index.to_numpy()
+    markets = pd.Index(wide.columns)
+
+    corr = _pairwise_corr(panel, panel)
+
+    # Lagged correlation: lag k pairs market a at t with market b at t + k,
+    # so a positive best lag means b follows a
+    lags = np.arange(-max_lag, max_lag + 1)
+    lagged = np.stack([_pairwise_corr(panel, _shift(panel, -lag)) for lag in lags])
+    filled = np.where(np.isnan(lagged), -np.inf, lagged)
+    best = filled.argmax(axis=0)
+    best_lag = lags[best]
+    best_lag_corr = np.take_along_axis(lagged, best[None], axis=0)[0]
+
+    # Each market indexed to its baseline period (first period by default)
+    base_rows = np.flatnonzero(periods == baseline_period) if baseline_period is not None else []
+    base_row = int(base_rows[0]) if len(base_rows) else 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        indexed = panel / panel[base_row] * 100
+
+    # Recovery = latest available indexed value per market
+    last_valid = np.where(~np.isnan(indexed), np.arange(len(periods))[:, None], -1).max(axis=0)
+    recovery = np.where(last_valid >= 0, indexed[np.maximum(last_valid, 0), np.arange(len(markets))], np.nan)
+    recovery_gap = recovery[:, None] - recovery[None, :]
+
+    # Divergence: first period where the indexed paths sit threshold points apart
+    gaps = np.abs(indexed[:, :, None] - indexed[:, None, :])
+    diverged = np.nan_to_num(gaps, nan=0.0) >= threshold
+    divergence_row = np.where(diverged.any(axis=0), diverged.argmax(axis=0), -1)
+
+    return {
+        'markets': markets,
+        'periods': periods,
+        'panel': panel,
+        'indexed': indexed,
+        'recovery': recovery,
+        'corr': corr,
+        'best_lag': best_lag,
+        'best_lag_corr': best_lag_corr,
+        'recovery_gap': recovery_gap,
+        'divergence_row': divergence_row,
+    }
+
+
+def pair_summary(pairs, market1, market2):
+    """Look up the precomputed statistics for one market pair"""
+    i = pairs['markets'].get_loc(market1)
+    j = pairs['markets'].get_loc(market2)
+    row = pairs['divergence_row'][i, j]
+    return {
+        'correlation': pairs['corr'][i, j],
+        'best_lag': int(pairs['best_lag'][i, j]),
+        'best_lag_correlation': pairs['best_lag_corr'][i, j],
+        'recovery_1': pairs['recovery'][i],
+        'recovery_2': pairs['recovery'][j],
+        'recovery_gap': pairs['recovery_gap'][i, j],
+        'divergence_period': pairs['periods'][row] if row >= 0 else None,
+    }
+
+
+def market_series(pairs, market):
+    """Periods and values of one market's series from the panel"""
+    values = pairs['panel'][:, pairs['markets'].get_loc(market)]
+    present = ~np.isnan(values)
+    return pairs['periods'][present], values[present]
+
+
+def build_comparison_pairs(occupancy_df, availability_df):
+    """Pair stores for occupancy plus Class A availability and rent"""
+    class_a = availability_df[availability_df['internal_class'] == 'A']
+    class_a = class_a.assign(period=class_a['year'].astype(str) + "-" + class_a['quarter'])
+    return (
+        build_market_pairs(occupancy_df, baseline_period='2020-Q1'),
+        build_market_pairs(class_a, value='availability_proportion'),
+        build_market_pairs(class_a, value='internal_class_rent')
+    )
@@ -0,0 +1,32 @@
+import numpy as np
+
+from column_store import group_views
+
+# Per-period snapshot tables: every market's value in a period together with
+# its rank, change vs the baseline period and change vs the prior period.
+# All periods are computed in one vectorised pass and split into views, so
+# moving a period slider is a dictionary lookup.
+
+
+def build_period_snapshots(df, value='avg_occupancy_proportion', period='period', baseline_period='2020-Q1'):
+    """Return {period: snapshot frame sorted by value, highest first}"""
+    ordered = df[['market', period, value]].sort_values(['market', period], kind='stable')
+    values = ordered[value].to_numpy()
+
+    # Prior period value for the same market
+    same_market = ordered['market'].to_numpy()[1:] == ordered['market'].to_numpy()[:-1]
+    prior = np.r_[np.nan, np.where(same_market, values[:-1], np.nan)]
+
+    # Baseline value for each market
+    base_rows = ordered[ordered[period] == baseline_period]
+    baseline = ordered['market'].map(base_rows.set_index('market')[value]).to_numpy()
+
+    snapshots = ordered.assign(
+        rank=ordered.groupby(period)[value].rank(ascending=False, method='min'),
+        change_vs_baseline=values - baseline,
+        pct_of_baseline=values / baseline * 100,
+        change_vs_prior=values - prior
+    )
+    snapshots = snapshots.sort_values([period, value], ascending=[True, False], kind='stable')
+    snapshots = snapshots.reset_index(drop=True)
+    return group_views(snapshots, period)
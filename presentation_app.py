@@ -1,11 +1,15 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import matplotlib.pyplot as plt
 from PIL import Image
+from column_store import data_version, extend_table, load_table
+from market_metadata import with_market_metadata
+from hierarchy import sunburst_figure
+from market_pairs import build_comparison_pairs, pair_summary, market_series
+from heatmap_engine import heatmap_figure
 
 # Page configuration
 st.set_page_config(
@@ -59,36 +63,30 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Cache data loading
-@st.cache_data(ttl=3600)
-def load_data():
-    occupancy_df = pd.read_csv('Major Market Occupancy Data-revised.csv')
-    availability_df = pd.read_csv('Price and Availability Data.csv')
-    
-    # Create period column for easier plotting
-    occupancy_df['period'] = occupancy_df['year'].astype(str) + "-" + occupancy_df['quarter']
-    
-    # Add coordinates for map visualization
-    market_coordinates = {
-        'Manhattan': {'lat': 40.7831, 'lon': -73.9712},
-        'San Francisco': {'lat': 37.7749, 'lon': -122.4194},
-        'Los Angeles': {'lat': 34.0522, 'lon': -118.2437},
-        'Chicago': {'lat': 41.8781, 'lon': -87.6298},
-        'Boston': {'lat': 42.3601, 'lon': -71.0589},
-        'Dallas/Ft Worth': {'lat': 32.7767, 'lon': -96.7970},
-        'Houston': {'lat': 29.7604, 'lon': -95.3698},
-        'Washington D.C.': {'lat': 38.9072, 'lon': -77.0369},
-        'Philadelphia': {'lat': 39.9526, 'lon': -75.1652},
-        'South Bay/San Jose': {'lat': 37.3382, 'lon': -121.8863},
-        'Austin': {'lat': 30.2672, 'lon': -97.7431}
-    }
+DATA_FILES = ['Major Market Occupancy Data-revised.csv', 'Price and Availability Data.csv']
+
+# Shared across sessions: the tables are read-only memory-mapped columns,
+# so every viewer maps the same pages instead of holding its own copy.
+# Callers must not write into these frames; .copy() before any in-place edit.
+@st.cache_resource
+def load_data(version):
+    occupancy_df = load_table('Major Market Occupancy Data-revised.csv')
+    availability_df = load_table('Price and Availability Data.csv')
     
-    # Add coordinates to occupancy dataframe
-    occupancy_map_df = occupancy_df.copy()
-    occupancy_map_df['lat'] = occupancy_map_df['market'].map(lambda x: market_coordinates.get(x, {}).get('lat'))
-    occupancy_map_df['lon'] = occupancy_map_df['market'].map(lambda x: market_coordinates.get(x, {}).get('lon'))
+    # Create period column for easier plotting (added alongside the shared columns)
+    occupancy_df = extend_table(occupancy_df, period=occupancy_df['year'].astype(str) + "-" + occupancy_df['quarter'])
+    
+    # Add coordinates for map visualization from the market metadata table
+    occupancy_map_df = with_market_metadata(occupancy_df, ['lat', 'lon'])
     
     return occupancy_df, availability_df, occupancy_map_df
 
+# All-pairs comparison stores, built once per dataset version
+@st.cache_resource
+def load_market_pairs(version):
+    occupancy_df, availability_df, _ = load_data(version)
+    return build_comparison_pairs(occupancy_df, availability_df)
+
 # Creating the market recovery analysis
 def create_recovery_analysis(occupancy_df):
     # Compute pre-pandemic baseline (Q1 2020)
@@ -215,49 +213,43 @@ def create_3d_map(map_data):
     return fig
 
 def create_occupancy_heatmap(occupancy_df):
-    # Pivot the data for the heatmap
-    pivot_df = occupancy_df.pivot(index='market', columns='period', values='avg_occupancy_proportion')
-    
-    # Create heatmap
-    fig = px.imshow(
-        pivot_df,
-        labels=dict(x="Time Period", y="Market", color="Occupancy Rate"),
-        x=pivot_df.columns,
-        y=pivot_df.index,
-        color_continuous_scale="Viridis",
+    # Markets clustered by their occupancy paths; large tables are block-averaged to screen size
+    fig = heatmap_figure(
+        occupancy_df,
+        cluster=True,
+        color_title="Occupancy Rate",
+        hovertemplate="<b>%{y}</b><br>%{x}<br>Occupancy Rate: %{z:.3f}<extra></extra>",
         title="Market Occupancy Patterns Over Time"
     )
     
     fig.update_layout(
         height=500,
-        xaxis={'side': 'top'},
-        coloraxis_colorbar=dict(
-            title="Occupancy Rate",
-            thicknessmode="pixels", thickness=20,
-            lenmode="pixels", len=300
-        )
+        xaxis={'side': 'top'}
     )
+    fig.update_traces(colorbar=dict(
+        thicknessmode="pixels", thickness=20,
+        lenmode="pixels", len=300
+    ))
     
     return fig
 
-def create_market_comparison(occupancy_df, availability_df):
-    market1 = 'Austin'
-    market2 = 'San Francisco'
-    
-    # Filter data for the selected markets
-    market1_data = occupancy_df[occupancy_df['market'] == market1]
-    market2_data = occupancy_df[occupancy_df['market'] == market2]
-    
-    # Filter availability data
-    market1_avail = availability_df[(availability_df['market'] == market1) & 
-                                   (availability_df['internal_class'] == 'A')].copy()
-    market1_avail['period'] = market1_avail['year'].astype(str) + "-" + market1_avail['quarter']
-    market1_avail = market1_avail.sort_values('period')
-    
-    market2_avail = availability_df[(availability_df['market'] == market2) & 
-                                   (availability_df['internal_class'] == 'A')].copy()
-    market2_avail['period'] = market2_avail['year'].astype(str) + "-" + market2_avail['quarter']
-    market2_avail = market2_avail.sort_values('period')
+def create_market_comparison(pairs, market1='Austin', market2='San Francisco'):
+    occupancy_pairs, availability_pairs, rent_pairs = pairs
+    
+    # Class A availability and rent series from the precomputed pair stores
+    market1_avail_periods, market1_availability = market_series(availability_pairs, market1)
+    market1_rent_periods, market1_rent = market_series(rent_pairs, market1)
+    market2_avail_periods, market2_availability = market_series(availability_pairs, market2)
+    market2_rent_periods, market2_rent = market_series(rent_pairs, market2)
+    
+    # Label the stronger recovery of the pair; stay neutral when either market lacks recovery data
+    pair = pair_summary(occupancy_pairs, market1, market2)
+    if np.isnan(pair['recovery_gap']):
+        pair_label = f"{market1} vs. {market2} Markets"
+    elif pair['recovery_gap'] >= 0:
+        pair_label = f"Recovering ({market1}) vs. Lagging ({market2}) Markets"
+    else:
+        pair_label = f"Lagging ({market1}) vs. Recovering ({market2}) Markets"
     
     # Create a figure with two y-axes
     fig = make_subplots(rows=1, cols=2, subplot_titles=(f"{market1} Trends", f"{market2} Trends"))
@@ -265,8 +257,8 @@ def create_market_comparison(occupancy_df, availability_df):
     # First market - availability
     fig.add_trace(
         go.Scatter(
-            x=market1_avail['period'],
-            y=market1_avail['availability_proportion'],
+            x=market1_avail_periods,
+            y=market1_availability,
             name=f"{market1} Availability",
             line=dict(color='blue', width=3),
             mode='lines+markers'
@@ -277,8 +269,8 @@ def create_market_comparison(occupancy_df, availability_df):
     # First market - rent
     fig.add_trace(
         go.Scatter(
-            x=market1_avail['period'],
-            y=market1_avail['internal_class_rent'],
+            x=market1_rent_periods,
+            y=market1_rent,
             name=f"{market1} Rent",
             line=dict(color='red', width=3),
             mode='lines+markers',
@@ -290,8 +282,8 @@ def create_market_comparison(occupancy_df, availability_df):
     # Second market - availability
     fig.add_trace(
         go.Scatter(
-            x=market2_avail['period'],
-            y=market2_avail['availability_proportion'],
+            x=market2_avail_periods,
+            y=market2_availability,
             name=f"{market2} Availability",
             line=dict(color='blue', width=3, dash='dash'),
             mode='lines+markers'
@@ -302,8 +294,8 @@ def create_market_comparison(occupancy_df, availability_df):
     # Second market - rent
     fig.add_trace(
         go.Scatter(
-            x=market2_avail['period'],
-            y=market2_avail['internal_class_rent'],
+            x=market2_rent_periods,
+            y=market2_rent,
             name=f"{market2} Rent",
             line=dict(color='red', width=3, dash='dash'),
             mode='lines+markers',
@@ -317,81 +309,29 @@ def create_market_comparison(occupancy_df, availability_df):
         height=500,
         template="plotly_white",
         legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
-        title="Availability vs. Rent Comparison: Recovering (Austin) vs. Lagging (San Francisco) Markets"
+        title=f"Availability vs. Rent Comparison: {pair_label}"
     )
     
     return fig
 
 def create_sunburst(recovery_df):
-    # Create market categories for visualization
-    def categorize_market(market):
-        tech_hubs = ['San Francisco', 'South Bay/San Jose', 'Austin', 'Seattle']
-        financial_centers = ['Manhattan', 'Chicago', 'Boston']
-        regional_centers = ['Philadelphia', 'Washington D.C.', 'Los Angeles']
-        southern_markets = ['Dallas/Ft Worth', 'Houston', 'Austin']
-        
-        categories = []
-        if market in tech_hubs:
-            categories.append('Tech Hub')
-        if market in financial_centers:
-            categories.append('Financial Center')
-        if market in regional_centers:
-            categories.append('Regional Center')
-        if market in southern_markets:
-            categories.append('Southern Market')
-        
-        # Default category if none match
-        if not categories:
-            categories.append('Other')
-        
-        return categories[0]  # Return the first matching category
-    
-    # Add category and region information
-    sunburst_df = recovery_df.copy()
-    sunburst_df['category'] = sunburst_df['market'].apply(categorize_market)
-    
-    def get_region(market):
-        west = ['San Francisco', 'Los Angeles', 'Seattle', 'South Bay/San Jose']
-        south = ['Austin', 'Dallas/Ft Worth', 'Houston']
-        east = ['Manhattan', 'Boston', 'Philadelphia', 'Washington D.C.']
-        midwest = ['Chicago']
-        
-        if market in west:
-            return 'West'
-        elif market in south:
-            return 'South'
-        elif market in east:
-            return 'East'
-        elif market in midwest:
-            return 'Midwest'
-        else:
-            return 'Other'
-    
-    sunburst_df['region'] = sunburst_df['market'].apply(get_region)
-    
-    # Prepare data for sunburst chart
-    hierarchical_data = []
-    
-    for _, row in sunburst_df.iterrows():
-        hierarchical_data.append({
-            'Region': row['region'],
-            'Category': row['category'],
-            'Market': row['market'],
-            'Recovery': row['recovery_percentage']
-        })
-    
-    # Create dataframe with hierarchical data
-    hierarchy_df = pd.DataFrame(hierarchical_data)
-    
-    # Create sunburst chart
-    fig = px.sunburst(
-        hierarchy_df,
+    # Attach region and category from the shared market metadata table
+    sunburst_df = with_market_metadata(recovery_df, ['region', 'category'])
+    sunburst_df = sunburst_df.rename(columns={
+        'region': 'Region',
+        'category': 'Category',
+        'market': 'Market',
+        'recovery_percentage': 'Recovery'
+    })
+    
+    # Build the Region > Category > Market hierarchy in one grouped pass
+    fig = sunburst_figure(
+        sunburst_df,
         path=['Region', 'Category', 'Market'],
-        values='Recovery',
-        color='Recovery',
-        color_continuous_scale='Viridis',
-        title='Market Recovery by Region and Category',
-        hover_data={'Recovery': ':.1f%'}
+        value='Recovery',
+        colorscale='Viridis',
+        hover_suffix='%',
+        title='Market Recovery by Region and Category'
     )
     
     fig.update_layout(height=600)
@@ -429,7 +369,7 @@ def create_animated_occupancy(occupancy_map_df):
 # Main application
 def main():
     # Load data
-    occupancy_df, availability_df, occupancy_map_df = load_data()
+    occupancy_df, availability_df, occupancy_map_df = load_data(data_version(*DATA_FILES))
     recovery_df = create_recovery_analysis(occupancy_df)
     
     # Filter map data for 3D visualization
@@ -565,8 +505,19 @@ def main():
               - Class A properties show remarkable price stability despite occupancy fluctuations
             """)
         
-        st.markdown("### Market Comparison: Austin vs. San Francisco")
-        fig = create_market_comparison(occupancy_df, availability_df)
+        # Any pair can be compared; Austin vs. San Francisco is the headline story
+        pairs = load_market_pairs(data_version(*DATA_FILES))
+        comparable = sorted(set(pairs[1]['markets']) & set(pairs[2]['markets']) & set(pairs[0]['markets']))
+        pick_col1, pick_col2 = st.columns(2)
+        with pick_col1:
+            market1 = st.selectbox("First market:", comparable,
+                                   index=comparable.index('Austin') if 'Austin' in comparable else 0)
+        with pick_col2:
+            market2 = st.selectbox("Second market:", comparable,
+                                   index=comparable.index('San Francisco') if 'San Francisco' in comparable else min(1, len(comparable) - 1))
+        
+        st.markdown(f"### Market Comparison: {market1} vs. {market2}")
+        fig = create_market_comparison(pairs, market1, market2)
         st.plotly_chart(fig, use_container_width=True)
     
     elif st.session_state.slide == 3:  # Strategic Implications
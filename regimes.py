@@ -0,0 +1,218 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from batch_forecast import AVAILABILITY_PATH, OCCUPANCY_PATH, SERIES_KEYS, collect_series, period_label
+from column_store import CACHE_DIR, data_version, open_table, table_exists, write_table
+
+# Changepoint detection for the quarterly series. Each series is split into
+# piecewise-linear regimes by exact least-squares segmentation: the cost of
+# every candidate segment comes from masked prefix sums, and the dynamic
+# programme runs over all series of a (quarter x series) panel at once. The
+# number of regimes is chosen per series by BIC. Column chunks run in a process
+# pool, and the segment table is cached in the column store per data version.
+METRICS = ['occupancy', 'availability']
+MAX_REGIMES = 4
+MIN_SEGMENT = 3
+STABLE_CHANGE = 0.05  # fitted change across a regime, relative to its mean level
+
+
+def segment_costs(panel):
+    """(S x T x T) least-squares cost of a linear fit on rows i..j of each column; inf if too short"""
+    T = panel.shape[0]
+    w = (~np.isnan(panel)).astype(np.float64).T
+    y = np.nan_to_num(panel).T
+    t = np.arange(T, dtype=np.float64)
+
+    def prefix(values):
+        return np.concatenate([np.zeros((values.shape[0], 1)), np.cumsum(values, axis=1)], axis=1)
+
+    def window(p):
+        # [s, i, j] = sum over rows i..j
+        return p[:, None, 1:] - p[:, :-1, None]
+
+    n = window(prefix(w))
+    st = window(prefix(w * t))
+    stt = window(prefix(w * t ** 2))
+    sy = window(prefix(y))
+    sty = window(prefix(y * t))
+    syy = window(prefix(y ** 2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var_t = stt - st ** 2 / n
+        cov = sty - st * sy / n
+        cost = syy - sy ** 2 / n - np.where(var_t > 0, cov ** 2 / var_t, 0.0)
+    upper = np.triu(np.ones((T, T), dtype=bool))[None]
+    return np.where(upper & (n >= MIN_SEGMENT), np.maximum(cost, 0.0), np.inf)
+
+
+def segment_panel(panel, max_regimes=MAX_REGIMES):
+    """Regime start rows per column: (S x max_regimes) array, -1 for unused regimes"""
+    S, T = panel.shape[1], panel.shape[0]
+    costs = segment_costs(panel)
+
+    # best[k][s, j]: cheapest split of rows 0..j into k + 1 regimes; back[k] holds the last regime's start
+    best = [costs[:, 0, :]]
+    back = [np.zeros((S, T), dtype=np.int64)]
+    for _ in range(1, max_regimes):
+        candidates = best[-1][:, :-1, None] + costs[:, 1:, :]
+        back.append(candidates.argmin(axis=1) + 1)
+        best.append(candidates.min(axis=1))
+    best = np.stack(best)
+    back = np.stack(back)
+
+    # BIC over the number of regimes (slope, intercept and a boundary per regime)
+    observations = (~np.isnan(panel)).sum(axis=0)
+    regimes = np.arange(1, max_regimes + 1)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sse = best[:, :, -1]
+        bic = observations * np.log(np.maximum(sse, 1e-12) / observations) + 3 * regimes * np.log(observations)
+    bic = np.where(np.isfinite(sse), bic, np.inf)
+    chosen = bic.argmin(axis=0) + 1
+    chosen = np.where(np.isfinite(bic.min(axis=0)), chosen, 0)
+
+    # Walk the back-pointers for every series at once
+    starts = np.full((S, max_regimes), -1)
+    end = np.full(S, T - 1)
+    columns = np.arange(S)
+    for step in range(max_regimes):
+        k = chosen - step
+        active = k >= 1
+        start = np.where(active, back[np.maximum(k - 1, 0), columns, end], -1)
+        starts[columns[active], (k - 1)[active]] = start[active]
+        end = np.where(active, start - 1, end)
+    return starts
+
+
+def _segment_chunk(panel):
+    return segment_panel(panel)
+
+
+def detect_regimes(panel, workers=None, min_columns=64):
+    """segment_panel over column chunks in a process pool"""
+    workers = max(1, min(workers or os.cpu_count() or 1, panel.shape[1] // min_columns or 1))
+    if workers == 1:
+        return _segment_chunk(panel)
+    chunks = np.array_split(np.arange(panel.shape[1]), workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(_segment_chunk, [panel[:, columns] for columns in chunks])))
+
+
+def regime_table(wide, starts, metric):
+    """Long segment table: boundaries, fitted start/end values, slope and direction per regime"""
+    panel = wide.to_numpy(dtype=np.float64)
+    T = len(panel)
+    keys = wide.columns.to_frame(index=False)
+    ends = np.where(starts >= 0, np.c_[starts[:, 1:], np.full(len(starts), -1)], -1)
+    ends = np.where((starts >= 0) & (ends < 0), T, ends) - 1
+    column, regime = np.nonzero(starts >= 0)
+    first, last = starts[column, regime], ends[column, regime]
+
+    # Per-regime linear fit from the rows it covers
+    slopes, intercepts = np.empty(len(column)), np.empty(len(column))
+    for i, (c, a, b) in enumerate(zip(column, first, last)):
+        rows = np.arange(a, b + 1)
+        values = panel[rows, c]
+        present = ~np.isnan(values)
+        slopes[i], intercepts[i] = np.polyfit(rows[present], values[present], 1)
+    start_value = intercepts + slopes * first
+    end_value = intercepts + slopes * last
+    direction = _direction(start_value, end_value)
+
+    period_ids = wide.index.to_numpy()
+    return keys.iloc[column].reset_index(drop=True).assign(
+        metric=metric,
+        regime=regime + 1,
+        start_period=period_label(period_ids[first]),
+        end_period=period_label(period_ids[last]),
+        quarters=last - first + 1,
+        start_value=start_value,
+        end_value=end_value,
+        slope=slopes,
+        direction=direction
+    )
+
+
+def build_regimes(series, metrics=METRICS, workers=None):
+    """Regime segments for every market-level series of the given metrics"""
+    tables = []
+    for metric in metrics:
+        rows = series[(series['metric'] == metric) & (series['level'] == 'market')]
+        if rows.empty:
+            continue
+        wide = rows.pivot_table(index='period_id', columns=SERIES_KEYS[1:], values='value', aggfunc='mean')
+        wide = wide.reindex(np.arange(wide.index.min(), wide.index.max() + 1))
+        tables.append(regime_table(wide, detect_regimes(wide.to_numpy(dtype=np.float64), workers), metric))
+    return pd.concat(tables, ignore_index=True)
+
+
+def load_regimes(occupancy_path=OCCUPANCY_PATH, availability_path=AVAILABILITY_PATH, cache_dir=CACHE_DIR):
+    """Cached regime segments for the occupancy and availability files"""
+    version = data_version(occupancy_path, availability_path)
+    if not table_exists('regime_segments', version, cache_dir):
+        series = collect_series(pd.read_csv(occupancy_path), pd.read_csv(availability_path))
+        write_table(build_regimes(series), 'regime_segments', version, cache_dir)
+    return open_table('regime_segments', version, cache_dir)
+
+
+def _direction(start_value, end_value):
+    level = np.abs((start_value + end_value) / 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = (end_value - start_value) / level
+    return np.where(np.abs(change) < STABLE_CHANGE, 'Stable', np.where(change > 0, 'Rising', 'Falling'))
+
+
+def _moves(series):
+    """Direction of each regime and of each level jump between regimes, repeats merged"""
+    directions = list(series['direction'])
+    jumps = _direction(series['end_value'].to_numpy()[:-1], series['start_value'].to_numpy()[1:])
+    moves = [directions[0]]
+    for jump, direction in zip(jumps, directions[1:]):
+        # A Stable jump is no break at all; a level shift counts as a move of its own
+        moves += [direction] if jump == 'Stable' else [jump, direction]
+    return ' > '.join(m for i, m in enumerate(moves) if i == 0 or m != moves[i - 1])
+
+
+def regime_patterns(segments, metric='occupancy'):
+    """Per series: number of regimes, the direction sequence of the regimes, e.g.
+    'Falling > Rising > Stable', and the moves sequence that also counts the jumps
+    between regimes (a level drop at a boundary shows up as 'Falling')"""
+    rows = segments[segments['metric'] == metric].sort_values(['market', 'segment', 'regime'])
+    if rows.empty:
+        return pd.DataFrame(columns=['market', 'segment', 'regimes', 'pattern', 'moves'])
+    groups = rows.groupby(['market', 'segment'], sort=True)
+    patterns = groups.agg(
+        regimes=('regime', 'size'),
+        pattern=('direction', ' > '.join)
+    )
+    patterns['moves'] = groups.apply(_moves)
+    return patterns.reset_index()
+
+
+def follows_phases(moves, phases=('Falling', 'Rising', 'Stable')):
+    """Whether a moves sequence passes through the phases in order (other moves may come between)"""
+    remaining = iter(moves.split(' > '))
+    return all(phase in remaining for phase in phases)
+
+
+def _label_id(labels):
+    """Integer quarter id for 'YYYY-Qn' labels (inverse of period_label)"""
+    labels = pd.Series(labels, dtype=object).astype(str)
+    return (labels.str[:4].astype(np.int64) * 4 + labels.str[-1].astype(np.int64) - 1).to_numpy()
+
+
+def clip_regimes(segments, start_period, end_period):
+    """Segments overlapping [start_period, end_period], cut to it with end values re-read off each fitted line"""
+    first, last = _label_id([start_period, end_period])
+    starts, ends = _label_id(segments['start_period']), _label_id(segments['end_period'])
+    keep = (ends >= first) & (starts <= last)
+    starts, ends = starts[keep], ends[keep]
+    clipped = segments[keep].copy()
+    slopes = clipped['slope'].to_numpy()
+    new_starts, new_ends = np.maximum(starts, first), np.minimum(ends, last)
+    clipped['start_value'] = clipped['start_value'].to_numpy() + slopes * (new_starts - starts)
+    clipped['end_value'] = clipped['end_value'].to_numpy() - slopes * (ends - new_ends)
+    clipped['start_period'] = period_label(new_starts)
+    clipped['end_period'] = period_label(new_ends)
+    return clipped
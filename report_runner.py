@@ -0,0 +1,106 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import pandas as pd
+
+# Parallel renderer for static matplotlib reports. Each plot is a job with a
+# module-level function, its output path and the data it reads. Jobs run in a
+# process pool on the Agg backend, and a job is skipped when its output exists
+# and the hash of its function source and inputs matches the manifest entry
+# from the previous run.
+MANIFEST_NAME = 'report_manifest.json'
+
+
+def plot_job(name, func, output, **inputs):
+    """Describe one plot: func(output=output, **inputs) writes the file"""
+    return {'name': name, 'func': func, 'output': output, 'inputs': inputs}
+
+
+def _hash_value(digest, value):
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    else:
+        digest.update(repr(value).encode())
+
+
+def job_digest(job):
+    """Hash of the job's function source and data inputs"""
+    digest = hashlib.sha256()
+    try:
+        digest.update(inspect.getsource(job['func']).encode())
+    except (OSError, TypeError):
+        digest.update(job['func'].__qualname__.encode())
+    for key in sorted(job['inputs']):
+        digest.update(key.encode())
+        _hash_value(digest, job['inputs'][key])
+    return digest.hexdigest()
+
+
+def _use_agg():
+    matplotlib.use('Agg')
+
+
+def _render(func, output, inputs):
+    """Worker entry point: render one job, returning (seconds, error message or None)"""
+    start = time.perf_counter()
+    try:
+        func(output=output, **inputs)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return time.perf_counter() - start, error
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def run_report(jobs, output_dir='plots', workers=None, force=False):
+    """Render jobs in parallel, skipping unchanged ones; prints and returns a timing table"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+
+    digests = {job['name']: job_digest(job) for job in jobs}
+    pending = [
+        job for job in jobs
+        if force or manifest.get(job['output']) != digests[job['name']] or not os.path.exists(job['output'])
+    ]
+
+    start = time.perf_counter()
+    results = {job['name']: ('skipped', 0.0, None) for job in jobs}
+    if pending:
+        workers = workers or min(len(pending), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg) as pool:
+            futures = {job['name']: pool.submit(_render, job['func'], job['output'], job['inputs']) for job in pending}
+            for job in pending:
+                seconds, error = futures[job['name']].result()
+                results[job['name']] = ('failed' if error else 'rendered', seconds, error)
+                if error:
+                    manifest.pop(job['output'], None)
+                else:
+                    manifest[job['output']] = digests[job['name']]
+    wall = time.perf_counter() - start
+
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    table = pd.DataFrame(
+        [(name, status, seconds, error or '') for name, (status, seconds, error) in results.items()],
+        columns=['plot', 'status', 'seconds', 'error']
+    )
+    print(table.to_string(index=False, float_format=lambda s: f"{s:.2f}"))
+    print(f"{len(pending)} of {len(jobs)} plots rendered in {wall:.2f}s wall time")
+    return table
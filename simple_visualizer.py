@@ -4,6 +4,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.io as pio
+from market_metadata import market_columns, with_market_metadata
+from event_annotations import add_events, events_for
+from heatmap_engine import heatmap_figure
 
 # Set default theme
 pio.templates.default = "plotly_white"
@@ -17,24 +20,8 @@ unemployment_df = pd.read_csv('Unemployment.csv')
 # Create period column for easier plotting
 occupancy_df['period'] = occupancy_df['year'].astype(str) + "-" + occupancy_df['quarter']
 
-# Add market coordinates (for potential map visualizations)
-market_coordinates = {
-    'Manhattan': {'lat': 40.7831, 'lon': -73.9712},
-    'San Francisco': {'lat': 37.7749, 'lon': -122.4194},
-    'Los Angeles': {'lat': 34.0522, 'lon': -118.2437},
-    'Chicago': {'lat': 41.8781, 'lon': -87.6298},
-    'Boston': {'lat': 42.3601, 'lon': -71.0589},
-    'Dallas/Ft Worth': {'lat': 32.7767, 'lon': -96.7970},
-    'Houston': {'lat': 29.7604, 'lon': -95.3698},
-    'Washington D.C.': {'lat': 38.9072, 'lon': -77.0369},
-    'Philadelphia': {'lat': 39.9526, 'lon': -75.1652},
-    'South Bay/San Jose': {'lat': 37.3382, 'lon': -121.8863},
-    'Austin': {'lat': 30.2672, 'lon': -97.7431}
-}
-
-# Add coordinates to the dataframe
-occupancy_df['lat'] = occupancy_df['market'].map(lambda x: market_coordinates.get(x, {}).get('lat'))
-occupancy_df['lon'] = occupancy_df['market'].map(lambda x: market_coordinates.get(x, {}).get('lon'))
+# Add market coordinates (for potential map visualizations) from the market metadata table
+occupancy_df = with_market_metadata(occupancy_df, ['lat', 'lon'])
 
 print("Processing recovery analysis...")
 # Create recovery analysis
@@ -152,14 +139,7 @@ for market in occupancy_df['market'].unique():
     ))
 
 # Add key event annotations
-fig2.add_vline(x="2020-Q1", line_dash="dash", line_color="red", opacity=0.7)
-fig2.add_annotation(x="2020-Q1", y=1.0, text="COVID-19 Outbreak", showarrow=False, yshift=10)
-
-fig2.add_vline(x="2021-Q2", line_dash="dash", line_color="green", opacity=0.7)
-fig2.add_annotation(x="2021-Q2", y=0.95, text="Vaccine Rollout", showarrow=False, yshift=10)
-
-fig2.add_vline(x="2022-Q1", line_dash="dash", line_color="orange", opacity=0.7)
-fig2.add_annotation(x="2022-Q1", y=0.9, text="Return to Office Policies Begin", showarrow=False, yshift=10)
+add_events(fig2, events_for('trend'), y=1.0, y_step=0.05, yref='y', yshift=10)
 
 # Update layout
 fig2.update_layout(
@@ -197,33 +177,20 @@ fig2.write_html("plots/occupancy_trends_interactive.html")
 print("Created interactive time series chart")
 
 # 3. Market Heatmap
-pivot_df = occupancy_df.pivot(index='market', columns='period', values='avg_occupancy_proportion')
-
-fig3 = px.imshow(
-    pivot_df,
-    labels=dict(x="Time Period", y="Market", color="Occupancy Rate"),
-    x=pivot_df.columns,
-    y=pivot_df.index,
-    color_continuous_scale="Viridis",
-    aspect="auto",
+fig3 = heatmap_figure(
+    occupancy_df,
     zmin=0,
-    zmax=1
-)
-
-fig3.update_layout(
+    zmax=1,
+    color_title="Occupancy Rate",
+    hovertemplate="<b>Market:</b> %{y}<br><b>Period:</b> %{x}<br><b>Occupancy:</b> %{z:.3f}<extra></extra>",
     title="Occupancy Rates by Market and Period",
-    height=600,
-    coloraxis_colorbar=dict(
-        title="Occupancy Rate",
-        thicknessmode="pixels", thickness=20,
-        lenmode="pixels", len=300
-    )
+    height=600
 )
 
-# Customize hover information
-fig3.update_traces(
-    hovertemplate="<b>Market:</b> %{y}<br><b>Period:</b> %{x}<br><b>Occupancy:</b> %{z:.3f}<extra></extra>"
-)
+fig3.update_traces(colorbar=dict(
+    thicknessmode="pixels", thickness=20,
+    lenmode="pixels", len=300
+))
 
 # Save the figure
 fig3.write_html("plots/occupancy_heatmap_interactive.html")
@@ -281,9 +248,10 @@ comparison_fig.write_html("plots/market_comparison_sf_austin.html")
 print("Created market comparison chart")
 
 # 5. Create a 3D visualization of recovery rates
+recovery_coords = market_columns(recovery_df['market'], ['lat', 'lon'], defaults={'lat': 0, 'lon': 0})
 fig5 = go.Figure(data=[go.Scatter3d(
-    x=[coord.get('lon', 0) for coord in [market_coordinates.get(m, {}) for m in recovery_df['market']]],
-    y=[coord.get('lat', 0) for coord in [market_coordinates.get(m, {}) for m in recovery_df['market']]],
+    x=recovery_coords['lon'],
+    y=recovery_coords['lat'],
     z=recovery_df['recovery_percentage'],
     mode='markers',
     marker=dict(
@@ -6,6 +6,21 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import plotly.io as pio
 import pydeck as pdk
+from column_store import data_version, extend_table, load_table
+from distinct_counts import load_breadth_sketches, market_breadth
+from market_metadata import with_market_metadata
+from downsample import downsample_frame, series_budget
+from period_snapshots import build_period_snapshots
+from market_pairs import build_comparison_pairs, pair_summary, market_series
+from geo_tiles import build_tile_pyramid, cells_in_view, cell_radius_m
+from event_annotations import add_events, events_for
+from go_stay import load_go_stay_cube, go_stay_summary
+from lease_store import load_lease_store, building_history, buildings_for_costar
+from lease_rollup import LEVELS, load_rollup, rollup_metrics
+from lease_ingest import LEASES_PATH
+from macro_correlation import load_macro_correlations, lead_lag_summary
+from batch_forecast import load_batch_forecasts
+from regimes import clip_regimes, load_regimes
 
 # Set page configuration
 st.set_page_config(
@@ -56,43 +71,35 @@ focusing on COVID-19 recovery patterns, office occupancy, and market dynamics.
 """)
 
 # Load data
-@st.cache_data
-def load_data():
-    occupancy_df = pd.read_csv('Major Market Occupancy Data-revised.csv')
-    availability_df = pd.read_csv('Price and Availability Data.csv')
-    unemployment_df = pd.read_csv('Unemployment.csv')
-    
-    # Create period column for easier plotting
-    occupancy_df['period'] = occupancy_df['year'].astype(str) + "-" + occupancy_df['quarter']
-    
-    # Add coordinates for map visualization
-    market_coordinates = {
-        'Manhattan': {'lat': 40.7831, 'lon': -73.9712},
-        'San Francisco': {'lat': 37.7749, 'lon': -122.4194},
-        'Los Angeles': {'lat': 34.0522, 'lon': -118.2437},
-        'Chicago': {'lat': 41.8781, 'lon': -87.6298},
-        'Boston': {'lat': 42.3601, 'lon': -71.0589},
-        'Dallas/Ft Worth': {'lat': 32.7767, 'lon': -96.7970},
-        'Houston': {'lat': 29.7604, 'lon': -95.3698},
-        'Washington D.C.': {'lat': 38.9072, 'lon': -77.0369},
-        'Philadelphia': {'lat': 39.9526, 'lon': -75.1652},
-        'South Bay/San Jose': {'lat': 37.3382, 'lon': -121.8863},
-        'Austin': {'lat': 30.2672, 'lon': -97.7431},
-        'Seattle': {'lat': 47.6062, 'lon': -122.3321},
-        'Atlanta': {'lat': 33.7490, 'lon': -84.3880},
-        'Denver': {'lat': 39.7392, 'lon': -104.9903},
-        'Miami': {'lat': 25.7617, 'lon': -80.1918},
-        'Phoenix': {'lat': 33.4484, 'lon': -112.0740}
-    }
+# Shared across sessions: the tables are read-only memory-mapped columns,
+# so every viewer maps the same pages instead of holding its own copy.
+# Callers must not write into these frames; .copy() before any in-place edit.
+@st.cache_resource
+def load_data(version):
+    occupancy_df = load_table('Major Market Occupancy Data-revised.csv')
+    availability_df = load_table('Price and Availability Data.csv')
+    unemployment_df = load_table('Unemployment.csv')
+    
+    # Create period column for easier plotting (added alongside the shared columns)
+    occupancy_df = extend_table(occupancy_df, period=occupancy_df['year'].astype(str) + "-" + occupancy_df['quarter'])
     
-    # Add coordinates to occupancy dataframe
-    occupancy_map_df = occupancy_df.copy()
-    occupancy_map_df['lat'] = occupancy_map_df['market'].map(lambda x: market_coordinates.get(x, {}).get('lat'))
-    occupancy_map_df['lon'] = occupancy_map_df['market'].map(lambda x: market_coordinates.get(x, {}).get('lon'))
+    # Add coordinates for map visualization from the market metadata table
+    occupancy_map_df = with_market_metadata(occupancy_df, ['lat', 'lon'])
     
     return occupancy_df, availability_df, unemployment_df, occupancy_map_df
 
-occupancy_df, availability_df, unemployment_df, occupancy_map_df = load_data()
+DATA_FILES = ['Major Market Occupancy Data-revised.csv', 'Price and Availability Data.csv', 'Unemployment.csv']
+dataset_version = data_version(*DATA_FILES)
+occupancy_df, availability_df, unemployment_df, occupancy_map_df = load_data(dataset_version)
+
+# Lagged, rolling and bootstrap correlations of occupancy vs unemployment, cached with the data
+@st.cache_resource
+def load_unemployment_correlations(version):
+    correlations = load_macro_correlations()
+    return correlations['lags'], correlations['rolling'], lead_lag_summary(correlations['lags'])
+
+unemployment_lags, unemployment_rolling, unemployment_summary = load_unemployment_correlations(
+    data_version(DATA_FILES[0], DATA_FILES[2]))
 
 # Creating the market recovery analysis
 def create_recovery_analysis():
@@ -125,8 +132,63 @@ def create_recovery_analysis():
 
 recovery_df = create_recovery_analysis()
 
+# Per-period snapshots (rank and deltas), computed once per dataset version
+@st.cache_resource
+def load_period_snapshots(version):
+    return build_period_snapshots(occupancy_df)
+
+period_snapshots = load_period_snapshots(dataset_version)
+
+# All-pairs market comparison stores (occupancy, Class A availability and rent),
+# computed once per dataset version so any pair the user picks is a lookup
+@st.cache_resource
+def load_market_pairs(version):
+    return build_comparison_pairs(occupancy_df, availability_df)
+
+occupancy_pairs, availability_pairs, rent_pairs = load_market_pairs(dataset_version)
+
+# Binned map cells for every zoom level, computed once per dataset version
+@st.cache_resource
+def load_map_tiles(version, _map_data):
+    return build_tile_pyramid(_map_data, value='recovery_percentage', label='market')
+
+US_CENTER = (39.8283, -98.5795)
+
+# Upper bound on points sent to the browser by the time series chart
+TIME_SERIES_POINT_BUDGET = 2000
+
+# Distinct tenant/building sketches, built once per leases file version
+@st.cache_resource
+def load_lease_breadth(version):
+    return load_breadth_sketches()
+
+# Go/Stay leasing cube, streamed from the leases file once per file version
+@st.cache_resource
+def load_go_stay(version):
+    return load_go_stay_cube()
+
+# Quarterly leasing roll-ups for every geography level, from one scan of the leases file
+@st.cache_resource
+def load_lease_rollups(version):
+    return {level: load_rollup(level) for level in LEVELS}
+
+# Fitted parameters and forecasts for every market series, refit once per data drop
+@st.cache_resource
+def load_forecasts(version):
+    return load_batch_forecasts()
+
+# Piecewise-linear regimes of every occupancy and availability series, cached per data version
+@st.cache_resource
+def load_regime_segments(version):
+    return load_regimes()
+
+# Building-partitioned lease store and its building/CoStar index, built once per file version
+@st.cache_resource
+def load_building_index(version):
+    return load_lease_store()
+
 # Create tabs for different visualizations
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["Market Recovery Dashboard", "Interactive Time Series", "Market Comparison", "Geospatial Analysis", "Formal Analysis"])
+tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["Market Recovery Dashboard", "Interactive Time Series", "Market Comparison", "Geospatial Analysis", "Lease Activity", "Go vs Stay", "Formal Analysis"])
 
 with tab1:
     st.header("COVID Recovery Analysis by Market")
@@ -261,8 +323,36 @@ with tab2:
     if not selected_markets:
         st.warning("Please select at least one market to display the visualization.")
     else:
+        # Server-side zoom: only the chosen window is queried and sent to the browser
+        all_periods = sorted(occupancy_df['period'].unique())
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            window = st.select_slider(
+                "Time window:",
+                options=all_periods,
+                value=(all_periods[0], all_periods[-1])
+            )
+        with col2:
+            downsample_method = st.selectbox("Downsampling:", ["LTTB", "Min-Max"])
+        
         # Filter data based on selection
-        filtered_df = occupancy_df[occupancy_df['market'].isin(selected_markets)]
+        filtered_df = occupancy_df[
+            occupancy_df['market'].isin(selected_markets) &
+            occupancy_df['period'].between(window[0], window[1])
+        ]
+        
+        # Keep the payload bounded no matter how long the history is
+        total_points = len(filtered_df)
+        filtered_df = downsample_frame(
+            filtered_df,
+            x='period',
+            y='avg_occupancy_proportion',
+            by='market',
+            n_out=series_budget(TIME_SERIES_POINT_BUDGET, len(selected_markets)),
+            method='lttb' if downsample_method == "LTTB" else 'minmax'
+        )
+        if len(filtered_df) < total_points:
+            st.caption(f"Showing {len(filtered_df):,} of {total_points:,} points; narrow the time window for full detail.")
         
         # Create a time series visualization
         fig = px.line(
@@ -299,15 +389,34 @@ with tab2:
             legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
         )
         
-        # Enhance with annotations for key events
-        fig.add_vline(x="2020-Q1", line_dash="dash", line_color="red", opacity=0.7)
-        fig.add_annotation(x="2020-Q1", y=1.0, text="COVID-19 Outbreak", showarrow=False, yshift=10)
-        
-        fig.add_vline(x="2021-Q2", line_dash="dash", line_color="green", opacity=0.7)
-        fig.add_annotation(x="2021-Q2", y=0.95, text="Vaccine Rollout", showarrow=False, yshift=10)
+        # Enhance with annotations for key events inside the selected window
+        add_events(
+            fig,
+            events_for('trend', [p for p in all_periods if window[0] <= p <= window[1]]),
+            y=1.0, y_step=0.05, yref='y', yshift=10
+        )
         
-        fig.add_vline(x="2022-Q1", line_dash="dash", line_color="orange", opacity=0.7)
-        fig.add_annotation(x="2022-Q1", y=0.9, text="Return to Office Policies Begin", showarrow=False, yshift=10)
+        # Overlay the fitted regime lines, clipped to the selected window
+        if st.checkbox("Show detected regimes", key="show_regimes"):
+            segments = load_regime_segments(data_version(*DATA_FILES[:2]))
+            segments = segments[(segments['metric'] == 'occupancy') & segments['market'].isin(selected_markets)]
+            segments = clip_regimes(segments, window[0], window[1])
+            market_colors = {trace.name: trace.line.color for trace in fig.data}
+            for market, market_segments in segments.groupby('market'):
+                for i, row in enumerate(market_segments.itertuples()):
+                    fig.add_trace(go.Scatter(
+                        x=[row.start_period, row.end_period],
+                        y=[row.start_value, row.end_value],
+                        mode='lines+markers',
+                        line=dict(color=market_colors.get(market), width=2, dash='dash'),
+                        marker=dict(symbol='diamond', size=8),
+                        name=f"{market} regimes",
+                        legendgroup=f"{market} regimes",
+                        showlegend=i == 0,
+                        hovertemplate=f"{market} regime {row.regime}: {row.direction}<br>"
+                                      f"{row.start_period} to {row.end_period}<extra></extra>"
+                    ))
+            st.caption("Dashed lines are piecewise-linear regimes found by changepoint detection; diamonds mark regime boundaries.")
         
         # Display the chart
         st.plotly_chart(fig, use_container_width=True)
@@ -315,12 +424,11 @@ with tab2:
         # Add a slider to observe specific quarters
         selected_period = st.select_slider(
             "Select a specific period to analyze:",
-            options=sorted(occupancy_df['period'].unique())
+            options=list(period_snapshots)
         )
         
-        # Create a bar chart for the selected period
-        period_df = occupancy_df[occupancy_df['period'] == selected_period]
-        period_df = period_df.sort_values('avg_occupancy_proportion', ascending=False)
+        # Precomputed snapshot for the selected period (already sorted by occupancy)
+        period_df = period_snapshots[selected_period]
         
         # Period-specific visualization
         fig2 = px.bar(
@@ -330,9 +438,17 @@ with tab2:
             color='avg_occupancy_proportion',
             color_continuous_scale=px.colors.sequential.Viridis,
             title=f"Office Occupancy Comparison for {selected_period}",
+            hover_data={
+                'rank': ':.0f',
+                'pct_of_baseline': ':.1f',
+                'change_vs_prior': ':+.3f'
+            },
             labels={
                 'market': 'Market',
-                'avg_occupancy_proportion': 'Average Occupancy Proportion'
+                'avg_occupancy_proportion': 'Average Occupancy Proportion',
+                'rank': 'Rank',
+                'pct_of_baseline': '% of 2020-Q1',
+                'change_vs_prior': 'Change vs Prior Quarter'
             },
             height=500
         )
@@ -340,6 +456,52 @@ with tab2:
         fig2.update_layout(template="plotly_white", xaxis={'categoryorder':'total descending'})
         st.plotly_chart(fig2, use_container_width=True)
 
+    st.markdown("### Unemployment Lead/Lag")
+    st.markdown("""
+    Correlation of each market's occupancy with its unemployment rate shifted by up to 8 quarters.
+    A positive lag means unemployment moves first. Shaded bands are 90% moving-block bootstrap intervals.
+    """)
+
+    lag_markets = st.multiselect(
+        "Markets:",
+        options=sorted(unemployment_lags['market'].unique()),
+        default=sorted(unemployment_lags['market'].unique())[:3],
+        key="lag_markets"
+    )
+    if lag_markets:
+        col1, col2 = st.columns(2)
+        colors = px.colors.qualitative.Plotly
+        lag_fig = go.Figure()
+        rolling_fig = go.Figure()
+        for i, market in enumerate(lag_markets):
+            color = colors[i % len(colors)]
+            market_lags = unemployment_lags[unemployment_lags['market'] == market]
+            lag_fig.add_trace(go.Scatter(
+                x=np.r_[market_lags['lag'], market_lags['lag'][::-1]],
+                y=np.r_[market_lags['ci_high'], market_lags['ci_low'][::-1]],
+                fill='toself', fillcolor=color, opacity=0.15, line=dict(width=0),
+                hoverinfo='skip', showlegend=False, legendgroup=market
+            ))
+            lag_fig.add_trace(go.Scatter(
+                x=market_lags['lag'], y=market_lags['corr'], mode='lines+markers', name=market,
+                line=dict(color=color), legendgroup=market
+            ))
+            market_rolling = unemployment_rolling[unemployment_rolling['market'] == market]
+            rolling_fig.add_trace(go.Scatter(
+                x=market_rolling['period'], y=market_rolling['corr'], mode='lines+markers', name=market,
+                line=dict(color=color)
+            ))
+        lag_fig.add_hline(y=0, line_color='gray', line_width=1)
+        lag_fig.update_layout(title='Lagged Correlation', xaxis_title='Lag (quarters)',
+                              yaxis_title='Correlation', yaxis_range=[-1, 1], template="plotly_white", height=400)
+        rolling_fig.add_hline(y=0, line_color='gray', line_width=1)
+        rolling_fig.update_layout(title='Rolling 8-Quarter Correlation', xaxis_title='Window End',
+                                  yaxis_title='Correlation', yaxis_range=[-1, 1], template="plotly_white", height=400)
+        with col1:
+            st.plotly_chart(lag_fig, use_container_width=True)
+        with col2:
+            st.plotly_chart(rolling_fig, use_container_width=True)
+
 with tab3:
     st.header("Market Comparison Dashboard")
     
@@ -348,14 +510,14 @@ with tab3:
     col1, col2 = st.columns(2)
     
     with col1:
-        market1 = st.selectbox("Select First Market:", options=sorted(occupancy_df['market'].unique()), index=0)
+        market1 = st.selectbox("Select First Market:", options=sorted(occupancy_pairs['markets']), index=0)
     
     with col2:
-        market2 = st.selectbox("Select Second Market:", options=sorted(occupancy_df['market'].unique()), index=1)
+        market2 = st.selectbox("Select Second Market:", options=sorted(occupancy_pairs['markets']), index=1)
     
-    # Filter data for the selected markets
-    market1_data = occupancy_df[occupancy_df['market'] == market1]
-    market2_data = occupancy_df[occupancy_df['market'] == market2]
+    # Series for the selected markets from the precomputed pair store
+    market1_periods, market1_values = market_series(occupancy_pairs, market1)
+    market2_periods, market2_values = market_series(occupancy_pairs, market2)
     
     # Create a dual-axis time series
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -363,8 +525,8 @@ with tab3:
     # Add traces for both markets
     fig.add_trace(
         go.Scatter(
-            x=market1_data['period'],
-            y=market1_data['avg_occupancy_proportion'],
+            x=market1_periods,
+            y=market1_values,
             name=market1,
             line=dict(color='royalblue', width=4),
             mode='lines+markers'
@@ -374,8 +536,8 @@ with tab3:
     
     fig.add_trace(
         go.Scatter(
-            x=market2_data['period'],
-            y=market2_data['avg_occupancy_proportion'],
+            x=market2_periods,
+            y=market2_values,
             name=market2,
             line=dict(color='firebrick', width=4),
             mode='lines+markers'
@@ -398,6 +560,26 @@ with tab3:
     
     st.plotly_chart(fig, use_container_width=True)
     
+    # Precomputed pair statistics
+    pair = pair_summary(occupancy_pairs, market1, market2)
+    pair_col1, pair_col2, pair_col3, pair_col4 = st.columns(4)
+    with pair_col1:
+        st.metric("Occupancy Correlation", f"{pair['correlation']:.2f}")
+    with pair_col2:
+        if np.isnan(pair['best_lag_correlation']) or pair['best_lag'] == 0:
+            lead_text = "In step"
+        elif pair['best_lag'] > 0:
+            lead_text = f"{market1} leads by {pair['best_lag']}Q"
+        else:
+            lead_text = f"{market2} leads by {-pair['best_lag']}Q"
+        st.metric("Lead/Lag", lead_text, f"r = {pair['best_lag_correlation']:.2f}", delta_color="off")
+    with pair_col3:
+        gap_text = "n/a" if np.isnan(pair['recovery_gap']) else f"{pair['recovery_gap']:+.1f} pts"
+        st.metric("Recovery Gap", gap_text, help=f"{market1} minus {market2}, % of 2020-Q1 occupancy")
+    with pair_col4:
+        st.metric("Divergence Quarter", pair['divergence_period'] or "None",
+                  help="First quarter the two markets sit 5+ points apart relative to 2020-Q1")
+    
     # Calculate key metrics for comparison
     market1_recovery = recovery_df[recovery_df['market'] == market1]['recovery_percentage'].values[0]
     market2_recovery = recovery_df[recovery_df['market'] == market2]['recovery_percentage'].values[0]
@@ -423,17 +605,11 @@ with tab3:
     
     # Get availability data for the markets
     try:
-        # Market 1 availability data
-        market1_avail = availability_df[(availability_df['market'] == market1) & 
-                                       (availability_df['internal_class'] == 'A')].copy()
-        market1_avail['period'] = market1_avail['year'].astype(str) + "-" + market1_avail['quarter']
-        market1_avail = market1_avail.sort_values('period')
-        
-        # Market 2 availability data
-        market2_avail = availability_df[(availability_df['market'] == market2) & 
-                                       (availability_df['internal_class'] == 'A')].copy()
-        market2_avail['period'] = market2_avail['year'].astype(str) + "-" + market2_avail['quarter']
-        market2_avail = market2_avail.sort_values('period')
+        # Class A availability and rent series from the precomputed stores
+        market1_avail_periods, market1_availability = market_series(availability_pairs, market1)
+        market1_rent_periods, market1_rent = market_series(rent_pairs, market1)
+        market2_avail_periods, market2_availability = market_series(availability_pairs, market2)
+        market2_rent_periods, market2_rent = market_series(rent_pairs, market2)
         
         # Create a figure with two y-axes for availability and rent
         fig = make_subplots(rows=1, cols=2, subplot_titles=(f"{market1} Trends", f"{market2} Trends"))
@@ -441,8 +617,8 @@ with tab3:
         # First market - availability
         fig.add_trace(
             go.Scatter(
-                x=market1_avail['period'],
-                y=market1_avail['availability_proportion'],
+                x=market1_avail_periods,
+                y=market1_availability,
                 name=f"{market1} Availability",
                 line=dict(color='blue', width=3),
                 mode='lines+markers'
@@ -453,8 +629,8 @@ with tab3:
         # First market - rent
         fig.add_trace(
             go.Scatter(
-                x=market1_avail['period'],
-                y=market1_avail['internal_class_rent'],
+                x=market1_rent_periods,
+                y=market1_rent,
                 name=f"{market1} Rent",
                 line=dict(color='red', width=3),
                 mode='lines+markers',
@@ -466,8 +642,8 @@ with tab3:
         # Second market - availability
         fig.add_trace(
             go.Scatter(
-                x=market2_avail['period'],
-                y=market2_avail['availability_proportion'],
+                x=market2_avail_periods,
+                y=market2_availability,
                 name=f"{market2} Availability",
                 line=dict(color='blue', width=3, dash='dash'),
                 mode='lines+markers'
@@ -478,8 +654,8 @@ with tab3:
         # Second market - rent
         fig.add_trace(
             go.Scatter(
-                x=market2_avail['period'],
-                y=market2_avail['internal_class_rent'],
+                x=market2_rent_periods,
+                y=market2_rent,
                 name=f"{market2} Rent",
                 line=dict(color='red', width=3, dash='dash'),
                 mode='lines+markers',
@@ -512,6 +688,52 @@ with tab3:
         st.error(f"Error creating comparison chart: {e}")
         st.warning("Some markets might not have complete availability data.")
 
+    st.markdown("### Market Forecasts")
+    st.markdown("AR(1) forecasts fitted to each series, with 90% prediction intervals.")
+
+    forecast_params, forecast_values = load_forecasts(data_version(*DATA_FILES[:2]))
+    forecast_metric = st.radio(
+        "Forecast:", ["Occupancy", "Class A Availability", "Class A Rent"], horizontal=True, key="forecast_metric"
+    )
+    metric_key, segment, history_df, history_value = {
+        "Occupancy": ('occupancy', 'All', occupancy_df, 'avg_occupancy_proportion'),
+        "Class A Availability": ('availability', 'A', availability_df, 'availability_proportion'),
+        "Class A Rent": ('rent', 'A', availability_df, 'internal_class_rent'),
+    }[forecast_metric]
+
+    forecast_fig = go.Figure()
+    for market, color in ((market1, '#3730A3'), (market2, '#DB2777')):
+        history = history_df[history_df['market'] == market]
+        if segment != 'All':
+            history = history[history['internal_class'] == segment]
+        history = history.sort_values(['year', 'quarter'])
+        forecast = forecast_values[
+            (forecast_values['metric'] == metric_key) & (forecast_values['level'] == 'market') &
+            (forecast_values['market'] == market) & (forecast_values['segment'] == segment)
+        ]
+        forecast_fig.add_trace(go.Scatter(
+            x=history['year'].astype(str) + "-" + history['quarter'], y=history[history_value],
+            mode='lines+markers', name=f"{market} Actual", line=dict(color=color, width=3), legendgroup=market
+        ))
+        if forecast.empty:
+            continue
+        forecast_fig.add_trace(go.Scatter(
+            x=np.r_[forecast['period'], forecast['period'][::-1]],
+            y=np.r_[forecast['upper'], forecast['lower'][::-1]],
+            fill='toself', fillcolor=color, opacity=0.15, line=dict(width=0),
+            hoverinfo='skip', showlegend=False, legendgroup=market
+        ))
+        forecast_fig.add_trace(go.Scatter(
+            x=forecast['period'], y=forecast['forecast'], mode='lines', name=f"{market} Forecast",
+            line=dict(color=color, width=3, dash='dot'), legendgroup=market
+        ))
+    forecast_fig.update_layout(
+        title=f"{forecast_metric} Forecast: {market1} vs {market2}",
+        xaxis_title="Time Period", yaxis_title=forecast_metric, template="plotly_white", height=450,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    st.plotly_chart(forecast_fig, use_container_width=True)
+
 with tab4:
     st.header("Geospatial Market Analysis")
     
@@ -545,29 +767,47 @@ with tab4:
         horizontal=True
     )
     
+    if map_type != "Scatter Plot":
+        # Viewport controls: deck.gl only receives the binned cells inside this view
+        view_col1, view_col2 = st.columns(2)
+        with view_col1:
+            map_focus = st.selectbox("Center map on:", ["United States"] + sorted(map_data['market']))
+        with view_col2:
+            map_zoom = st.slider("Zoom level:", min_value=3.0, max_value=12.0, value=3.5, step=0.5)
+        
+        if map_focus == "United States":
+            center_lat, center_lon = US_CENTER
+        else:
+            focus_row = map_data[map_data['market'] == map_focus].iloc[0]
+            center_lat, center_lon = focus_row['lat'], focus_row['lon']
+        
+        map_cells, map_level = cells_in_view(load_map_tiles(dataset_version, map_data), map_zoom, center_lat, center_lon)
+        map_cells = map_cells.assign(value_mean=map_cells['value_mean'].round(1))
+        st.caption(f"{len(map_cells)} grid cells in view (zoom level {map_level}), aggregated from {len(map_data)} locations")
+    
     if map_type == "3D Column Map":
         # Create a 3D column map showing recovery rates
         view_state = pdk.ViewState(
-            latitude=39.8283,
-            longitude=-98.5795,
-            zoom=3.5,
+            latitude=center_lat,
+            longitude=center_lon,
+            zoom=map_zoom,
             pitch=45
         )
         
         column_layer = pdk.Layer(
             "ColumnLayer",
-            data=map_data,
+            data=map_cells,
             get_position=["lon", "lat"],
-            get_elevation="recovery_percentage * 500",
+            get_elevation="value_mean * 500",
             elevation_scale=1,
-            radius=50000,
-            get_fill_color=["recovery_percentage * 2", "recovery_percentage", "255 - recovery_percentage * 2", 140],
+            radius=cell_radius_m(map_level, center_lat) * 0.8,
+            get_fill_color=["value_mean * 2", "value_mean", "255 - value_mean * 2", 140],
             pickable=True,
             auto_highlight=True
         )
         
         tooltip = {
-            "html": "<b>{market}</b><br>Recovery: {recovery_percentage:.1f}%<br>Current Occupancy: {avg_occupancy_proportion:.2f}",
+            "html": "<b>{label}</b><br>Recovery: {value_mean}%",
             "style": {
                 "backgroundColor": "steelblue",
                 "color": "white"
@@ -585,17 +825,17 @@ with tab4:
     elif map_type == "Heatmap":
         # Create a heatmap showing recovery intensity
         view_state = pdk.ViewState(
-            latitude=39.8283,
-            longitude=-98.5795,
-            zoom=3.5,
+            latitude=center_lat,
+            longitude=center_lon,
+            zoom=map_zoom,
             pitch=0
         )
         
         heatmap_layer = pdk.Layer(
             "HeatmapLayer",
-            data=map_data,
+            data=map_cells,
             get_position=["lon", "lat"],
-            get_weight="recovery_percentage",
+            get_weight="value_sum",
             radiusPixels=100,
             intensity=0.8,
             threshold=0.1
@@ -709,6 +949,272 @@ with tab4:
     st.plotly_chart(fig, use_container_width=True)
 
 with tab5:
+    st.header("Lease Activity")
+    st.markdown("### Market Breadth")
+    st.markdown("""
+    How many distinct tenants and buildings are transacting in each market. Counts are
+    HyperLogLog estimates (typically within ~2-3% of the exact figure) that merge freely
+    across quarters and regions. Alternate spellings of a company name are resolved to one
+    tenant before counting.
+    """)
+
+    try:
+        breadth_keys, tenant_sketches, building_sketches = load_lease_breadth(data_version(LEASES_PATH))
+    except (FileNotFoundError, ValueError) as e:
+        st.warning(f"Lease data is not available: {e}")
+        breadth_keys = None
+
+    if breadth_keys is not None and not breadth_keys.empty:
+        col1, col2 = st.columns(2)
+        with col1:
+            breadth_level = st.radio("Group by:", ["Market", "Region"], horizontal=True)
+        with col2:
+            breadth_years = sorted(breadth_keys['year'].unique())
+            year_range = st.select_slider(
+                "Lease years:",
+                options=breadth_years,
+                value=(breadth_years[0], breadth_years[-1])
+            )
+
+        # Merge the per-quarter sketches inside the selected window
+        year_mask = breadth_keys['year'].between(year_range[0], year_range[1])
+        breadth_df = market_breadth(
+            breadth_keys, tenant_sketches, building_sketches,
+            by=[breadth_level.lower()], mask=year_mask
+        )
+        breadth_df = breadth_df.sort_values('distinct_tenants', ascending=False)
+
+        fig = go.Figure()
+        fig.add_trace(go.Bar(
+            x=breadth_df[breadth_level.lower()],
+            y=breadth_df['distinct_tenants'],
+            name='Distinct Tenants',
+            marker_color='#3730A3'
+        ))
+        fig.add_trace(go.Bar(
+            x=breadth_df[breadth_level.lower()],
+            y=breadth_df['distinct_buildings'],
+            name='Distinct Buildings',
+            marker_color='#DB2777'
+        ))
+        fig.update_layout(
+            barmode='group',
+            height=500,
+            title=f'Distinct Tenants and Buildings by {breadth_level} ({year_range[0]}-{year_range[1]})',
+            xaxis_title=breadth_level,
+            yaxis_title='Distinct Count (approx.)',
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(
+            breadth_df.rename(columns={
+                breadth_level.lower(): breadth_level,
+                'distinct_tenants': 'Distinct Tenants',
+                'distinct_buildings': 'Distinct Buildings'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.markdown("### Submarket Drill-down")
+    st.markdown("Leasing volume and class mix for the submarkets of one market.")
+
+    try:
+        rollups = load_lease_rollups(data_version(LEASES_PATH))
+    except (FileNotFoundError, ValueError) as e:
+        st.warning(f"Lease data is not available: {e}")
+        rollups = None
+
+    if rollups is not None and not rollups['submarket'].empty:
+        submarkets = rollups['submarket']
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            drill_market = st.selectbox("Market:", sorted(submarkets['market'].unique()), key="drill_market")
+        with col2:
+            drill_metric = st.selectbox(
+                "Metric:", ["Leased SF", "Deals", "Class A Share", "CBD Share"],
+                key="drill_metric"
+            )
+        with col3:
+            drill_years = sorted(submarkets['year'].unique())
+            drill_range = st.select_slider(
+                "Lease years:",
+                options=drill_years,
+                value=(drill_years[0], drill_years[-1]),
+                key="drill_years"
+            )
+
+        metric_column = {
+            "Leased SF": 'leased_sf', "Deals": 'deals', "Class A Share": 'class_a_share', "CBD Share": 'cbd_share'
+        }[drill_metric]
+        drill_mask = (submarkets['market'] == drill_market) & submarkets['year'].between(*drill_range)
+        submarket_df = rollup_metrics(
+            submarkets, by=['internal_market_cluster', 'internal_submarket'], mask=drill_mask
+        ).sort_values(metric_column, ascending=False)
+        market_row = rollup_metrics(submarkets, by=['market'], mask=drill_mask)
+
+        fig = px.bar(
+            submarket_df, x='internal_submarket', y=metric_column, color='internal_market_cluster',
+            labels={'internal_submarket': 'Submarket', metric_column: drill_metric,
+                    'internal_market_cluster': 'Cluster'},
+            title=f'{drill_metric} by Submarket: {drill_market} ({drill_range[0]}-{drill_range[1]})'
+        )
+        if not market_row.empty and metric_column not in ('leased_sf', 'deals'):
+            fig.add_hline(y=market_row[metric_column].iloc[0], line_dash='dash', line_color='gray',
+                          annotation_text=f'{drill_market} overall')
+        fig.update_layout(height=450, xaxis={'categoryorder': 'total descending'})
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Rent and availability are only recorded per market, so they are not split by submarket
+        market_values = rollup_metrics(rollups['market'], by=['market'],
+                                       mask=(rollups['market']['market'] == drill_market)
+                                       & rollups['market']['year'].between(*drill_range))
+        if not market_values.empty:
+            col1, col2 = st.columns(2)
+            col1.metric("Market Rent (market-level value)", f"${market_values['market_rent'].iloc[0]:,.2f}")
+            col2.metric("Market Availability (market-level value)", f"{market_values['market_availability'].iloc[0]:.1%}")
+
+    st.markdown("### Building Lease History")
+    st.markdown("Every lease recorded for one building, looked up through the building index.")
+
+    try:
+        lease_store = load_building_index(data_version(LEASES_PATH))
+    except (FileNotFoundError, ValueError) as e:
+        st.warning(f"Lease data is not available: {e}")
+        lease_store = None
+
+    if lease_store is not None:
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            id_type = st.radio("Look up by:", ["Building ID", "CoStar ID"], horizontal=True)
+        with col2:
+            lookup_id = st.text_input(f"{id_type}:", key="building_lookup_id").strip()
+
+        if lookup_id:
+            try:
+                lookup_value = float(lookup_id)
+            except ValueError:
+                lookup_value = None
+                st.warning(f"{id_type} must be a number")
+
+            if lookup_value is not None:
+                if id_type == "CoStar ID":
+                    building_ids = buildings_for_costar(lease_store, lookup_value)
+                else:
+                    building_ids = [lookup_value]
+                histories = [building_history(lease_store, building_id) for building_id in building_ids]
+                histories = [history for history in histories if history is not None]
+
+                if not histories:
+                    st.info(f"No leases found for {id_type} {lookup_id}")
+                else:
+                    history = pd.concat(histories, ignore_index=True).sort_values(['year', 'quarter', 'monthsigned'])
+                    building_name = history['canonical_building_name'].dropna()
+                    st.subheader(building_name.iloc[0] if not building_name.empty else f"Building {lookup_id}")
+
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Leases", f"{len(history):,}")
+                    col2.metric("Leased SF", f"{history['leasedSF'].sum():,.0f}")
+                    # Resolved tenant entities, so alternate spellings of a company count once
+                    tenant_ids = history['company_name_entity_id']
+                    col3.metric("Distinct Tenants", f"{tenant_ids[tenant_ids >= 0].nunique():,}")
+
+                    quarterly = history.assign(period=history['year'].astype(str) + "-" + history['quarter'].astype(str))
+                    quarterly = quarterly.groupby(['period', 'transaction_type'], as_index=False)['leasedSF'].sum()
+                    fig = px.bar(
+                        quarterly, x='period', y='leasedSF', color='transaction_type',
+                        labels={'period': 'Quarter', 'leasedSF': 'Leased SF', 'transaction_type': 'Transaction Type'},
+                        title='Leased SF by Quarter'
+                    )
+                    fig.update_layout(height=400)
+                    st.plotly_chart(fig, use_container_width=True)
+
+                    st.dataframe(
+                        history[['year', 'quarter', 'monthsigned', 'canonical_company_name', 'internal_industry',
+                                 'transaction_type', 'leasedSF', 'internal_class', 'space_type', 'overall_rent']],
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
+with tab6:
+    st.header("Go vs Stay")
+    st.markdown("""
+    Do tenants move or stay put? New leases and relocations count as **Go**; renewals,
+    expansions, extensions, restructures and sale-leasebacks count as **Stay**. Leases with an
+    undetermined type (TBD) are left out of the Go share.
+    """)
+
+    try:
+        go_stay_cube = load_go_stay(data_version(LEASES_PATH))
+    except (FileNotFoundError, ValueError) as e:
+        st.warning(f"Lease data is not available: {e}")
+        go_stay_cube = None
+
+    if go_stay_cube is not None and not go_stay_cube.empty:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            go_stay_level = st.radio("Compare by:", ["Market", "Industry"], horizontal=True)
+        with col2:
+            go_stay_metric = st.radio("Measure:", ["Leased SF", "Deals"], horizontal=True)
+        with col3:
+            go_stay_years = sorted(go_stay_cube['year'].unique())
+            go_stay_range = st.select_slider(
+                "Lease years:",
+                options=go_stay_years,
+                value=(go_stay_years[0], go_stay_years[-1]),
+                key="go_stay_years"
+            )
+
+        group_column = 'market' if go_stay_level == "Market" else 'internal_industry'
+        measure = 'sf' if go_stay_metric == "Leased SF" else 'deals'
+        in_window = go_stay_cube['year'].between(go_stay_range[0], go_stay_range[1])
+
+        # Go vs Stay volume per market or industry
+        by_group = go_stay_summary(go_stay_cube, by=[group_column], mask=in_window)
+        by_group = by_group.sort_values('go_share', ascending=False)
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=by_group[group_column], y=by_group[f'go_{measure}'], name='Go', marker_color='#DB2777'))
+        fig.add_trace(go.Bar(x=by_group[group_column], y=by_group[f'stay_{measure}'], name='Stay', marker_color='#3730A3'))
+        fig.update_layout(
+            barmode='stack',
+            height=450,
+            title=f'Go vs Stay {go_stay_metric} by {go_stay_level} ({go_stay_range[0]}-{go_stay_range[1]})',
+            xaxis_title=go_stay_level,
+            yaxis_title=go_stay_metric,
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        # Go share over time for the largest groups
+        by_quarter = go_stay_summary(go_stay_cube, by=[group_column, 'year', 'quarter'], mask=in_window)
+        by_quarter['period'] = by_quarter['year'].astype(str) + "-" + by_quarter['quarter']
+        top_groups = by_group.nlargest(8, f'go_{measure}')[group_column]
+        by_quarter = by_quarter[by_quarter[group_column].isin(top_groups)].sort_values('period')
+        fig = px.line(
+            by_quarter,
+            x='period',
+            y='go_share',
+            color=group_column,
+            markers=True,
+            labels={'period': 'Quarter', 'go_share': 'Go Share of Leased SF', group_column: go_stay_level},
+            title='Share of Leased SF from Tenants on the Move'
+        )
+        fig.update_layout(height=450, yaxis_tickformat='.0%')
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(
+            by_group.rename(columns={
+                group_column: go_stay_level,
+                'go_sf': 'Go SF', 'stay_sf': 'Stay SF', 'unknown_sf': 'TBD SF',
+                'go_deals': 'Go Deals', 'stay_deals': 'Stay Deals', 'unknown_deals': 'TBD Deals',
+                'go_share': 'Go Share'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+with tab7:
     st.header("Formal Analysis: Commercial Real Estate Market Recovery Patterns")
     
     # Function to read and display the analysis.md file
@@ -762,14 +1268,16 @@ with tab5:
 # Footer
 st.markdown("---")
 st.markdown("### Market Insights and Recommendations")
-st.markdown("""
+negative_markets = (unemployment_summary['corr'] < 0).sum()
+significant_markets = (unemployment_summary['ci_high'] < 0).sum()
+st.markdown(f"""
 Based on our interactive data exploration, here are key insights for Savills clients:
 
 1. **Tech-Driven Markets Show Resilience**: Austin and Dallas/Ft Worth have recovered most strongly compared to pre-pandemic baselines.
 
 2. **Southern/Central Markets Outperforming Coastal Markets**: The strongest recovery is seen in Texas markets with recovery rates between 67-74% of pre-pandemic levels.
 
-3. **Strong Negative Correlation Between Unemployment and Office Occupancy**: All markets show a negative correlation between unemployment rates and office occupancy.
+3. **Unemployment and Office Occupancy**: {negative_markets} of {len(unemployment_summary)} markets show a negative same-quarter correlation between unemployment and office occupancy, {significant_markets} with a 90% bootstrap interval entirely below zero (see the lead/lag view under Interactive Time Series).
 
 4. **Market-Specific Strategies Required**: The data suggests different optimal timing for lease negotiations across markets.
 """)